@@ -72,7 +72,9 @@ setup(
     },
     tests_require=TESTS_REQUIRE,
     extras_require={
-        "tests": TESTS_REQUIRE
+        "tests": TESTS_REQUIRE,
+        "httpx": ["httpx[http2]"],
+        "orjson": ["orjson"],
     },
 
     zip_safe=True
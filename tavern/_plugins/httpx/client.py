@@ -0,0 +1,373 @@
+"""Session for the httpx backend
+
+All requests from every session are sent from one event loop in a background
+thread, and connections are pooled between sessions. This means that tests
+running at the same time (see --tavern-concurrency) share connections to the
+server (and HTTP/2 connections, if the server supports it) instead of each
+opening their own.
+
+Only the sending is asynchronous - the session looks enough like a
+requests.Session that the request and response handling from the requests
+backend can be reused as-is, so each test still waits in its own thread for its
+request to finish and its response to be read.
+
+If 'stream' is set in the request, the body of the response is only read when
+it is used, a chunk at a time, the same as with requests.
+"""
+import asyncio
+import atexit
+import logging
+import os
+import ssl
+import threading
+
+import certifi
+import httpx
+from requests.cookies import RequestsCookieJar
+
+from tavern._plugins.rest.upload import UploadBody
+
+try:
+    import h2  # noqa: F401 pylint: disable=unused-import
+except ImportError:
+    _HTTP2_AVAILABLE = False
+else:
+    _HTTP2_AVAILABLE = True
+
+logger = logging.getLogger(__name__)
+
+
+class _EventLoopThread(object):
+    """Event loop running forever in a daemon thread, started on first use"""
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _get_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+
+                thread = threading.Thread(
+                    target=loop.run_forever, name="tavern-httpx", daemon=True
+                )
+                thread.start()
+
+                self._loop = loop
+
+            return self._loop
+
+    def run(self, coro):
+        """Run a coroutine on the event loop and wait for the result
+
+        Args:
+            coro (coroutine): coroutine to run
+
+        Returns:
+            object: whatever the coroutine returned
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self._get_loop())
+        return future.result()
+
+    def stop(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+
+
+event_loop = _EventLoopThread()
+
+
+def _create_ssl_context(verify, cert):
+    """Create an ssl context from the 'verify' and 'cert' request arguments,
+    which are in the format that requests uses
+
+    Args:
+        verify (bool, str): whether to verify the server certificate, or the
+            path to a CA bundle (or directory of certificates) to verify it with
+        cert (str, tuple): client certificate, or a tuple of (certificate, key)
+
+    Returns:
+        ssl.SSLContext: context for connections
+    """
+    if isinstance(verify, str):
+        if os.path.isdir(verify):
+            context = ssl.create_default_context(capath=verify)
+        else:
+            context = ssl.create_default_context(cafile=verify)
+    else:
+        context = ssl.create_default_context(cafile=certifi.where())
+
+        if not verify:
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+
+    if cert:
+        if isinstance(cert, str):
+            context.load_cert_chain(cert)
+        else:
+            context.load_cert_chain(*cert)
+
+    return context
+
+
+class _TransportCache(object):
+    """Connection pools shared between all sessions
+
+    There is one pool for each combination of ssl settings, because these are
+    set per connection rather than per request.
+    """
+
+    def __init__(self):
+        self._transports = {}
+        self._lock = threading.Lock()
+
+    def get(self, verify, cert):
+        """Get connection pool for these ssl settings
+
+        Args:
+            verify (bool, str): as in requests
+            cert (str, tuple): as in requests
+
+        Returns:
+            httpx.AsyncHTTPTransport: shared transport
+        """
+        key = (verify, cert)
+
+        with self._lock:
+            try:
+                return self._transports[key]
+            except KeyError:
+                pass
+
+            logger.debug("Creating connection pool for verify=%s, cert=%s", *key)
+
+            transport = httpx.AsyncHTTPTransport(
+                verify=_create_ssl_context(verify, cert), http2=_HTTP2_AVAILABLE
+            )
+            self._transports[key] = transport
+
+            return transport
+
+    def close(self):
+        with self._lock:
+            transports = list(self._transports.values())
+            self._transports.clear()
+
+        async def close_all():
+            for transport in transports:
+                await transport.aclose()
+
+        if transports:
+            event_loop.run(close_all())
+
+
+transports = _TransportCache()
+
+
+class _SharedTransport(httpx.AsyncBaseTransport):
+    """Wraps a transport from the cache so that closing a client doesn't close
+    the connection pool which is shared with every other client
+
+    Args:
+        transport (httpx.AsyncBaseTransport): shared transport
+    """
+
+    def __init__(self, transport):
+        self._transport = transport
+
+    async def handle_async_request(self, request):
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        # Closed by the cache at exit
+        pass
+
+
+class _StreamReader(httpx.SyncByteStream):
+    """Reads the body of a streamed response from the event loop, one chunk at
+    a time, so it can be read like a normal synchronous response
+
+    Args:
+        stream (httpx.AsyncByteStream): body of response
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._chunks = None
+
+    def __iter__(self):
+        self._chunks = self._stream.__aiter__()
+
+        while True:
+            try:
+                yield event_loop.run(self._chunks.__anext__())
+            except StopAsyncIteration:
+                return
+
+    def close(self):
+        event_loop.run(self._stream.aclose())
+
+
+@atexit.register
+def _shutdown():
+    try:
+        transports.close()
+    finally:
+        event_loop.stop()
+
+
+def _convert_timeout(timeout):
+    """Convert a requests timeout to a httpx one
+
+    Like requests, there is no timeout if it isn't specified
+
+    Args:
+        timeout (float, tuple): total timeout, or (connect, read) timeouts
+
+    Returns:
+        httpx.Timeout: timeout for request
+    """
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+
+    return httpx.Timeout(timeout)
+
+
+def _convert_body(request_args):
+    """Convert request body arguments from the format requests accepts to the
+    format httpx accepts
+
+    Args:
+        request_args (dict): arguments for requests.Session.request
+
+    Returns:
+        dict: arguments for httpx.AsyncClient.request
+    """
+    converted = {}
+
+    data = request_args.get("data")
+    if data is not None:
+        if isinstance(data, UploadBody):
+            # Read from the files as the body is sent
+            converted["content"] = data.aiter()
+            if data.len is not None:
+                # Otherwise httpx would send it chunked
+                converted["headers"] = {"Content-Length": str(data.len)}
+        elif isinstance(data, (str, bytes)):
+            converted["content"] = data
+        else:
+            converted["data"] = data
+
+    for key in ["json", "files"]:
+        if request_args.get(key) is not None:
+            converted[key] = request_args[key]
+
+    return converted
+
+
+class HttpxSession(object):
+    """Requests-like session which sends requests using httpx
+
+    Cookies are kept in a requests cookie jar, so they can be read and
+    modified in exactly the same way as with a requests.Session.
+    """
+
+    def __init__(self):
+        self._cookies = RequestsCookieJar()
+        self._clients = {}
+
+    @property
+    def cookies(self):
+        return self._cookies
+
+    @cookies.setter
+    def cookies(self, jar):
+        self._cookies = jar
+        for client in self._clients.values():
+            client.cookies = jar
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        clients = list(self._clients.values())
+        self._clients.clear()
+
+        async def close_all():
+            for client in clients:
+                await client.aclose()
+
+        if clients:
+            event_loop.run(close_all())
+
+    def _get_client(self, verify, cert):
+        key = (verify, cert)
+
+        try:
+            return self._clients[key]
+        except KeyError:
+            client = httpx.AsyncClient(
+                transport=_SharedTransport(transports.get(verify, cert)),
+                cookies=self._cookies,
+            )
+            self._clients[key] = client
+            return client
+
+    def request(self, method, url, **request_args):
+        """Send a request
+
+        Takes the same arguments as requests.Session.request.
+
+        Args:
+            method (str): HTTP method
+            url (str): url to send request to
+            request_args (dict): other arguments, in the format requests uses
+
+        Returns:
+            httpx.Response: response. If 'stream' was set, the body has not
+                been read yet, but it can be read synchronously.
+        """
+        client = self._get_client(
+            request_args.get("verify", True), request_args.get("cert")
+        )
+
+        cookies = request_args.get("cookies")
+        if cookies:
+            # Already cleared the session cookies if any were specified - see
+            # _set_cookies_for_request
+            for name, value in cookies.items():
+                self._cookies.set(name, value)
+
+        kwargs = _convert_body(request_args)
+
+        headers = request_args.get("headers")
+        if "headers" in kwargs:
+            headers = dict(headers or {}, **kwargs["headers"])
+
+        kwargs.update(
+            params=request_args.get("params"),
+            headers=headers,
+            follow_redirects=request_args.get("allow_redirects", True),
+            timeout=_convert_timeout(request_args.get("timeout")),
+        )
+
+        if request_args.get("auth") is not None:
+            kwargs["auth"] = request_args["auth"]
+
+        if not request_args.get("stream"):
+            return event_loop.run(client.request(method, url, **kwargs))
+
+        send_kwargs = {
+            k: kwargs.pop(k) for k in ["auth", "follow_redirects"] if k in kwargs
+        }
+        request = client.build_request(method, url, **kwargs)
+
+        response = event_loop.run(client.send(request, stream=True, **send_kwargs))
+        response.stream = _StreamReader(response.stream)
+
+        return response
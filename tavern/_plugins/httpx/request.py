@@ -0,0 +1,26 @@
+import logging
+
+import httpx
+
+from tavern._plugins.rest.request import RestRequest
+from tavern.util import exceptions
+
+logger = logging.getLogger(__name__)
+
+
+class HttpxRequest(RestRequest):
+    """Same as the requests backend, but errors from httpx are converted
+    instead of errors from requests"""
+
+    def run(self):
+        """ Runs the prepared request
+
+        Returns:
+            httpx.Response: response object
+        """
+
+        try:
+            return self._prepared()
+        except (httpx.HTTPError, httpx.InvalidURL) as e:
+            logger.exception("Error running prepared request")
+            raise exceptions.RestRequestException from e
@@ -0,0 +1,26 @@
+import logging
+
+from tavern._plugins.rest.tavernhook import TavernRestPlugin
+
+from .client import HttpxSession
+from .request import HttpxRequest
+
+logger = logging.getLogger(__name__)
+
+
+class TavernHttpxPlugin(TavernRestPlugin):
+    """HTTP backend using httpx
+
+    Request formatting and response verification are exactly the same as the
+    requests backend, only the way the request is sent is different.
+    """
+
+    session_type = HttpxSession
+
+    @staticmethod
+    def get_session(test_block_config, **kwargs):
+        # pylint: disable=unused-argument
+        # Connections are always shared between sessions with this backend
+        return HttpxSession(**kwargs)
+
+    request_type = HttpxRequest
@@ -0,0 +1,243 @@
+"""Buffers for messages received on each subscription
+
+Each topic that is subscribed to gets its own buffer, and every message that
+is received is put into the buffer for each subscription that matches its
+topic (including wildcard subscriptions). This means that a busy topic can't
+fill up the buffer and cause messages on another topic to be lost, and waiting
+for a message on one topic doesn't throw away messages on any other topic.
+"""
+import collections
+import itertools
+import logging
+import threading
+import time
+
+import paho.mqtt.client as paho
+
+from tavern.util import exceptions
+
+logger = logging.getLogger(__name__)
+
+# What to do when a message is received and the buffer is already full
+OVERFLOW_ERROR = "error"
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DROP_NEWEST = "drop_newest"
+
+OVERFLOW_POLICIES = (OVERFLOW_ERROR, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST)
+
+
+class _SubscriptionBuffer(object):
+    """Messages received for one subscription
+
+    Args:
+        topic (str): topic subscribed to, which can contain wildcards
+        capacity (int): maximum number of messages to keep
+        overflow (str): what to do when the buffer is full
+
+    Attributes:
+        messages (collections.deque): (sequence number, message) for each
+            message received, oldest first
+        dropped (int): number of messages dropped since this was last checked
+    """
+
+    def __init__(self, topic, capacity, overflow):
+        self.topic = topic
+        self.messages = collections.deque()
+        self.dropped = 0
+
+        self._capacity = capacity
+        self._overflow = overflow
+
+    def put(self, seq, message):
+        if len(self.messages) >= self._capacity:
+            self.dropped += 1
+
+            if self._overflow == OVERFLOW_DROP_OLDEST:
+                _, dropped = self.messages.popleft()
+            else:
+                dropped = message
+
+            logger.warning(
+                "Message buffer for '%s' is full - dropping message on '%s'",
+                self.topic,
+                dropped.topic,
+            )
+
+            if dropped is message:
+                return
+
+        self.messages.append((seq, message))
+
+
+class MessageBuffers(object):
+    """Buffers for every topic subscribed to
+
+    Messages are put in by the paho network thread and taken out by the thread
+    running the test.
+
+    Args:
+        capacity (int): maximum number of messages to keep for each subscription
+        overflow (str): what to do when a message is received for a subscription
+            whose buffer is full. One of:
+            - error: drop the new message and fail the test when the
+              subscription is next checked
+            - drop_oldest: drop the oldest message in the buffer
+            - drop_newest: drop the new message
+    """
+
+    def __init__(self, capacity=100, overflow=OVERFLOW_ERROR):
+        if overflow not in OVERFLOW_POLICIES:
+            raise exceptions.MQTTError(
+                "Invalid buffer overflow policy '{}' - must be one of {}".format(
+                    overflow, OVERFLOW_POLICIES
+                )
+            )
+
+        try:
+            capacity = int(capacity)
+        except (TypeError, ValueError) as e:
+            raise exceptions.MQTTError("Buffer capacity must be an integer") from e
+
+        if capacity < 1:
+            raise exceptions.MQTTError("Buffer capacity must be at least 1")
+
+        self._capacity = capacity
+        self._overflow = overflow
+
+        self._buffers = {}
+        # Notified whenever a message is added to any buffer
+        self._cond = threading.Condition()
+        # Order messages were received in, across all buffers
+        self._seq = itertools.count()
+
+    def add(self, topic):
+        """Start buffering messages for a subscription
+
+        Args:
+            topic (str): topic subscribed to
+        """
+        with self._cond:
+            if topic not in self._buffers:
+                self._buffers[topic] = _SubscriptionBuffer(
+                    topic, self._capacity, self._overflow
+                )
+
+    def remove(self, topic):
+        """Stop buffering messages for a subscription, and throw away any that
+        haven't been read
+
+        Args:
+            topic (str): topic subscribed to
+        """
+        with self._cond:
+            self._buffers.pop(topic, None)
+
+    def remove_all(self):
+        with self._cond:
+            self._buffers.clear()
+
+    def clear(self):
+        """Throw away all buffered messages, but keep buffering"""
+        with self._cond:
+            for buf in self._buffers.values():
+                buf.messages.clear()
+                buf.dropped = 0
+
+    def put(self, message):
+        """Add a message to the buffer of every subscription that matches its
+        topic
+
+        Args:
+            message (paho.MQTTMessage): message received
+        """
+        with self._cond:
+            seq = next(self._seq)
+            matched = False
+
+            for buf in self._buffers.values():
+                if paho.topic_matches_sub(buf.topic, message.topic):
+                    buf.put(seq, message)
+                    matched = True
+
+            if matched:
+                self._cond.notify_all()
+            else:
+                logger.debug(
+                    "Discarding message on '%s' - not subscribed to it", message.topic
+                )
+
+    def _pop(self, topic):
+        if topic is None:
+            buffers = self._buffers.values()
+        else:
+            if isinstance(topic, str):
+                topic = [topic]
+
+            buffers = [self._buffers[t] for t in topic if t in self._buffers]
+
+        # Oldest message out of all the buffers
+        oldest = min(
+            (buf for buf in buffers if buf.messages),
+            key=lambda buf: buf.messages[0][0],
+            default=None,
+        )
+
+        if oldest is None:
+            return None
+
+        _, message = oldest.messages.popleft()
+        return message
+
+    def get(self, timeout, topic=None):
+        """Wait for a message
+
+        If there are messages in more than one of the buffers being read from,
+        the one which was received first is returned.
+
+        Args:
+            timeout (float): how long to wait
+            topic (str, list, optional): only get a message from the buffer for
+                this subscription (or these subscriptions). If not given, get a
+                message from any buffer.
+
+        Returns:
+            paho.MQTTMessage: message, or None if no message was received
+        """
+        deadline = time.monotonic() + timeout
+
+        with self._cond:
+            while True:
+                message = self._pop(topic)
+                if message is not None:
+                    return message
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+
+                self._cond.wait(remaining)
+
+    def check_overflow(self, topic):
+        """Check whether any messages for a subscription were dropped since the
+        last time this was called
+
+        Args:
+            topic (str): topic subscribed to
+
+        Raises:
+            MQTTBufferOverflowError: messages were dropped, and the overflow
+                policy is 'error'
+        """
+        with self._cond:
+            try:
+                buf = self._buffers[topic]
+            except KeyError:
+                return
+
+            dropped, buf.dropped = buf.dropped, 0
+
+        if dropped and self._overflow == OVERFLOW_ERROR:
+            raise exceptions.MQTTBufferOverflowError(
+                "{} message(s) on '{}' were dropped because the buffer was full "
+                "(capacity {})".format(dropped, topic, self._capacity)
+            )
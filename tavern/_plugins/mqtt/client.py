@@ -1,14 +1,14 @@
 import logging
-from queue import Empty, Full, Queue
 import ssl
 import threading
-import time
 
 import paho.mqtt.client as paho
 
 from tavern.util import exceptions
 from tavern.util.dict_util import check_expected_keys
 
+from .buffer import MessageBuffers
+
 # MQTT error values
 _err_vals = {
     -1: "MQTT_ERR_AGAIN",
@@ -118,6 +118,7 @@ class MQTTClient(object):
                 "ciphers",
             },
             "auth": {"username", "password"},
+            "message_buffer": {"capacity", "overflow"},
         }
 
         logger.debug("Initialising MQTT client with %s", kwargs)
@@ -135,6 +136,9 @@ class MQTTClient(object):
         self._auth_args = kwargs.pop("auth", {})
         check_expected_keys(expected_blocks["auth"], self._auth_args)
 
+        buffer_args = kwargs.pop("message_buffer", {})
+        check_expected_keys(expected_blocks["message_buffer"], buffer_args)
+
         if "host" not in self._connect_args:
             msg = "Need 'host' in 'connect' block for mqtt"
             logger.error(msg)
@@ -169,59 +173,77 @@ class MQTTClient(object):
                     "Unexpected SSL error enabling TLS"
                 ) from e
 
-        # Arbitrary number, could just be 1 and only accept 1 message per stages
-        # but we might want to raise an error if more than 1 message is received
-        # during a test stage.
-        self._message_queue = Queue(maxsize=10)
-        self._userdata = {"queue": self._message_queue}
+        # Messages received on each subscription
+        self._message_buffers = MessageBuffers(**buffer_args)
+        self._userdata = {"buffers": self._message_buffers}
         self._client.user_data_set(self._userdata)
 
         # Topics to subscribe to - mapping of subscription message id to a tuple
         # of (topic, sub_status) where sub_status is true or false based on
         # whether it has finished subscribing or not
         self._subscribed = {}
-        # Lock to ensure there is no race condition when subscribing
-        self._subscribe_lock = threading.RLock()
+        # Lock to ensure there is no race condition when subscribing, which is
+        # also notified whenever a subscription finishes
+        self._subscribe_lock = threading.Condition(threading.RLock())
         # callback
         self._client.on_subscribe = self._on_subscribe
 
+        # Set when the broker responds to the connection attempt, successfully
+        # or not. _connect_rc is the return code from the broker.
+        self._connected = threading.Event()
+        self._connect_rc = None
+        self._client.on_connect = self._on_connect
+        self._client.on_disconnect = self._on_disconnect
+
     @staticmethod
     def _on_message(client, userdata, message):
-        """Add any messages received to the queue
+        """Add any messages received to the buffers for the subscriptions they
+        match
 
-        Todo:
-            If the queue is faull trigger an error in main thread somehow
+        If a buffer is full, this is reported when check_overflow is called for
+        that subscription.
         """
         # pylint: disable=unused-argument
 
         logger.info("Received mqtt message on %s", message.topic)
 
-        try:
-            userdata["queue"].put(message)
-        except Full:
-            logger.exception("message queue full")
+        userdata["buffers"].put(message)
 
-    def message_received(self, timeout=1):
-        """Check that a message is in the message queue
+    def message_received(self, timeout=1, topic=None):
+        """Check that a message has been received
 
         Args:
             timeout (int): How long to wait before signalling that the message
                 was not received.
+            topic (str, list, optional): Only return a message received on
+                this subscription, or any of these subscriptions. This should be
+                exactly the same as the topic that was subscribed to, including
+                any wildcards.
 
         Returns:
-            bool: whether the message was received within the timeout
-
-        Todo:
-            Allow regexes for topic names? Better validation for mqtt payloads
+            paho.MQTTMessage: the message, or None if no message was received
+                within the timeout
         """
 
-        try:
-            msg = self._message_queue.get(block=True, timeout=timeout)
-        except Empty:
+        msg = self._message_buffers.get(timeout, topic)
+
+        if msg is None:
             logger.error("Message not received after %d seconds", timeout)
-            return None
-        else:
-            return msg
+
+        return msg
+
+    def check_overflow(self, topic):
+        """Check whether any messages on a subscription were dropped because
+        its buffer was full
+
+        Args:
+            topic (str): topic subscribed to
+
+        Raises:
+            MQTTBufferOverflowError: messages were dropped, and the overflow
+                policy is 'error'
+        """
+        self._message_buffers.check_overflow(topic)
 
     def publish(self, topic, payload=None, qos=None, retain=None):
         """publish message using paho library
@@ -254,32 +276,19 @@ class MQTTClient(object):
             """Get topic names for topics which have not finished subcribing to"""
             return [i.topic for i in self._subscribed.values() if not i.subscribed]
 
-        to_wait_for = not_finished_subscribing_to()
-
-        if to_wait_for:
-            elapsed = 0.0
-            while elapsed < self._connect_timeout:
-                # TODO
-                # configurable?
-                time.sleep(0.25)
-                elapsed += 0.25
-
-                to_wait_for = not_finished_subscribing_to()
-
-                if not to_wait_for:
-                    break
+        with self._subscribe_lock:
+            # Woken up by _on_subscribe every time a SUBACK is received
+            self._subscribe_lock.wait_for(
+                lambda: not not_finished_subscribing_to(), self._connect_timeout
+            )
 
-                logger.debug(
-                    "Not finished subscribing to '%s' after %.2f seconds",
-                    to_wait_for,
-                    elapsed,
-                )
+            to_wait_for = not_finished_subscribing_to()
 
-            if to_wait_for:
-                logger.warning(
-                    "Did not finish subscribing to '%s' before publishing - going ahead anyway",
-                    to_wait_for,
-                )
+        if to_wait_for:
+            logger.warning(
+                "Did not finish subscribing to '%s' before publishing - going ahead anyway",
+                to_wait_for,
+            )
 
         if not to_wait_for:
             logger.debug("Finished subscribing to all topics")
@@ -292,19 +301,27 @@ class MQTTClient(object):
         logger.debug("Subscribing to topic '%s'", topic)
 
         with self._subscribe_lock:
+            # Retained messages can be received as soon as the broker has the
+            # subscription
+            self._message_buffers.add(topic)
+
             (status, mid) = self._client.subscribe(topic, *args, **kwargs)
 
             if status == 0:
                 self._subscribed[mid] = _Subscription(topic, False)
             else:
                 logger.error("Error subscribing to '%s'", topic)
+                self._message_buffers.remove(topic)
 
     def unsubscribe_all(self):
-        """Unsubscribe from all topics"""
+        """Unsubscribe from all topics, discarding any messages which have not
+        been checked"""
         with self._subscribe_lock:
             for subscription in self._subscribed.values():
                 self._client.unsubscribe(subscription.topic)
 
+            self._message_buffers.remove_all()
+
     def _on_subscribe(self, client, userdata, mid, granted_qos):
         # pylint: disable=unused-argument
         with self._subscribe_lock:
@@ -313,38 +330,54 @@ class MQTTClient(object):
                 logger.debug(
                     "Successfully subscribed to '%s'", self._subscribed[mid].topic
                 )
+                self._subscribe_lock.notify_all()
             else:
                 logger.warning(
                     "Got SUBACK message with mid '%s', but did not recognise that mid - will try later",
                     mid,
                 )
 
+    def _on_connect(self, client, userdata, flags, rc):
+        # pylint: disable=unused-argument
+        if rc == 0:
+            logger.debug("Connected to broker at %s", self._connect_args["host"])
+        else:
+            logger.error("Connection refused by broker: %s", paho.connack_string(rc))
+
+        self._connect_rc = rc
+        self._connected.set()
+
+    def _on_disconnect(self, client, userdata, rc):
+        # pylint: disable=unused-argument
+        logger.debug("Disconnected from broker (%s)", paho.error_string(rc))
+        self._connected.clear()
+
     def __enter__(self):
         logger.debug("Connecting to %s", self._connect_args)
 
+        self._connected.clear()
+        self._connect_rc = None
+
         self._client.connect_async(**self._connect_args)
         self._client.loop_start()
 
-        elapsed = 0
+        # Set by _on_connect as soon as the broker responds
+        if self._connected.wait(self._connect_timeout) and self._connect_rc == 0:
+            return self
 
-        while elapsed < self._connect_timeout:
-            # pylint: disable=protected-access
-            if self._client._state == paho.mqtt_cs_connected:
-                logger.debug("Connected to broker at %s", self._connect_args["host"])
-                return self
-            else:
-                logger.debug("Not connected after %s seconds - waiting", elapsed)
+        self._disconnect()
 
-            # TODO
-            # configurable?
-            time.sleep(0.25)
-            elapsed += 0.25
+        if self._connect_rc is None:
+            logger.error(
+                "Could not connect to broker after %s seconds", self._connect_timeout
+            )
+            raise exceptions.MQTTError
 
-        self._disconnect()
-        logger.error(
-            "Could not connect to broker after %s seconds", self._connect_timeout
+        raise exceptions.MQTTError(
+            "Connection refused by broker: {}".format(
+                paho.connack_string(self._connect_rc)
+            )
         )
-        raise exceptions.MQTTError
 
     def __exit__(self, *args):
         self._disconnect()
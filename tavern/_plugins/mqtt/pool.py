@@ -0,0 +1,136 @@
+"""MQTT connections which are shared between tests
+
+Normally every test creates a new MQTT client and connects it to the broker,
+then disconnects at the end of the test. When pooling is enabled, clients are
+kept connected after the test finishes and are reused by the next test which
+uses the same connection settings.
+
+A client is only ever used by one test at a time - if tests are being run
+concurrently, more than one client will be created for the same settings.
+"""
+import atexit
+import copy
+import json
+import logging
+import threading
+
+from .client import MQTTClient
+
+logger = logging.getLogger(__name__)
+
+
+class PooledMQTTClient(MQTTClient):
+    """MQTT client which stays connected after a test finishes
+
+    Subscriptions and any messages which have not been checked are cleared when
+    a test finishes, so the next test starts in the same state as it would with
+    a new client.
+
+    Args:
+        pool (_ClientPool): pool to return this client to after each test
+        key (str): connection settings this client was created with
+        kwargs (dict): arguments for MQTTClient
+    """
+
+    def __init__(self, pool, key, **kwargs):
+        super(PooledMQTTClient, self).__init__(**kwargs)
+
+        self._pool = pool
+        self._key = key
+        self._started = False
+
+    def _reset_subscriptions(self):
+        with self._subscribe_lock:
+            self.unsubscribe_all()
+            self._subscribed.clear()
+
+    def __enter__(self):
+        if self._started:
+            # If the connection dropped, paho will already be trying to
+            # reconnect in the background - give it as long as a new connection
+            # would get
+            if self._connected.wait(self._connect_timeout) and self._connect_rc == 0:
+                logger.debug("Reusing connection to %s", self._connect_args["host"])
+                return self
+
+            logger.warning("Lost connection to broker - reconnecting")
+            self._started = False
+            self._disconnect()
+
+        super(PooledMQTTClient, self).__enter__()
+        self._started = True
+
+        return self
+
+    def __exit__(self, *args):
+        try:
+            self._reset_subscriptions()
+        finally:
+            self._pool.release(self._key, self)
+
+    def close(self):
+        """Actually disconnect from the broker"""
+        if self._started:
+            self._started = False
+            self._disconnect()
+
+
+class _ClientPool(object):
+    """Connected clients which are not currently being used by a test, for each
+    set of connection settings"""
+
+    def __init__(self):
+        self._idle = {}
+        self._all = []
+        self._lock = threading.Lock()
+
+    def get(self, **kwargs):
+        """Get a client for these connection settings
+
+        Args:
+            kwargs (dict): 'paho-mqtt' block from the test
+
+        Returns:
+            PooledMQTTClient: client which is not being used by any other test
+        """
+        key = json.dumps(kwargs, sort_keys=True, default=str)
+
+        with self._lock:
+            try:
+                return self._idle[key].pop()
+            except (KeyError, IndexError):
+                pass
+
+        logger.debug("Creating new pooled MQTT client")
+
+        # MQTTClient modifies its arguments
+        client = PooledMQTTClient(self, key, **copy.deepcopy(kwargs))
+
+        with self._lock:
+            self._all.append(client)
+
+        return client
+
+    def release(self, key, client):
+        with self._lock:
+            self._idle.setdefault(key, []).append(client)
+
+    def close(self):
+        with self._lock:
+            clients = list(self._all)
+            self._all.clear()
+            self._idle.clear()
+
+        for client in clients:
+            try:
+                client.close()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Error disconnecting from broker")
+
+
+shared_clients = _ClientPool()
+
+
+@atexit.register
+def _shutdown():
+    shared_clients.close()
@@ -1,29 +1,39 @@
+import copy
 import json
 import logging
 import time
 
+import paho.mqtt.client as paho
+
 from tavern.response.base import BaseResponse
 from tavern.testutils.pytesthook.newhooks import call_hook
 from tavern.util import exceptions
-from tavern.util.dict_util import check_keys_match_recursive
+from tavern.util.dict_util import values_match
 from tavern.util.loader import ANYTHING
+from tavern.util.log_util import Truncated
 
 logger = logging.getLogger(__name__)
 
 
-class MQTTResponse(BaseResponse):
-    def __init__(self, client, name, expected, test_block_config):
-        super(MQTTResponse, self).__init__(name, expected, test_block_config)
+class _ExpectedMessage(BaseResponse):
+    """One message which should be received in a stage
 
-        self._client = client
+    Attributes:
+        message (paho.MQTTMessage): message which matched, if one has been
+            received
+    """
 
-        self.received_messages = []
+    def __init__(self, name, expected, test_block_config):
+        super(_ExpectedMessage, self).__init__(name, expected, test_block_config)
 
-    def __str__(self):
-        if self.response:
-            return self.response.payload
-        else:
-            return "<Not run yet>"
+        self.topic = expected["topic"]
+        self.timeout = expected.get("timeout", 1)
+        # Whether this has to be received after any messages before it
+        self.ordered = not expected.get("unordered", False)
+
+        self.payload, self.json_payload = self._get_payload_vals()
+
+        self.message = None
 
     def _get_payload_vals(self):
         # TODO move this check to initialisation/schema checking
@@ -47,40 +57,225 @@ class MQTTResponse(BaseResponse):
 
         return payload, json_payload
 
-    def _await_response(self):
-        """Actually wait for response"""
+    def check(self, msg):
+        """Check whether a message is the one that was expected
+
+        Args:
+            msg (paho.MQTTMessage): message received on a topic matching the
+                expected topic, with the payload already decoded to a string
+
+        Returns:
+            tuple(str, object): why the message didn't match (or None if it
+                did), and the payload of the message - if the payload was
+                expected to be json, this is the decoded json
+        """
+        payload = msg.payload
+
+        if self.json_payload:
+            try:
+                payload = json.loads(payload)
+            except json.decoder.JSONDecodeError:
+                return "Expected a json payload but got '{}'".format(payload), None
+
+        if self.payload is None:
+            if payload is None or payload == "":
+                logger.info(
+                    "Got message with no payload (as expected) on '%s'", msg.topic
+                )
+            else:
+                reason = "Message had payload '{}' but we expected no payload".format(
+                    payload
+                )
+                return reason, payload
+        elif self.payload is ANYTHING:
+            logger.info("Got message on %s matching !anything token", msg.topic)
+        elif payload != self.payload:
+            test_strictness = self.test_block_config["strict"]
+            block_strictness = test_strictness.setting_for("json").is_on()
+
+            if not (
+                self.json_payload
+                and values_match(self.payload, payload, strict=block_strictness)
+            ):
+                reason = "Got unexpected payload on topic '{}': '{}' (expected '{}')".format(
+                    msg.topic, payload, self.payload
+                )
+                return reason, payload
+
+            logger.info(
+                "Got expected message in '%s' with payload '%s'",
+                msg.topic,
+                Truncated(payload),
+            )
+        else:
+            logger.info(
+                "Got expected message in '%s' with payload '%s'",
+                msg.topic,
+                Truncated(payload),
+            )
+
+        return None, payload
+
+    def verify(self, response):
+        """Run any validation functions on the message which matched
+
+        Any errors are added to self.errors
+
+        Args:
+            response (paho.MQTTMessage): message which matched
+        """
+        self._maybe_run_validate_functions(response)
+
+    def get_saved(self, response):
+        """Get values to save from the message which matched
+
+        Args:
+            response (paho.MQTTMessage): message which matched
+
+        Returns:
+            dict: saved values
+        """
+        saved = {}
+
+        saved.update(
+            self.maybe_get_save_values_from_save_block("json", response.payload)
+        )
+        saved.update(self.maybe_get_save_values_from_ext(response, self.expected))
+
+        return saved
+
+
+class MQTTResponse(BaseResponse):
+    def __init__(self, client, name, expected, test_block_config):
+        super(MQTTResponse, self).__init__(name, expected, test_block_config)
+
+        self._client = client
+
+        # Either one message or a list of messages can be expected
+        if isinstance(expected, list):
+            expected_blocks = expected
+        else:
+            expected_blocks = [expected]
+
+        self._expected_messages = [
+            _ExpectedMessage(name, e, test_block_config) for e in expected_blocks
+        ]
+
+        self.received_messages = []
+
+        # A message which matches more than one subscription is received once
+        # for each of them, as the same object. Only the first delivery is
+        # checked - these are kept until the end of the stage (even if it is
+        # polled) so that the ids can't be reused by new messages.
+        self._seen = {}
+
+    def __str__(self):
+        if self.response:
+            return self.response.payload
+        else:
+            return "<Not run yet>"
 
-        # pylint: disable=too-many-statements
+    def _check_for_validate_functions(self, response_block):
+        # Done separately for each expected message
+        pass
 
-        topic = self.expected["topic"]
-        timeout = self.expected.get("timeout", 1)
+    def reset(self):
+        super(MQTTResponse, self).reset()
+
+        self.received_messages = []
+
+        for expected in self._expected_messages:
+            expected.reset()
+            expected.message = None
+
+    def _match_message(self, msg, pending, addwarning):
+        """Find which of the messages that haven't been received yet this
+        message is
+
+        Args:
+            msg (paho.MQTTMessage): message received
+            pending (list): messages which haven't been received yet, in the
+                order they were listed in the test
+            addwarning (callable): called with a warning if the message didn't
+                match anything
+
+        Returns:
+            _ExpectedMessage: message that matched, or None
+        """
+        reasons = []
 
-        test_strictness = self.test_block_config["strict"]
-        block_strictness = test_strictness.setting_for("json").is_on()
+        for i, expected in enumerate(pending):
+            if not paho.topic_matches_sub(expected.topic, msg.topic):
+                continue
 
-        expected_payload, expect_json_payload = self._get_payload_vals()
+            reason, payload = expected.check(msg)
+
+            if reason is None:
+                if expected.ordered and any(p.ordered for p in pending[:i]):
+                    reasons.append(
+                        "Got message on '{}' matching '{}', but the messages listed before it have not been received yet".format(
+                            msg.topic, expected.payload
+                        )
+                    )
+                    continue
+
+                msg.payload = payload
+                return expected
+
+            reasons.append(reason)
+
+        if not reasons:
+            reasons.append(
+                "Got unexpected message in '{}' with payload '{}'".format(
+                    msg.topic, msg.payload
+                )
+            )
+
+        for reason in reasons:
+            addwarning(reason)
+
+        return None
+
+    def _await_response(self):
+        """Actually wait for response"""
+
+        # All messages are waited for at the same time
+        timeout = max(e.timeout for e in self._expected_messages)
 
         # Any warnings to do with the request
         # eg, if a message was received but it didn't match, message had payload, etc.
         warnings = []
 
-        def addwarning(w, *args, **kwargs):
-            logger.warning(w, *args, **kwargs)
-            warnings.append(w % args)
+        def addwarning(w):
+            logger.warning(w)
+            warnings.append(w)
 
-        time_spent = 0
+        pending = list(self._expected_messages)
 
-        msg = None
+        deadline = time.monotonic() + timeout
 
-        while time_spent < timeout:
-            t0 = time.time()
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
 
-            msg = self._client.message_received(timeout - time_spent)
+            msg = self._client.message_received(
+                remaining, topic=[e.topic for e in pending]
+            )
 
             if not msg:
                 # timed out
                 break
 
+            if id(msg) in self._seen:
+                logger.debug(
+                    "Already checked message on '%s' from another subscription",
+                    msg.topic,
+                )
+                continue
+
+            self._seen[id(msg)] = msg
+
             call_hook(
                 self.test_block_config,
                 "pytest_tavern_beta_after_every_response",
@@ -88,89 +283,41 @@ class MQTTResponse(BaseResponse):
                 response=msg,
             )
 
-            self.received_messages.append(msg)
+            # The payload is decoded when checking it - don't change the
+            # message which was received, because it might still be waiting in
+            # the buffer for another subscription
+            msg = copy.copy(msg)
+            if isinstance(msg.payload, bytes):
+                msg.payload = msg.payload.decode("utf8")
 
-            msg.payload = msg.payload.decode("utf8")
+            self.received_messages.append(msg)
 
-            if expect_json_payload:
-                try:
-                    msg.payload = json.loads(msg.payload)
-                except json.decoder.JSONDecodeError:
-                    addwarning(
-                        "Expected a json payload but got '%s'",
-                        msg.payload,
-                        exc_info=True,
-                    )
-                    msg = None
-                    continue
+            matched = self._match_message(msg, pending, addwarning)
 
-            if expected_payload is None:
-                # pylint: disable=no-else-break
-                if msg.payload is None or msg.payload == "":
-                    logger.info(
-                        "Got message with no payload (as expected) on '%s'", topic
-                    )
-                    break
-                else:
-                    addwarning(
-                        "Message had payload '%s' but we expected no payload",
-                        msg.payload,
-                    )
-            elif expected_payload is ANYTHING:
-                logger.info("Got message on %s matching !anything token", topic)
-                break
-            elif msg.payload != expected_payload:
-                if expect_json_payload:
-                    try:
-                        check_keys_match_recursive(
-                            expected_payload, msg.payload, [], strict=block_strictness
-                        )
-                    except exceptions.KeyMismatchError:
-                        # Just want to log the mismatch
-                        pass
-                    else:
-                        logger.info(
-                            "Got expected message in '%s' with payload '%s'",
-                            msg.topic,
-                            msg.payload,
-                        )
-                        break
+            if matched is not None:
+                matched.message = msg
+                pending.remove(matched)
 
-                addwarning(
-                    "Got unexpected payload on topic '%s': '%s' (expected '%s')",
-                    msg.topic,
-                    msg.payload,
-                    expected_payload,
-                )
-            elif msg.topic != topic:
-                addwarning(
-                    "Got unexpected message in '%s' with payload '%s'",
-                    msg.topic,
-                    msg.payload,
+        for expected in self._expected_messages:
+            if expected.message is None:
+                self._adderr(
+                    "Expected '%s' on topic '%s' but no such message received",
+                    expected.payload,
+                    expected.topic,
                 )
             else:
-                logger.info(
-                    "Got expected message in '%s' with payload '%s'",
-                    msg.topic,
-                    msg.payload,
-                )
-                break
+                expected.verify(expected.message)
+                self.errors.extend(expected.errors)
 
-            msg = None
-            time_spent += time.time() - t0
-
-        if msg:
-            self._maybe_run_validate_functions(msg)
-        else:
-            self._adderr(
-                "Expected '%s' on topic '%s' but no such message received",
-                expected_payload,
-                topic,
-            )
+        for topic in sorted({e.topic for e in self._expected_messages}):
+            try:
+                self._client.check_overflow(topic)
+            except exceptions.MQTTBufferOverflowError as e:
+                self._adderr("%s", e, e=e)
 
         if self.errors:
             if warnings:
-                self._adderr("\n".join(warnings))
+                self._adderr("%s", "\n".join(warnings))
 
             raise exceptions.TestFailError(
                 "Test '{:s}' failed:\n{:s}".format(self.name, self._str_errors()),
@@ -179,9 +326,9 @@ class MQTTResponse(BaseResponse):
 
         saved = {}
 
-        saved.update(self.maybe_get_save_values_from_save_block("json", msg.payload))
-
-        saved.update(self.maybe_get_save_values_from_ext(msg, self.expected))
+        with self.timings.phase("save"):
+            for expected in self._expected_messages:
+                saved.update(expected.get_saved(expected.message))
 
         return saved
 
@@ -194,7 +341,10 @@ class MQTTResponse(BaseResponse):
 
         self.response = response
 
-        try:
-            return self._await_response()
-        finally:
-            self._client.unsubscribe_all()
+        return self._await_response()
+
+    def close(self):
+        # Not done after each verify, so that messages can still be received if
+        # the stage is polled
+        self._client.unsubscribe_all()
+        self._seen.clear()
@@ -6,6 +6,7 @@ import yaml
 from tavern.util.dict_util import format_keys
 
 from .client import MQTTClient
+from .pool import shared_clients
 from .request import MQTTRequest
 from .response import MQTTResponse
 
@@ -14,6 +15,15 @@ logger = logging.getLogger(__name__)
 
 session_type = MQTTClient
 
+
+def get_session(test_block_config, **kwargs):
+    if test_block_config.get("mqtt_pool"):
+        logger.debug("Using shared MQTT connection")
+        return shared_clients.get(**kwargs)
+
+    return MQTTClient(**kwargs)
+
+
 request_type = MQTTRequest
 request_block_name = "mqtt_publish"
 
@@ -25,7 +35,14 @@ def get_expected_from_request(stage, test_block_config, session):
         # format so we can subscribe to the right topic
         f_expected = format_keys(m_expected, test_block_config["variables"])
         mqtt_client = session
-        mqtt_client.subscribe(f_expected["topic"], f_expected.get("qos", 1))
+
+        # Either one message or a list of messages can be expected
+        if isinstance(f_expected, list):
+            for message in f_expected:
+                mqtt_client.subscribe(message["topic"], message.get("qos", 1))
+        else:
+            mqtt_client.subscribe(f_expected["topic"], f_expected.get("qos", 1))
+
         expected = f_expected
     else:
         expected = {}
@@ -0,0 +1,87 @@
+"""Connection pools which are shared between tests
+
+Normally every test gets a new requests.Session, which means a new connection
+(and TLS handshake) to the server for every test. When pooling is enabled
+every test still gets its own session, so cookies and auth are not shared
+between tests, but they all send requests through the same connection pools.
+"""
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class _AdapterCache(object):
+    """Transport adapters for each set of pool settings, shared by every
+    PooledSession in this process"""
+
+    def __init__(self):
+        self._adapters = {}
+        self._lock = threading.Lock()
+
+    def get(self, pool_connections, pool_maxsize, pool_block):
+        """Get a shared adapter with these pool settings
+
+        Args:
+            pool_connections (int): number of hosts to keep connection pools for
+            pool_maxsize (int): number of connections to keep open to each host
+            pool_block (bool): wait for a connection to become free instead of
+                opening another one when there are already pool_maxsize
+                connections open to a host
+
+        Returns:
+            HTTPAdapter: shared adapter
+        """
+        key = (pool_connections, pool_maxsize, pool_block)
+
+        with self._lock:
+            try:
+                return self._adapters[key]
+            except KeyError:
+                logger.debug(
+                    "Creating shared connection pool (connections=%d, maxsize=%d, block=%s)",
+                    *key
+                )
+
+                adapter = HTTPAdapter(
+                    pool_connections=pool_connections,
+                    pool_maxsize=pool_maxsize,
+                    pool_block=pool_block,
+                )
+                self._adapters[key] = adapter
+
+                return adapter
+
+    def close(self):
+        with self._lock:
+            for adapter in self._adapters.values():
+                adapter.close()
+
+            self._adapters.clear()
+
+
+shared_adapters = _AdapterCache()
+
+
+class PooledSession(requests.Session):
+    """requests.Session which sends requests through shared connection pools
+
+    Args:
+        pool_settings (dict): keyword arguments for _AdapterCache.get
+    """
+
+    def __init__(self, pool_settings, **kwargs):
+        super(PooledSession, self).__init__(**kwargs)
+
+        adapter = shared_adapters.get(**pool_settings)
+
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def close(self):
+        # Other sessions are still using the connections, so don't close the
+        # adapters like a normal session would
+        pass
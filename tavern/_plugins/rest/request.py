@@ -5,6 +5,7 @@ import json
 import logging
 import mimetypes
 import os
+import time
 from urllib.parse import quote_plus
 import warnings
 
@@ -17,6 +18,10 @@ from tavern.request.base import BaseRequest
 from tavern.schemas.extensions import get_wrapped_create_function
 from tavern.util import exceptions
 from tavern.util.dict_util import check_expected_keys, deep_dict_merge, format_keys
+from tavern.util.log_util import Truncated
+from tavern.util.timing import get_stage_timings
+
+from . import upload as upload_body
 
 logger = logging.getLogger(__name__)
 
@@ -98,6 +103,14 @@ def get_request_args(rspec, test_block_config):
     if send_in_body:
         request_args["file_body"] = send_in_body
 
+    upload = fspec.get("upload")
+    if upload is not None:
+        if not (send_in_body or fspec.get("files")):
+            logger.warning(
+                "'upload' was specified but there are no files being sent - it will be ignored"
+            )
+        request_args["upload"] = upload
+
     def add_request_args(keys, optional):
         for key in keys:
             try:
@@ -321,6 +334,32 @@ def _read_filespec(filespec):
         )
 
 
+def _get_file_details(filespec):
+    """Get the path, name, content type, and encoding of a file to upload
+
+    Args:
+        filespec: file specification - see _read_filespec
+
+    Returns:
+        tuple: (file path, file name, content type, content encoding). Content
+            type and encoding are guessed from the file name if they were not
+            specified.
+    """
+    if not mimetypes.inited:
+        mimetypes.init()
+
+    filepath, content_type, encoding = _read_filespec(filespec)
+
+    filename = os.path.basename(filepath)
+
+    # Try to guess as well, but don't override what the user specified
+    guessed_content_type, guessed_encoding = mimetypes.guess_type(filepath)
+    content_type = content_type or guessed_content_type
+    encoding = encoding or guessed_encoding
+
+    return filepath, filename, content_type, encoding
+
+
 def _get_file_arguments(request_args, stack):
     """Get corect arguments for anything that should be passed as a file to
     requests
@@ -336,21 +375,11 @@ def _get_file_arguments(request_args, stack):
     files_to_send = {}
 
     for key, filespec in request_args.get("files", {}).items():
-        if not mimetypes.inited:
-            mimetypes.init()
-
-        filepath, content_type, encoding = _read_filespec(filespec)
-
-        filename = os.path.basename(filepath)
+        filepath, filename, content_type, encoding = _get_file_details(filespec)
 
         # a 2-tuple ('filename', fileobj)
         file_spec = [filename, stack.enter_context(open(filepath, "rb"))]
 
-        # Try to guess as well, but don't override what the user specified
-        guessed_content_type, guessed_encoding = mimetypes.guess_type(filepath)
-        content_type = content_type or guessed_content_type
-        encoding = encoding or guessed_encoding
-
         # If it doesn't have a mimetype, or can't guess it, don't
         # send the content type for the file
         if content_type:
@@ -373,6 +402,110 @@ def _get_file_arguments(request_args, stack):
         return {}
 
 
+def _get_upload_arguments(request_args, file_body, upload, stack):
+    """Get arguments to send files in the body of the request without reading
+    them into memory first
+
+    Args:
+        request_args (dict): arguments for requests
+        file_body (str): path to file to send as the body, if any
+        upload (dict): 'upload' block from the request, if any
+        stack (ExitStack): context stack to add the body to so the files are
+            closed after use
+
+    Returns:
+        dict: arguments to update request_args with
+
+    Raises:
+        BadSchemaError: data sent with files was not a mapping of form fields
+    """
+    upload = upload or {}
+
+    options = {
+        "chunk_size": int(upload.get("chunk_size", upload_body.DEFAULT_CHUNK_SIZE)),
+        "chunked": bool(upload.get("chunked", False)),
+        "use_mmap": bool(upload.get("mmap", False)),
+    }
+
+    if file_body:
+        body = upload_body.file_body(file_body, **options)
+        stack.callback(body.close)
+        return {"data": body}
+
+    fields = request_args.get("data")
+    if fields is not None and not isinstance(fields, dict):
+        raise exceptions.BadSchemaError(
+            "'data' sent with files must be a mapping of form fields"
+        )
+
+    files = []
+    for key, filespec in request_args["files"].items():
+        filepath, filename, content_type, encoding = _get_file_details(filespec)
+        headers = {"Content-Encoding": encoding} if encoding else None
+        files.append((key, filename, filepath, content_type, headers))
+
+    body = upload_body.multipart_body(fields, files, **options)
+    stack.callback(body.close)
+
+    headers = dict(request_args.get("headers") or {})
+    headers["Content-Type"] = body.content_type
+
+    return {"data": body, "files": None, "headers": headers}
+
+
+def _record_upload_timings(timings, body):
+    """Record how long it took to send the body of a request, if it was sent
+    with _get_upload_arguments
+
+    Args:
+        timings (Timings): timings for the current stage
+        body (object): body that was sent
+
+    Returns:
+        float: time spent sending the body, in seconds
+    """
+    if not isinstance(body, upload_body.UploadBody) or body.elapsed is None:
+        return 0.0
+
+    timings.add_transfer("upload", body.sent, body.elapsed)
+
+    logger.debug(
+        "Uploaded %d bytes in %.3f seconds (%s bytes/second)",
+        body.sent,
+        body.elapsed,
+        timings.throughput("upload"),
+    )
+
+    return body.elapsed
+
+
+def _record_response_timings(timings, response, headers_received, uploading=0.0):
+    """Split the time spent making a request into waiting for the response and
+    downloading the body
+
+    Anything left over is counted as time spent sending the request.
+
+    Args:
+        timings (Timings): timings for the current stage
+        response (requests.Response): final response
+        headers_received (list): times when the headers of each response
+            (including any redirects) were read
+        uploading (float): time spent sending the request body, which has
+            already been recorded
+    """
+    if not headers_received:
+        # Session doesn't support response hooks
+        return
+
+    finished = time.perf_counter()
+
+    # Time from sending each request until its headers were read
+    waiting = sum((r.elapsed for r in response.history), response.elapsed)
+
+    timings.add("first_byte", max(waiting.total_seconds() - uploading, 0.0))
+    timings.add("download", finished - headers_received[-1])
+
+
 class RestRequest(BaseRequest):
     def __init__(self, session, rspec, test_block_config):
         """Prepare request
@@ -404,6 +537,7 @@ class RestRequest(BaseRequest):
             "verify",
             "files",
             "file_body",
+            "upload",
             "stream",
             "timeout",
             "cookies",
@@ -418,6 +552,7 @@ class RestRequest(BaseRequest):
 
         # Used further down, but pop it asap to avoid unwanted side effects
         file_body = request_args.pop("file_body", None)
+        upload = request_args.pop("upload", None)
 
         # If there was a 'cookies' key, set it in the request
         expected_cookies = _read_expected_cookies(session, rspec, test_block_config)
@@ -430,10 +565,19 @@ class RestRequest(BaseRequest):
             allow_redirects=_check_allow_redirects(rspec, test_block_config)
         )
 
-        logger.debug("Request args: %s", request_args)
+        logger.debug("Request args: %s", Truncated(request_args))
 
         self._request_args = request_args
 
+        timings = get_stage_timings(test_block_config)
+        headers_received = []
+
+        def record_headers_received(response, *args, **kwargs):
+            # pylint: disable=unused-argument
+            # Called after the headers have been read but before the body is
+            # downloaded
+            headers_received.append(time.perf_counter())
+
         # There is no way using requests to make a prepared request that will
         # not follow redirects, so instead we have to do this. This also means
         # that we can't have the 'pre-request' hook any more because we don't
@@ -446,22 +590,33 @@ class RestRequest(BaseRequest):
                 stack.enter_context(_set_cookies_for_request(session, request_args))
 
                 # These are mutually exclusive
-                if file_body:
-                    file = stack.enter_context(open(file_body, "rb"))
-                    request_args.update(data=file)
+                if file_body or (upload is not None and request_args.get("files")):
+                    send_args = dict(
+                        request_args,
+                        **_get_upload_arguments(request_args, file_body, upload, stack)
+                    )
                 else:
-                    self._request_args.update(_get_file_arguments(request_args, stack))
+                    # Open the files for each request, without keeping the
+                    # file objects in request_args - they are closed at the end
+                    # of this request, and the stage may be polled
+                    send_args = dict(
+                        request_args, **_get_file_arguments(request_args, stack)
+                    )
 
-                return session.request(**self._request_args)
+                response = session.request(
+                    hooks={"response": record_headers_received}, **send_args
+                )
+
+                uploading = _record_upload_timings(timings, send_args.get("data"))
+                _record_response_timings(timings, response, headers_received, uploading)
+
+                return response
 
         self._prepared = prepared_request
 
     def run(self):
         """ Runs the prepared request and times it
 
-        Todo:
-            time it
-
         Returns:
             requests.Response: response object
         """
@@ -2,16 +2,125 @@ import json
 import logging
 from urllib.parse import parse_qs, urlparse
 
+import requests
 from requests.status_codes import _codes
 
 from tavern.response.base import BaseResponse, indent_err_text
 from tavern.testutils.pytesthook.newhooks import call_hook
 from tavern.util import exceptions
 from tavern.util.dict_util import deep_dict_merge
+from tavern.util.log_util import Truncated, lazy
+
+from .stream import StreamChecker
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
 
+_NOT_DECODED = object()
+
+
+def _decode_json(response):
+    """Decode the body of a response as json, using orjson if it is installed
+
+    orjson only accepts utf-8 and is stricter than the json module (eg, it
+    won't load NaN), so if it fails the response is decoded as normal. It is
+    only used for plain requests responses, where json() is known to just
+    decode 'content' (a subclass or another backend might do something else).
+
+    Raises:
+        ValueError: body was not valid json
+    """
+    # pylint: disable=unidiomatic-typecheck
+    if orjson is not None and type(response) is requests.Response and response.content:
+        try:
+            return orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            pass
+
+    return response.json()
+
+
+def _format_block(block, name):
+    """Format part of a response to be logged, one item per line"""
+    lines = [name + ":"]
+
+    if isinstance(block, list):
+        lines.extend("  - {}".format(v) for v in block)
+    elif isinstance(block, dict):
+        lines.extend("  {}: {}".format(k, v) for k, v in block.items())
+    else:
+        lines.append(" {}".format(block))
+
+    return "\n".join(lines)
+
+
+def _parse_query_params(url):
+    """Get the query parameters from a url, with only the first value of each"""
+    return {i: j[0] for i, j in parse_qs(urlparse(url).query).items()}
+
+
+class ParsedResponse(object):
+    """Wraps a response so that the body is only decoded once
+
+    The body is decoded the first time json() is called, and the same object
+    is returned every time after that. This object is passed to all
+    validation/save functions, so they should not modify the result of json().
+
+    Anything else is passed through to the wrapped response.
+
+    Args:
+        response (requests.Response): response to wrap
+    """
+
+    def __init__(self, response):
+        self._response = response
+        self._json = _NOT_DECODED
+        self._json_error = None
+
+    @property
+    def response(self):
+        """The wrapped response"""
+        return self._response
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def __bool__(self):
+        return bool(self._response)
+
+    def __repr__(self):
+        return repr(self._response)
+
+    def json(self, **kwargs):
+        """Decoded json body of the response
+
+        Any keyword arguments are passed to the json() method of the wrapped
+        response, in which case the body is decoded again.
+
+        Raises:
+            ValueError: body was not valid json
+        """
+        if kwargs:
+            return self._response.json(**kwargs)
+
+        if self._json_error is not None:
+            raise self._json_error
+
+        if self._json is _NOT_DECODED:
+            try:
+                self._json = _decode_json(self._response)
+            except ValueError as e:
+                self._json_error = e
+                raise
+
+        return self._json
+
+
 class RestResponse(BaseResponse):
     def __init__(self, session, name, expected, test_block_config):
         # pylint: disable=unused-argument
@@ -24,6 +133,20 @@ class RestResponse(BaseResponse):
 
         self.status_code = None
 
+        # The body is checked while it is downloaded instead of being decoded
+        if "stream" in self.expected:
+            self._stream_checker = StreamChecker(
+                self.expected["stream"],
+                test_block_config["strict"].setting_for("json").is_on(),
+            )
+
+            if "json" in self.expected or "json" in self.expected.get("save", {}):
+                raise exceptions.BadSchemaError(
+                    "Can't use 'json' with a streamed response body - use 'items' and 'save' in the 'stream' block instead"
+                )
+        else:
+            self._stream_checker = None
+
         def check_code(code):
             if int(code) not in _codes:
                 logger.warning("Unexpected status code '%s'", code)
@@ -45,37 +168,67 @@ class RestResponse(BaseResponse):
             return "<Not run yet>"
 
     def _verbose_log_response(self, response):
-        """Verbosely log the response object, with query params etc."""
+        """Verbosely log the response object, with query params etc.
+
+        Building these log messages means going through the whole response, so
+        it is only done if debug logging is enabled. The body of a streamed
+        response is never logged here, because that would mean reading all of
+        it into memory.
+        """
 
         logger.info("Response: '%s'", response)
 
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+
         def log_dict_block(block, name):
             if block:
-                to_log = name + ":"
-
-                if isinstance(block, list):
-                    for v in block:
-                        to_log += "\n  - {}".format(v)
-                elif isinstance(block, dict):
-                    for k, v in block.items():
-                        to_log += "\n  {}: {}".format(k, v)
-                else:
-                    to_log += "\n {}".format(block)
-                logger.debug(to_log)
+                logger.debug("%s", lazy(_format_block, block, name))
 
         log_dict_block(response.headers, "Headers")
 
-        try:
-            log_dict_block(response.json(), "Body")
-        except ValueError:
-            pass
+        if self._stream_checker is None:
+            try:
+                log_dict_block(response.json(), "Body")
+            except ValueError:
+                pass
 
-        redirect_query_params = self._get_redirect_query_params(response)
-        if redirect_query_params:
-            parsed_url = urlparse(response.headers["location"])
-            to_path = "{0}://{1}{2}".format(*parsed_url)
-            logger.debug("Redirect location: %s", to_path)
-            log_dict_block(redirect_query_params, "Redirect URL query parameters")
+        redirect_url = response.headers.get("location")
+        if redirect_url:
+            redirect_query_params = _parse_query_params(redirect_url)
+            if redirect_query_params:
+                parsed_url = urlparse(redirect_url)
+                to_path = "{0}://{1}{2}".format(*parsed_url)
+                logger.debug("Redirect location: %s", to_path)
+                log_dict_block(redirect_query_params, "Redirect URL query parameters")
+
+    def reset(self):
+        super(RestResponse, self).reset()
+
+        self.status_code = None
+
+        if self._stream_checker is not None:
+            self._stream_checker.reset()
+
+    def _check_stream(self, response):
+        """Read the body of a streamed response and check it as it is read
+
+        If the status code or headers were wrong, the body is not read at all.
+
+        Args:
+            response (requests.Response): response which hasn't had its body
+                read yet
+        """
+        if self.errors:
+            logger.info("Not reading body of response which has already failed")
+            response.close()
+            return
+
+        with self.timings.phase("download"):
+            self._stream_checker.check(response.response)
+
+        for error in self._stream_checker.errors:
+            self._adderr("%s", error)
 
     def _get_redirect_query_params(self, response):
         """If there was a redirect header, get any query parameters from it
@@ -92,9 +245,7 @@ class RestResponse(BaseResponse):
                 )
             redirect_query_params = {}
         else:
-            parsed = urlparse(redirect_url)
-            qp = parsed.query
-            redirect_query_params = {i: j[0] for i, j in parse_qs(qp).items()}
+            redirect_query_params = _parse_query_params(redirect_url)
 
         return redirect_query_params
 
@@ -140,6 +291,9 @@ class RestResponse(BaseResponse):
         Raises:
             TestFailError: Something went wrong with validating the response
         """
+        # Validation/save functions all use the same decoded body
+        response = ParsedResponse(response)
+
         self._verbose_log_response(response)
 
         call_hook(
@@ -153,10 +307,14 @@ class RestResponse(BaseResponse):
         self.status_code = response.status_code
 
         # Get things to use from the response
-        try:
-            body = response.json()
-        except ValueError:
+        if self._stream_checker is not None:
+            # Not read until the status code and headers have been checked
             body = None
+        else:
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
 
         redirect_query_params = self._get_redirect_query_params(response)
 
@@ -167,22 +325,29 @@ class RestResponse(BaseResponse):
         self._validate_block("headers", response.headers)
         self._validate_block("redirect_query_params", redirect_query_params)
 
+        if self._stream_checker is not None:
+            self._check_stream(response)
+
         self._maybe_run_validate_functions(response)
 
         # Get any keys to save
         saved = {}
 
-        saved.update(self.maybe_get_save_values_from_save_block("json", body))
-        saved.update(
-            self.maybe_get_save_values_from_save_block("headers", response.headers)
-        )
-        saved.update(
-            self.maybe_get_save_values_from_save_block(
-                "redirect_query_params", redirect_query_params
+        with self.timings.phase("save"):
+            saved.update(self.maybe_get_save_values_from_save_block("json", body))
+            saved.update(
+                self.maybe_get_save_values_from_save_block("headers", response.headers)
+            )
+            saved.update(
+                self.maybe_get_save_values_from_save_block(
+                    "redirect_query_params", redirect_query_params
+                )
             )
-        )
 
-        saved.update(self.maybe_get_save_values_from_ext(response, self.expected))
+            saved.update(self.maybe_get_save_values_from_ext(response, self.expected))
+
+            if self._stream_checker is not None:
+                saved.update(self._stream_checker.saved)
 
         # Check cookies
         for cookie in self.expected.get("cookies", []):
@@ -219,7 +384,9 @@ class RestResponse(BaseResponse):
             block = {i.lower(): j for i, j in block.items()}
             expected_block = {i.lower(): j for i, j in expected_block.items()}
 
-        logger.debug("Validating response %s against %s", blockname, expected_block)
+        logger.debug(
+            "Validating response %s against %s", blockname, Truncated(expected_block)
+        )
 
         test_strictness = self.test_block_config["strict"]
         block_strictness = test_strictness.setting_for(blockname).is_on()
@@ -0,0 +1,531 @@
+"""Check the body of a response while it is being downloaded
+
+Normally the whole body of a response is read into memory and decoded before
+it is checked. For very large responses (exports, etc.) the 'stream' block in
+the response can be used instead, which reads the body in chunks and checks it
+as it goes, so only one item of the body needs to be in memory at once.
+
+The body can be read as:
+
+- raw: not parsed at all, only the size and digests of the body are checked
+- ndjson: one json value per line
+- json: a json array, with each element of the array checked separately
+"""
+import codecs
+import collections
+import hashlib
+import json
+import logging
+
+import jmespath
+import requests
+
+from tavern.util import exceptions
+from tavern.util.dict_util import check_keys_match_recursive
+from tavern.util.jmespath_util import compile_query
+from tavern.util.log_util import Truncated
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("raw", "ndjson", "json")
+
+CHUNK_SIZE = 64 * 1024
+
+# Only the first few items which don't match are reported, so a body with
+# millions of bad items doesn't mean keeping millions of error messages
+MAX_ITEM_ERRORS = 10
+
+_NUMBER_CHARS = "0123456789+-.eE"
+
+# Errors from the connection while the body is being read (eg, the server
+# closing it part way through)
+_DOWNLOAD_ERRORS = (requests.RequestException,)
+if httpx is not None:
+    _DOWNLOAD_ERRORS += (httpx.HTTPError,)
+
+
+class _BodyTooLarge(Exception):
+    """Raised to stop reading the body when it is larger than allowed"""
+
+
+def iter_chunks(response, chunk_size=CHUNK_SIZE):
+    """Iterate over the body of a response without reading all of it first
+
+    Args:
+        response (requests.Response, httpx.Response): response
+        chunk_size (int): how much to read at once
+
+    Returns:
+        iterator: chunks of the body, as bytes
+    """
+    iter_content = getattr(response, "iter_content", None)
+    if iter_content is not None:
+        return iter_content(chunk_size)
+
+    return response.iter_bytes(chunk_size)
+
+
+def iter_lines(chunks):
+    """Split a body into lines
+
+    Args:
+        chunks (iterable): chunks of the body
+
+    Yields:
+        bytes: each non-empty line in the body, without the line ending
+    """
+    parts = []
+
+    for chunk in chunks:
+        start = 0
+
+        while True:
+            end = chunk.find(b"\n", start)
+            if end == -1:
+                parts.append(chunk[start:])
+                break
+
+            parts.append(chunk[start:end])
+            line = b"".join(parts)
+            parts = []
+
+            if line.strip():
+                yield line
+
+            start = end + 1
+
+    line = b"".join(parts)
+    if line.strip():
+        yield line
+
+
+def _loads(line):
+    if orjson is not None:
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError:
+            # Give the same error as the json module would
+            pass
+
+    return json.loads(line)
+
+
+def iter_ndjson(chunks):
+    """Decode a body containing one json value per line
+
+    Args:
+        chunks (iterable): chunks of the body
+
+    Yields:
+        object: each value in the body
+
+    Raises:
+        ValueError: a line was not valid json
+    """
+    for lineno, line in enumerate(iter_lines(chunks), 1):
+        try:
+            yield _loads(line)
+        except ValueError as e:
+            raise ValueError("line {} is not valid json: {}".format(lineno, e)) from e
+
+
+def iter_json_array(chunks):
+    """Decode a body containing a json array, one element at a time
+
+    Args:
+        chunks (iterable): chunks of the body
+
+    Yields:
+        object: each element of the array
+
+    Raises:
+        ValueError: body was not a valid json array
+    """
+    # pylint: disable=too-many-branches
+
+    chunks = iter(chunks)
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+
+    # Text which has been read but not decoded yet starts at buf[pos]
+    buf = ""
+    pos = 0
+    exhausted = False
+
+    def fill(minimum=1):
+        """Read more of the body
+
+        Args:
+            minimum (int): read at least this many more characters, unless the
+                end of the body is reached first
+
+        Returns:
+            bool: whether there was anything more to read
+        """
+        nonlocal buf, pos, exhausted
+
+        parts = [buf[pos:]]
+        read = 0
+
+        while not exhausted and read < minimum:
+            try:
+                text = text_decoder.decode(next(chunks))
+            except StopIteration:
+                text = text_decoder.decode(b"", final=True)
+                exhausted = True
+
+            parts.append(text)
+            read += len(text)
+
+        if not read:
+            return False
+
+        buf = "".join(parts)
+        pos = 0
+        return True
+
+    def peek():
+        """Skip whitespace and get the next character, or None at the end of the
+        body"""
+        nonlocal pos
+
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+
+            if pos < len(buf):
+                return buf[pos]
+
+            if not fill():
+                return None
+
+    if peek() != "[":
+        raise ValueError("body is not a json array")
+
+    pos += 1
+
+    if peek() == "]":
+        pos += 1
+    else:
+        while True:
+            # raw_decode doesn't skip whitespace
+            peek()
+
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError as e:
+                    # Might just be the end of the chunk. Read at least as much
+                    # again as is already waiting to be decoded before trying
+                    # again, so that an element much larger than a chunk isn't
+                    # decoded from the start again after every chunk
+                    if not fill(max(len(buf) - pos, 1)):
+                        raise ValueError("invalid json in array: {}".format(e)) from e
+                    continue
+
+                # A number at the end of the chunk might carry on in the next one
+                if (
+                    isinstance(value, (int, float))
+                    and not isinstance(value, bool)
+                    and buf[end:].strip(_NUMBER_CHARS) == ""
+                    and fill()
+                ):
+                    continue
+
+                break
+
+            pos = end
+            yield value
+
+            following = peek()
+            if following == ",":
+                pos += 1
+            elif following == "]":
+                pos += 1
+                break
+            else:
+                raise ValueError(
+                    "expected ',' or ']' after array element but got {}".format(
+                        "end of body" if following is None else repr(following)
+                    )
+                )
+
+    if peek() is not None:
+        raise ValueError("unexpected data after end of json array")
+
+
+class _BodyReader(object):
+    """Reads the body of a response, keeping track of its size and digests
+
+    Args:
+        chunks (iterable): chunks of the body
+        max_size (int, optional): maximum size of the body in bytes
+        digests (list): names of hashlib algorithms to calculate digests with
+    """
+
+    def __init__(self, chunks, max_size=None, digests=()):
+        self.size = 0
+
+        self._chunks = chunks
+        self._max_size = max_size
+        self._hashes = {name: hashlib.new(name) for name in digests}
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            if not chunk:
+                continue
+
+            self.size += len(chunk)
+
+            if self._max_size is not None and self.size > self._max_size:
+                raise _BodyTooLarge(
+                    "Body was larger than the maximum size of {} bytes".format(
+                        self._max_size
+                    )
+                )
+
+            for hasher in self._hashes.values():
+                hasher.update(chunk)
+
+            yield chunk
+
+    def hexdigest(self, name):
+        return self._hashes[name].hexdigest()
+
+
+class StreamChecker(object):
+    """Checks the body of a response against a 'stream' block
+
+    Args:
+        spec (dict): 'stream' block from the expected response
+        strict (bool): whether extra keys in items are an error
+
+    Attributes:
+        errors (list): why the body didn't match
+        saved (dict): values saved from the body
+        size (int): size of the body that was read, in bytes
+        count (int): number of items in the body
+
+    Raises:
+        BadSchemaError: invalid stream block
+    """
+
+    def __init__(self, spec, strict):
+        def maybe_int(key):
+            # Might have been formatted into a string
+            value = spec.get(key)
+            return None if value is None else int(value)
+
+        self._format = spec.get("format", "raw")
+        self._max_size = maybe_int("max_size")
+        self._count = maybe_int("count")
+        self._items = spec.get("items")
+        self._digests = spec.get("digest", {})
+        self._save = spec.get("save", {})
+        self._strict = strict
+
+        if self._format not in FORMATS:
+            raise exceptions.BadSchemaError(
+                "Stream format must be one of {}".format(FORMATS)
+            )
+
+        if self._format == "raw":
+            for key in ["count", "items", "save"]:
+                if key in spec:
+                    raise exceptions.BadSchemaError(
+                        "Can't use '{}' with a raw stream - the body must be json or ndjson".format(
+                            key
+                        )
+                    )
+
+        for name in self._digests:
+            try:
+                hashlib.new(name)
+            except ValueError as e:
+                raise exceptions.BadSchemaError(
+                    "Unknown digest algorithm '{}'".format(name)
+                ) from e
+
+        # Compiled up front so an invalid query is reported before the body is
+        # downloaded
+        self._queries = {}
+        for save_as, save_spec in self._save.items():
+            query = save_spec.get("query")
+            if query is None:
+                continue
+
+            try:
+                self._queries[save_as] = compile_query(query)
+            except jmespath.exceptions.ParseError as e:
+                raise exceptions.BadSchemaError(
+                    "Invalid JMES query '{}' to save '{}' from stream".format(
+                        query, save_as
+                    )
+                ) from e
+
+        self._save_positive = collections.defaultdict(list)
+        self._save_negative = {}
+        for save_as, save_spec in self._save.items():
+            index = int(save_spec["item"])
+            if index >= 0:
+                self._save_positive[index].append(save_as)
+            else:
+                self._save_negative[save_as] = index
+
+        # Only need to keep enough items from the end to save from
+        self._tail_length = max([-i for i in self._save_negative.values()], default=0)
+
+        self.reset()
+
+    def reset(self):
+        """Forget anything from checking a previous body, so another one can be
+        checked"""
+        self._tail = collections.deque(maxlen=self._tail_length)
+
+        self.errors = []
+        self.saved = {}
+        self.size = 0
+        self.count = 0
+
+        self._item_errors = 0
+
+    def _iter_items(self, body):
+        if self._format == "ndjson":
+            return iter_ndjson(body)
+        if self._format == "json":
+            return iter_json_array(body)
+
+        # Raw bodies are only read, not decoded
+        for _ in body:
+            pass
+
+        return iter(())
+
+    def _save_value(self, save_as, item):
+        compiled = self._queries.get(save_as)
+
+        if compiled is None:
+            self.saved[save_as] = item
+            return
+
+        save_spec = self._save[save_as]
+
+        try:
+            value = compiled.search(item)
+        except jmespath.exceptions.JMESPathError as e:
+            # eg. using a function on the wrong type of value
+            self.errors.append(
+                "Error searching for '{}' in item {}: {}".format(
+                    save_spec["query"], int(save_spec["item"]), e
+                )
+            )
+            return
+
+        if value is None:
+            self.errors.append(
+                "Wanted to save '{}' from item {}, but it did not exist".format(
+                    save_spec["query"], int(save_spec["item"])
+                )
+            )
+            return
+
+        self.saved[save_as] = value
+
+    def _check_item(self, index, item):
+        if self._items is not None:
+            try:
+                check_keys_match_recursive(self._items, item, [], self._strict)
+            except exceptions.KeyMismatchError as e:
+                self._item_errors += 1
+
+                if self._item_errors <= MAX_ITEM_ERRORS:
+                    self.errors.append("Item {}: {}".format(index, e.args[0]))
+
+        for save_as in self._save_positive.get(index, []):
+            self._save_value(save_as, item)
+
+        if self._tail.maxlen:
+            self._tail.append(item)
+
+    def check(self, response):
+        """Read the body of the response and check it
+
+        Args:
+            response (requests.Response, httpx.Response): response which hasn't
+                had its body read yet
+        """
+        body = _BodyReader(iter_chunks(response), self._max_size, self._digests)
+
+        try:
+            for index, item in enumerate(self._iter_items(body)):
+                logger.debug("Item %d in body: %s", index, Truncated(item))
+                self._check_item(index, item)
+                self.count += 1
+        except _BodyTooLarge as e:
+            self.errors.append(str(e))
+            return
+        except _DOWNLOAD_ERRORS as e:
+            logger.exception("Error reading body of response")
+            self.errors.append(
+                "Error reading body after {} bytes: {}".format(body.size, e)
+            )
+            return
+        except ValueError as e:
+            self.errors.append("Invalid {} body: {}".format(self._format, e))
+            return
+        finally:
+            self.size = body.size
+            response.close()
+
+        logger.debug("Read %d bytes (%d items) from body", self.size, self.count)
+
+        if self._item_errors > MAX_ITEM_ERRORS:
+            self.errors.append(
+                "...and {} more items did not match".format(
+                    self._item_errors - MAX_ITEM_ERRORS
+                )
+            )
+
+        if self._count is not None and self.count != self._count:
+            self.errors.append(
+                "Expected {} items in body but got {}".format(self._count, self.count)
+            )
+
+        for name, expected_digest in self._digests.items():
+            actual_digest = body.hexdigest(name)
+            if actual_digest != expected_digest.lower():
+                self.errors.append(
+                    "{} digest of body was {}, expected {}".format(
+                        name, actual_digest, expected_digest
+                    )
+                )
+
+        tail = list(self._tail)
+        for save_as, index in self._save_negative.items():
+            if -index > len(tail):
+                self.errors.append(
+                    "Wanted to save item {}, but there were only {} items".format(
+                        index, self.count
+                    )
+                )
+            else:
+                self._save_value(save_as, tail[index])
+
+        for index, names in self._save_positive.items():
+            if index >= self.count:
+                for save_as in names:
+                    self.errors.append(
+                        "Wanted to save '{}' from item {}, but there were only {} items".format(
+                            save_as, index, self.count
+                        )
+                    )
@@ -6,6 +6,7 @@ from tavern.plugins import PluginHelperBase
 from tavern.util import exceptions
 from tavern.util.dict_util import format_keys
 
+from .pool import PooledSession
 from .request import RestRequest
 from .response import RestResponse
 
@@ -15,6 +16,15 @@ logger = logging.getLogger(__name__)
 class TavernRestPlugin(PluginHelperBase):
     session_type = requests.Session
 
+    @staticmethod
+    def get_session(test_block_config, **kwargs):
+        pool_settings = test_block_config.get("http_pool")
+        if pool_settings:
+            logger.debug("Using shared connection pool")
+            return PooledSession(pool_settings, **kwargs)
+
+        return requests.Session(**kwargs)
+
     request_type = RestRequest
     request_block_name = "request"
 
@@ -27,6 +37,11 @@ class TavernRestPlugin(PluginHelperBase):
             logger.error("Need a 'response' block if a 'request' is being sent")
             raise exceptions.MissingSettingsError from e
 
+        if "stream" in r_expected and not stage.get("request", {}).get("stream"):
+            logger.warning(
+                "Response body is checked as a stream, but 'stream' is not set in the request - the whole body will be read into memory first"
+            )
+
         f_expected = format_keys(r_expected, test_block_config["variables"])
         return f_expected
 
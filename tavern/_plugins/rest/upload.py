@@ -0,0 +1,268 @@
+"""Send files in the body of a request without reading them into memory
+
+Normally files in a 'files' block are passed to requests, which builds the
+whole multipart body in memory before sending it. If an 'upload' block is used
+in the request, the body is instead sent in chunks as it is read from the files:
+
+- chunk_size: how much of each file to read and send at once
+- chunked: send the body with 'Transfer-Encoding: chunked' instead of setting
+  Content-Length
+- mmap: read files by memory mapping them, so chunks are sent straight from the
+  page cache instead of being copied into a new buffer first
+
+A 'file_body' is always sent in chunks like this.
+
+How long it took to send the body and how much was sent is recorded in the
+stage timings as 'upload'.
+"""
+import asyncio
+import logging
+import mmap
+import os
+import time
+
+from urllib3.fields import RequestField
+from urllib3.filepost import choose_boundary
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class _FilePart(object):
+    """A file to send as part of the body
+
+    Args:
+        path (str): path to file
+        use_mmap (bool): whether to read the file through a memory map
+    """
+
+    def __init__(self, path, use_mmap=False):
+        self._file = open(path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+
+        self._mmap = None
+        # Can't map an empty file
+        if use_mmap and self.size:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def iter_chunks(self, chunk_size):
+        """Read the file
+
+        Args:
+            chunk_size (int): how much to read at once
+
+        Yields:
+            bytes, memoryview: chunks of the file
+        """
+        if self._mmap is not None:
+            view = memoryview(self._mmap)
+            try:
+                for start in range(0, self.size, chunk_size):
+                    yield view[start : start + chunk_size]
+            finally:
+                view.release()
+
+            return
+
+        self._file.seek(0)
+
+        while True:
+            chunk = self._file.read(chunk_size)
+            if not chunk:
+                break
+
+            yield chunk
+
+    def close(self):
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Something is still holding on to the last chunk - it will be
+                # unmapped when that is garbage collected
+                logger.debug("Could not close memory mapped file yet")
+
+        self._file.close()
+
+
+class UploadBody(object):
+    """Request body which is read from files as it is sent
+
+    This can be passed as 'data' to requests, which will iterate over it to
+    send the body. The 'len' attribute is what requests uses for the
+    Content-Length header - if it is None, the body is sent chunked instead.
+
+    Args:
+        parts (list): bytes and files (_FilePart) which make up the body, in
+            order
+        content_type (str, optional): content type of the body
+        chunk_size (int): how much to read from files at once
+        chunked (bool): send the body without a Content-Length
+
+    Attributes:
+        sent (int): bytes of the body which have been sent so far
+    """
+
+    # pylint: disable=too-many-arguments
+
+    def __init__(self, parts, content_type=None, chunk_size=None, chunked=False):
+        self.content_type = content_type
+
+        self._parts = []
+        # Join together any bytes next to each other so they're sent at once
+        for part in parts:
+            if (
+                isinstance(part, bytes)
+                and self._parts
+                and isinstance(self._parts[-1], bytes)
+            ):
+                self._parts[-1] += part
+            else:
+                self._parts.append(part)
+
+        self._chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+
+        size = sum(len(p) if isinstance(p, bytes) else p.size for p in self._parts)
+        self.len = None if chunked else size
+
+        self.sent = 0
+        self._started = None
+        self._finished = None
+
+    def __iter__(self):
+        self._started = time.perf_counter()
+
+        for part in self._parts:
+            if isinstance(part, bytes):
+                chunks = [part]
+            else:
+                chunks = part.iter_chunks(self._chunk_size)
+
+            for chunk in chunks:
+                self.sent += len(chunk)
+                yield chunk
+
+        self._finished = time.perf_counter()
+
+    async def aiter(self):
+        """Same as iterating over the body, but for clients which need an async
+        iterator (eg, httpx.AsyncClient)
+
+        Files are read in the event loop's default executor, so that other
+        requests being sent from the same event loop aren't held up waiting for
+        the disk.
+        """
+        loop = asyncio.get_event_loop()
+        chunks = iter(self)
+
+        while True:
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+            if chunk is None:
+                return
+
+            # Memory mapped chunks are sent as they are, without copying
+            yield chunk
+
+    @property
+    def elapsed(self):
+        """How long it took to send the body, in seconds, or None if it has not
+        been completely sent"""
+        if self._finished is None:
+            return None
+
+        return self._finished - self._started
+
+    def close(self):
+        for part in self._parts:
+            if not isinstance(part, bytes):
+                part.close()
+
+
+def file_body(path, chunk_size=None, chunked=False, use_mmap=False):
+    """Body of a request which is just the contents of a file
+
+    Args:
+        path (str): path to file
+        chunk_size (int, optional): how much to read at once
+        chunked (bool): send the body without a Content-Length
+        use_mmap (bool): read the file through a memory map
+
+    Returns:
+        UploadBody: body to send
+    """
+    return UploadBody(
+        [_FilePart(path, use_mmap)], chunk_size=chunk_size, chunked=chunked
+    )
+
+
+def _encode_field_value(value):
+    if isinstance(value, bytes):
+        return value
+    if not isinstance(value, str):
+        value = str(value)
+    return value.encode("utf8")
+
+
+def multipart_body(fields, files, chunk_size=None, chunked=False, use_mmap=False):
+    """multipart/form-data body, in the same format that requests would send
+
+    Args:
+        fields (dict): form fields to send before the files. Values can be
+            lists to send a field more than once.
+        files (list): (name, filename, path, content type, headers) for each
+            file to send
+        chunk_size (int, optional): how much to read from files at once
+        chunked (bool): send the body without a Content-Length
+        use_mmap (bool): read files through a memory map
+
+    Returns:
+        UploadBody: body to send. content_type is set to the multipart content
+            type, including the boundary.
+    """
+    # pylint: disable=too-many-arguments
+
+    boundary = choose_boundary()
+    delimiter = "--{}\r\n".format(boundary).encode("latin-1")
+
+    parts = []
+
+    def add_headers(field):
+        parts.append(delimiter)
+        parts.append(field.render_headers().encode("latin-1"))
+
+    for name, values in (fields or {}).items():
+        if not isinstance(values, list):
+            values = [values]
+
+        for value in values:
+            field = RequestField(name=name, data=value)
+            field.make_multipart()
+            add_headers(field)
+            parts.append(_encode_field_value(value))
+            parts.append(b"\r\n")
+
+    try:
+        for name, filename, path, content_type, headers in files:
+            field = RequestField(
+                name=name, data=b"", filename=filename, headers=headers
+            )
+            field.make_multipart(content_type=content_type)
+            add_headers(field)
+            parts.append(_FilePart(path, use_mmap))
+            parts.append(b"\r\n")
+    except (IOError, ValueError):
+        # Close any files which were already opened
+        for part in parts:
+            if isinstance(part, _FilePart):
+                part.close()
+        raise
+
+    parts.append("--{}--\r\n".format(boundary).encode("latin-1"))
+
+    return UploadBody(
+        parts,
+        content_type="multipart/form-data; boundary={}".format(boundary),
+        chunk_size=chunk_size,
+        chunked=chunked,
+    )
@@ -1,5 +1,4 @@
 from contextlib import ExitStack
-from copy import deepcopy
 from distutils.util import strtobool
 import logging
 import os
@@ -14,7 +13,10 @@ from .plugins import get_expected, get_extra_sessions, get_request_type, get_ver
 from .util import exceptions
 from .util.delay import delay
 from .util.dict_util import format_keys
+from .util.poll import get_poll
 from .util.retry import retry
+from .util.scope import copy_stage
+from .util.timing import get_test_timings
 
 logger = logging.getLogger(__name__)
 
@@ -28,9 +30,7 @@ def _resolve_test_stages(test_spec, available_stages):
             if "id" in stage:
                 ref_id = stage["id"]
                 if ref_id in available_stages:
-                    # Make sure nothing downstream can change the globally
-                    # defined stage. Just give the test a local copy.
-                    stage = deepcopy(available_stages[ref_id])
+                    stage = available_stages[ref_id]
                     logger.debug("found stage reference: %s", ref_id)
                 else:
                     logger.error("Bad stage: unknown stage referenced: %s", ref_id)
@@ -40,7 +40,11 @@ def _resolve_test_stages(test_spec, available_stages):
             else:
                 logger.error("Bad stage: 'ref' type must specify 'id'")
                 raise exceptions.BadSchemaError("'ref' stage type must specify 'id'")
-        test_stages.append(stage)
+
+        # Make sure nothing downstream can change the globally defined stage,
+        # or a stage shared with other parametrized tests. Just give the test
+        # a local copy.
+        test_stages.append(copy_stage(stage))
 
     return test_stages
 
@@ -180,6 +184,7 @@ def run_test(in_file, test_spec, global_cfg):
             except exceptions.TavernException as e:
                 e.stage = stage
                 e.test_block_config = test_block_config
+                e.timings = get_test_timings(test_block_config)
                 raise
 
             if getonly(stage):
@@ -200,7 +205,10 @@ def _calculate_stage_strictness(stage, test_block_config, test_spec):
 
     if stage.get("response", {}).get("strict", None) is not None:
         stage_options = stage["response"]["strict"]
-    elif stage.get("mqtt_response", {}).get("strict", None) is not None:
+    elif (
+        isinstance(stage.get("mqtt_response"), dict)
+        and stage["mqtt_response"].get("strict", None) is not None
+    ):
         stage_options = stage["mqtt_response"]["strict"]
 
     if stage_options is not None:
@@ -233,24 +241,95 @@ def run_stage(sessions, stage, tavern_box, test_block_config):
     """
     name = stage["name"]
 
-    r = get_request_type(stage, test_block_config, sessions)
+    timings = get_test_timings(test_block_config).start_stage(name)
+
+    try:
+        with timings.phase("format"):
+            r = get_request_type(stage, test_block_config, sessions)
+
+            tavern_box.update(request_vars=r.request_vars)
+
+            expected = get_expected(stage, test_block_config, sessions)
+
+            poll = get_poll(stage, test_block_config)
+
+        with timings.phase("delay"):
+            delay(stage, "before", test_block_config["variables"])
+
+        logger.info("Running stage : %s", name)
+        verifiers = []
+        try:
+            if poll is None:
+                with timings.phase("send"):
+                    response = r.run()
+
+                with timings.phase("verify"):
+                    verifiers = get_verifiers(
+                        stage, test_block_config, sessions, expected
+                    )
+                    for v in verifiers:
+                        saved = v.verify(response)
+                        with timings.phase("save"):
+                            test_block_config["variables"].update(saved)
+            else:
+                # Keep sending the same request until the response matches, and
+                # only save values from the one which did
+                with timings.phase("verify"):
+                    verifiers = get_verifiers(
+                        stage, test_block_config, sessions, expected
+                    )
 
-    tavern_box.update(request_vars=r.request_vars)
+                saved = poll.run(name, r, verifiers, timings)
+                with timings.phase("save"):
+                    test_block_config["variables"].update(saved)
+        finally:
+            # Only finished with the verifiers (eg, MQTT subscriptions) once
+            # every response in the stage has been checked
+            for v in verifiers:
+                v.close()
 
-    expected = get_expected(stage, test_block_config, sessions)
+        tavern_box.pop("request_vars")
 
-    delay(stage, "before", test_block_config["variables"])
+        with timings.phase("delay"):
+            delay(stage, "after", test_block_config["variables"])
+    except Exception:
+        timings.failed = True
 
-    logger.info("Running stage : %s", name)
-    response = r.run()
+        # Don't hide the error which failed the stage if the hook fails as well
+        try:
+            _after_every_stage(stage, timings, test_block_config)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Error calling hook after stage '%s' failed", name)
 
-    verifiers = get_verifiers(stage, test_block_config, sessions, expected)
-    for v in verifiers:
-        saved = v.verify(response)
-        test_block_config["variables"].update(saved)
+        raise
 
-    tavern_box.pop("request_vars")
-    delay(stage, "after", test_block_config["variables"])
+    _after_every_stage(stage, timings, test_block_config)
+
+
+def _after_every_stage(stage, timings, test_block_config):
+    """Call the after_every_stage hook, if there is anything to call it with
+
+    Args:
+        stage (dict): stage which was run
+        timings (StageTimings): timings for this run of the stage
+        test_block_config (dict): config for test
+    """
+    # pylint: disable=import-outside-toplevel
+    # Importing this at the top would be circular
+    from tavern.testutils.pytesthook.newhooks import call_hook
+
+    logger.debug("Stage '%s' timings: %s", stage["name"], timings.phases)
+
+    if "pytest_hook_caller" not in test_block_config.get("tavern_internal", {}):
+        logger.debug("No hook caller - not calling after_every_stage hook")
+        return
+
+    call_hook(
+        test_block_config,
+        "pytest_tavern_beta_after_every_stage",
+        stage=stage,
+        timings=timings,
+    )
 
 
 def _get_or_wrap_global_cfg(stack, tavern_global_cfg):
@@ -4,6 +4,7 @@ import logging.config
 from textwrap import dedent
 
 from .core import run
+from .load import run_load
 
 
 class TavernArgParser(ArgumentParser):
@@ -30,6 +31,40 @@ class TavernArgParser(ArgumentParser):
             "--stdout", help="Log output stdout", action="store_true", default=False
         )
 
+        self.add_argument(
+            "--load",
+            help="Run the tests repeatedly to load test a server instead of running them once with Pytest",
+            action="store_true",
+            default=False,
+        )
+
+        self.add_argument(
+            "--load-duration",
+            help="How long to run the load test for, in seconds",
+            type=float,
+            default=10.0,
+        )
+
+        self.add_argument(
+            "--load-concurrency",
+            help="Number of tests to run at once in the load test",
+            type=int,
+            default=1,
+        )
+
+        self.add_argument(
+            "--load-rate",
+            help="Number of tests to start per second in the load test (as fast as possible if not given)",
+            type=float,
+            default=None,
+        )
+
+        self.add_argument(
+            "--load-report",
+            help="Write a JSON summary of the load test results to this file",
+            default=None,
+        )
+
         self.add_argument(
             "--debug",
             help="Log debug information (only relevant if --stdout or --log-to-file is passed)",
@@ -91,6 +126,18 @@ def main():
     logging.config.dictConfig(log_cfg)
 
     in_file = vargs.pop("in_file")
+
+    load_args = {
+        "duration": vargs.pop("load_duration"),
+        "concurrency": vargs.pop("load_concurrency"),
+        "rate": vargs.pop("load_rate"),
+        "report_file": vargs.pop("load_report"),
+    }
+
+    if vargs.pop("load"):
+        success = run_load(in_file, args=remaining, **load_args)
+        raise SystemExit(not success)
+
     global_cfg = vargs.pop("tavern_global_cfg", {})
 
     raise SystemExit(run(in_file, global_cfg, pytest_args=remaining, **vargs))
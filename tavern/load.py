@@ -0,0 +1,449 @@
+"""Run the tests in a file over and over again to put load on a server
+
+This uses the same code as a normal test run to make requests and verify
+responses, but runs the tests directly rather than through Pytest. Because of
+that, things which rely on Pytest (fixtures, marks and Tavern hooks defined in
+conftest.py files) are not supported.
+
+Each worker thread repeatedly picks the next test from the file and runs it,
+either as fast as possible or, if a rate is given, starting a new test at that
+many times per second across all workers. The time taken by each stage and
+whether it failed is recorded, and a summary is printed at the end.
+
+Tests which are waiting (for delay_before, delay_after, or between retries) do
+not count towards the number of tests running at once, so a test with long
+delays doesn't stop other tests from running.
+"""
+import argparse
+import itertools
+import json
+import logging
+import threading
+import time
+
+import yaml
+
+from tavern.core import run_test
+from tavern.plugins import load_plugins
+from tavern.schemas.files import verify_tests
+from tavern.testutils.pytesthook.util import add_parser_options, load_global_cfg
+from tavern.util import exceptions
+from tavern.util.delay import WorkerSlots
+from tavern.util.jmespath_util import precompile_queries
+from tavern.util.loader import DefaultIncludeLoader
+from tavern.util.scope import new_test_config
+from tavern.util.timing import TestTimings
+
+logger = logging.getLogger(__name__)
+
+# Phases which count towards the latency of a stage
+_LATENCY_PHASES = ("send", "first_byte", "download")
+
+
+class _NullHookCaller(object):
+    """Stands in for the Pytest hook caller - hooks are not called"""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+
+        def hook(**kwargs):
+            # pylint: disable=unused-argument
+            pass
+
+        return hook
+
+
+class _ArgsConfig(object):
+    """Looks enough like a Pytest config object to load the global config from
+    parsed command line arguments"""
+
+    def __init__(self, args):
+        self._args = args
+
+    def getini(self, name):
+        # pylint: disable=unused-argument,no-self-use
+        return None
+
+    def getoption(self, name):
+        return getattr(self._args, name, None)
+
+
+def percentile(ordered, percent):
+    """Get a percentile of a sorted list using the nearest-rank method
+
+    Args:
+        ordered (list): sorted values
+        percent (float): percentile to get, between 0 and 100
+
+    Returns:
+        float: value at that percentile, or None if there are no values
+    """
+    if not ordered:
+        return None
+
+    rank = max(int(-(-len(ordered) * percent // 100)), 1)
+    return ordered[rank - 1]
+
+
+class StageResults(object):
+    """Results for one stage of one test
+
+    Attributes:
+        latencies (list): time taken to make the request for each successful
+            run of the stage, in seconds
+        errors (int): number of times the stage failed, including attempts
+            which were retried
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+
+    @property
+    def count(self):
+        return len(self.latencies) + self.errors
+
+    def summary(self, elapsed):
+        """Summary statistics for this stage
+
+        Args:
+            elapsed (float): how long the load test ran for, in seconds
+
+        Returns:
+            dict: summary
+        """
+        ordered = sorted(self.latencies)
+
+        summary = {
+            "count": self.count,
+            "errors": self.errors,
+            "error_rate": self.errors / self.count if self.count else 0.0,
+            "throughput": self.count / elapsed if elapsed else 0.0,
+            "mean": sum(ordered) / len(ordered) if ordered else None,
+            "max": ordered[-1] if ordered else None,
+        }
+
+        for percent in [50, 90, 95, 99]:
+            summary["p{}".format(percent)] = percentile(ordered, percent)
+
+        return summary
+
+
+class LoadResults(object):
+    """Thread safe collection of results from every stage that was run
+
+    Attributes:
+        failed_tests (int): number of times a test failed
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.elapsed = 0.0
+        self.failed_tests = 0
+        self._lock = threading.Lock()
+
+    def record(self, test_name, timings, failed):
+        """Record the results of running a test once
+
+        Args:
+            test_name (str): name of test
+            timings (TestTimings): timings for the test
+            failed (bool): whether the test failed
+        """
+        with self._lock:
+            for stage_timings in timings.stages:
+                key = "{}: {}".format(test_name, stage_timings.name)
+                stage_results = self.stages.setdefault(key, StageResults())
+
+                if stage_timings.failed:
+                    stage_results.errors += 1
+                else:
+                    stage_results.latencies.append(
+                        sum(stage_timings.phases.get(p, 0.0) for p in _LATENCY_PHASES)
+                    )
+
+            if failed:
+                self.failed_tests += 1
+
+                # Failed outside of any stage - eg, connecting to an MQTT
+                # broker, or formatting the test
+                if not any(s.failed for s in timings.stages):
+                    key = "{}: (setup)".format(test_name)
+                    self.stages.setdefault(key, StageResults()).errors += 1
+
+    @property
+    def errors(self):
+        return sum(s.errors for s in self.stages.values())
+
+    def summary(self):
+        """Summary for every stage
+
+        Returns:
+            dict: mapping of stage name to summary
+        """
+        return {
+            key: stage_results.summary(self.elapsed)
+            for key, stage_results in self.stages.items()
+        }
+
+    def format_table(self):
+        """Format the summary as a table which can be printed
+
+        Returns:
+            str: summary table
+        """
+
+        def ms(seconds):
+            return "-" if seconds is None else "{:.1f}".format(seconds * 1000)
+
+        rows = [
+            [
+                "Stage",
+                "Count",
+                "Errors",
+                "Error %",
+                "Req/s",
+                "Mean",
+                "p50",
+                "p90",
+                "p95",
+                "p99",
+                "Max",
+            ]
+        ]
+
+        for key, s in self.summary().items():
+            rows.append(
+                [
+                    key,
+                    str(s["count"]),
+                    str(s["errors"]),
+                    "{:.1f}".format(s["error_rate"] * 100),
+                    "{:.1f}".format(s["throughput"]),
+                ]
+                + [ms(s[k]) for k in ["mean", "p50", "p90", "p95", "p99", "max"]]
+            )
+
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+
+        lines = [
+            "  ".join(
+                cell.ljust(width) if i == 0 else cell.rjust(width)
+                for i, (cell, width) in enumerate(zip(row, widths))
+            )
+            for row in rows
+        ]
+
+        lines.append("")
+        lines.append(
+            "Ran for {:.1f}s, latencies are in milliseconds".format(self.elapsed)
+        )
+
+        return "\n".join(lines)
+
+
+class LoadRunner(object):
+    """Runs tests repeatedly from multiple threads
+
+    Args:
+        in_file (str): file the tests were loaded from
+        tests (list): test specifications
+        global_cfg (dict): global configuration, as used in a normal test run
+        duration (float): how long to run for, in seconds
+        concurrency (int): number of tests to run at once
+        rate (float, optional): number of tests to start per second. If not
+            given, tests are run as fast as possible.
+    """
+
+    def __init__(self, in_file, tests, global_cfg, duration, concurrency, rate=None):
+        # pylint: disable=too-many-arguments
+        self._in_file = in_file
+        self._tests = itertools.cycle(tests)
+        self._global_cfg = global_cfg
+        self._duration = duration
+        self._concurrency = concurrency
+        self._interval = 1.0 / rate if rate else None
+
+        self._lock = threading.Lock()
+        self._slots = WorkerSlots(concurrency)
+        self._deadline = None
+        self._next_start = None
+
+        self.results = LoadResults()
+
+    def _next_test(self):
+        """Wait until the next test should be started
+
+        Returns:
+            dict: next test to run, or None if the load test has finished
+        """
+        with self._lock:
+            if self._interval is None:
+                start = time.monotonic()
+            else:
+                start = self._next_start
+                self._next_start += self._interval
+
+            if start >= self._deadline:
+                return None
+
+            test_spec = next(self._tests)
+
+        wait = start - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+        return test_spec
+
+    def _run_once(self, test_spec):
+        timings = TestTimings()
+
+        test_block_config = new_test_config(self._global_cfg)
+        test_block_config["tavern_internal"] = {
+            "pytest_hook_caller": _NullHookCaller(),
+            "timings": timings,
+        }
+
+        failed = False
+
+        try:
+            run_test(self._in_file, dict(test_spec), test_block_config)
+        except Exception:  # pylint: disable=broad-except
+            logger.debug("Error running test", exc_info=True)
+            failed = True
+
+        self.results.record(test_spec["test_name"], timings, failed)
+
+    def _worker(self):
+        while True:
+            test_spec = self._next_test()
+            if test_spec is None:
+                return
+
+            with self._slots.held():
+                self._run_once(test_spec)
+
+    def run(self):
+        """Run the load test
+
+        Returns:
+            LoadResults: results for every stage
+        """
+        start = time.monotonic()
+        self._deadline = start + self._duration
+        self._next_start = start
+
+        # Tests which are waiting let another worker run a test in the
+        # meantime, so there are more workers than tests running at once
+        workers = [
+            threading.Thread(target=self._worker, name="tavern-load-{}".format(i))
+            for i in range(self._slots.max_threads)
+        ]
+
+        for worker in workers:
+            worker.start()
+
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            logger.warning("Interrupted - waiting for running tests to finish")
+
+            with self._lock:
+                self._deadline = time.monotonic()
+
+            for worker in workers:
+                worker.join()
+
+        self.results.elapsed = time.monotonic() - start
+
+        return self.results
+
+
+def load_tests(in_file):
+    """Load and verify all the tests in a file
+
+    Args:
+        in_file (str): test file
+
+    Returns:
+        list: tests to run
+
+    Raises:
+        exceptions.BadSchemaError: test file was invalid
+    """
+    with open(in_file, "r", encoding="utf-8") as fileobj:
+        try:
+            all_tests = list(yaml.load_all(fileobj, Loader=DefaultIncludeLoader))
+        except yaml.parser.ParserError as e:
+            raise exceptions.BadSchemaError from e
+
+    to_run = []
+
+    for test_spec in all_tests:
+        if not test_spec:
+            continue
+
+        verify_tests(test_spec)
+        precompile_queries(test_spec)
+
+        # skipif, parametrize, usefixtures etc. all need Pytest
+        if any(isinstance(m, dict) for m in test_spec.get("marks", [])):
+            logger.warning(
+                "Skipping '%s' - marks with arguments are not supported in load tests",
+                test_spec["test_name"],
+            )
+            continue
+
+        to_run.append(test_spec)
+
+    if not to_run:
+        raise exceptions.BadSchemaError("No tests to run in {}".format(in_file))
+
+    return to_run
+
+
+def run_load(in_file, duration, concurrency, rate=None, report_file=None, args=None):
+    """Run the tests in a file repeatedly and print a summary of the results
+
+    Args:
+        in_file (str): test file
+        duration (float): how long to run for, in seconds
+        concurrency (int): number of tests to run at once
+        rate (float, optional): number of tests to start per second
+        report_file (str, optional): file to write JSON summary to
+        args (list, optional): extra Tavern command line arguments, such as
+            --tavern-global-cfg
+
+    Returns:
+        bool: whether every test passed every time it was run (stages which
+            passed when they were retried still count as passing)
+    """
+    # pylint: disable=too-many-arguments
+    parser = argparse.ArgumentParser(prog="tavern-ci --load")
+    add_parser_options(parser.add_argument)
+    parsed, unknown = parser.parse_known_args(args or [])
+
+    if unknown:
+        logger.warning("Ignoring arguments which don't apply to load tests: %s", unknown)
+
+    global_cfg = load_global_cfg(_ArgsConfig(parsed))
+    load_plugins(global_cfg)
+
+    tests = load_tests(in_file)
+
+    runner = LoadRunner(in_file, tests, global_cfg, duration, concurrency, rate)
+    results = runner.run()
+
+    print(results.format_table())
+
+    if report_file:
+        with open(report_file, "w", encoding="utf-8") as report:
+            json.dump(
+                {"elapsed": results.elapsed, "stages": results.summary()},
+                report,
+                indent=2,
+            )
+
+    return results.failed_tests == 0
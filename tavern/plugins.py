@@ -4,6 +4,7 @@ This is here mainly to make MQTT easier, this will almost defintiely change
 significantly if/when a proper plugin system is implemented!
 """
 import logging
+import threading
 
 import stevedore
 
@@ -60,22 +61,121 @@ def is_valid_reqresp_plugin(ext):
     return all(hasattr(ext.plugin, i) for i in required)
 
 
+class PluginDispatch(object):
+    """Which plugin handles each type of block that can be in a stage
+
+    This is built once when the plugins are loaded so that finding the plugin
+    for a stage doesn't have to check every plugin.
+
+    Args:
+        plugins (list): loaded plugins
+
+    Attributes:
+        plugins (list): loaded plugins
+        requests (dict): mapping of request block name to plugin
+        responses (dict): mapping of response block name to plugin
+    """
+
+    def __init__(self, plugins):
+        self.plugins = plugins
+
+        self.requests = {p.plugin.request_block_name: p for p in plugins}
+        self.responses = {p.plugin.response_block_name: p for p in plugins}
+
+        # Responses are always checked in the order the plugins were loaded in
+        self._order = {p.name: i for i, p in enumerate(plugins)}
+
+    def request_plugins(self, stage):
+        """Get the plugins for the requests in a stage
+
+        Args:
+            stage (dict): spec for a stage
+
+        Returns:
+            list: plugins
+        """
+        return [self.requests[k] for k in stage if k in self.requests]
+
+    def response_plugins(self, stage):
+        """Get the plugins for the responses in a stage
+
+        Args:
+            stage (dict): spec for a stage
+
+        Returns:
+            list: plugins, in the order they were loaded
+        """
+        found = [self.responses[k] for k in stage if k in self.responses]
+        return sorted(found, key=lambda p: self._order[p.name])
+
+    def session_plugins(self, stages):
+        """Get the plugins which need a session for a test
+
+        Args:
+            stages (list): specs for the stages in the test
+
+        Returns:
+            list: plugins, in the order they were loaded
+        """
+        needed = {}
+
+        for stage in stages:
+            for p in self.request_plugins(stage) + self.response_plugins(stage):
+                needed[p.name] = p
+
+        return sorted(needed.values(), key=lambda p: self._order[p.name])
+
+
 class _PluginCache(object):
-    # pylint: disable=inconsistent-return-statements
+    """Loads plugins for the backends in the config
+
+    Plugins are only loaded through stevedore the first time this is called
+    with a set of backends - after that, the same plugins are returned.
+    """
 
     def __init__(self):
-        self.plugins = {}
+        self.plugins = []
+        self.dispatch = None
+
+        self._backends = None
+        self._lock = threading.Lock()
 
     def __call__(self, config=None):
-        if not config and not self.plugins:
-            raise exceptions.PluginLoadError("No config to load plugins from")
-        elif self.plugins:
-            return self.plugins
-        elif not self.plugins and config:
-            # NOTE
-            # This is reloaded every time
-            self.plugins = self._load_plugins(config)
-            return self.plugins
+        return self.get_dispatch(config).plugins
+
+    def get_dispatch(self, config=None):
+        """Get the plugins, loading them if needed
+
+        Args:
+            config (dict, optional): config to load plugins from. If not
+                given, the plugins that were last loaded are used.
+
+        Returns:
+            PluginDispatch: loaded plugins
+
+        Raises:
+            exceptions.PluginLoadError: no config was given and no plugins have
+                been loaded yet
+        """
+        if not config:
+            if self.dispatch is None:
+                raise exceptions.PluginLoadError("No config to load plugins from")
+            return self.dispatch
+
+        backends = config.get("backends")
+
+        if self.dispatch is not None and backends in (None, self._backends):
+            return self.dispatch
+
+        with self._lock:
+            if self.dispatch is None or backends != self._backends:
+                plugins = self._load_plugins(config)
+
+                self.plugins = plugins
+                self.dispatch = PluginDispatch(plugins)
+                self._backends = dict(backends)
+
+            return self.dispatch
 
     def _load_plugins(self, test_block_config):
         """Load plugins from the 'tavern' entrypoint namespace
@@ -145,20 +245,19 @@ def get_extra_sessions(test_spec, test_block_config):
 
     sessions = {}
 
-    plugins = load_plugins(test_block_config)
+    dispatch = load_plugins.get_dispatch(test_block_config)
 
-    for p in plugins:
-        if any(
-            (p.plugin.request_block_name in i or p.plugin.response_block_name in i)
-            for i in test_spec["stages"]
-        ):
-            logger.debug(
-                "Initialising session for %s (%s)", p.name, p.plugin.session_type
-            )
-            session_spec = test_spec.get(p.name, {})
-            formatted = format_keys(
-                session_spec, test_block_config.get("variables", {})
-            )
+    for p in dispatch.session_plugins(test_spec["stages"]):
+        logger.debug("Initialising session for %s (%s)", p.name, p.plugin.session_type)
+        session_spec = test_spec.get(p.name, {})
+        formatted = format_keys(session_spec, test_block_config.get("variables", {}))
+
+        # Plugins can optionally decide how to create the session based on
+        # the config
+        get_session = getattr(p.plugin, "get_session", None)
+        if get_session is not None:
+            sessions[p.name] = get_session(test_block_config, **formatted)
+        else:
             sessions[p.name] = p.plugin.session_type(**formatted)
 
     return sessions
@@ -182,34 +281,23 @@ def get_request_type(stage, test_block_config, sessions):
         exceptions.MissingKeysError: No request type specified
     """
 
-    plugins = load_plugins(test_block_config)
+    dispatch = load_plugins.get_dispatch(test_block_config)
 
-    keys = {}
+    request_plugins = dispatch.request_plugins(stage)
 
-    for p in plugins:
-        keys[p.plugin.request_block_name] = p.plugin.request_type
-
-    if len(set(keys) & set(stage)) > 1:
+    if len(request_plugins) > 1:
         logger.error("Can only specify 1 request type")
         raise exceptions.DuplicateKeysError
-    elif not list(set(keys) & set(stage)):
-        logger.error("Need to specify one of '%s'", keys.keys())
+    elif not request_plugins:
+        logger.error("Need to specify one of '%s'", dispatch.requests.keys())
         raise exceptions.MissingKeysError
 
-    # We've validated that 1 and only 1 is there, so just loop until the first
-    # one is found
-    for p in plugins:
-        try:
-            request_args = stage[p.plugin.request_block_name]
-        except KeyError:
-            pass
-        else:
-            session = sessions[p.name]
-            request_class = p.plugin.request_type
-            logger.debug(
-                "Initialising request class for %s (%s)", p.name, request_class
-            )
-            break
+    p = request_plugins[0]
+
+    request_args = stage[p.plugin.request_block_name]
+    session = sessions[p.name]
+    request_class = p.plugin.request_type
+    logger.debug("Initialising request class for %s (%s)", p.name, request_class)
 
     request_maker = request_class(session, request_args, test_block_config)
 
@@ -234,17 +322,16 @@ def get_expected(stage, test_block_config, sessions):
         dict: mapping of request type: expected response dict
     """
 
-    plugins = load_plugins(test_block_config)
+    dispatch = load_plugins.get_dispatch(test_block_config)
 
     expected = {}
 
-    for p in plugins:
-        if p.plugin.response_block_name in stage:
-            logger.debug("Getting expected response for %s", p.name)
-            plugin_expected = p.plugin.get_expected_from_request(
-                stage, test_block_config, sessions[p.name]
-            )
-            expected[p.name] = plugin_expected
+    for p in dispatch.response_plugins(stage):
+        logger.debug("Getting expected response for %s", p.name)
+        plugin_expected = p.plugin.get_expected_from_request(
+            stage, test_block_config, sessions[p.name]
+        )
+        expected[p.name] = plugin_expected
 
     return expected
 
@@ -262,19 +349,18 @@ def get_verifiers(stage, test_block_config, sessions, expected):
         BaseResponse: response validator object with a verify(response) method
     """
 
-    plugins = load_plugins(test_block_config)
+    dispatch = load_plugins.get_dispatch(test_block_config)
 
     verifiers = []
 
-    for p in plugins:
-        if p.plugin.response_block_name in stage:
-            session = sessions[p.name]
-            logger.debug(
-                "Initialising verifier for %s (%s)", p.name, p.plugin.verifier_type
-            )
-            verifier = p.plugin.verifier_type(
-                session, stage["name"], expected[p.name], test_block_config
-            )
-            verifiers.append(verifier)
+    for p in dispatch.response_plugins(stage):
+        session = sessions[p.name]
+        logger.debug(
+            "Initialising verifier for %s (%s)", p.name, p.plugin.verifier_type
+        )
+        verifier = p.plugin.verifier_type(
+            session, stage["name"], expected[p.name], test_block_config
+        )
+        verifiers.append(verifier)
 
     return verifiers
@@ -7,6 +7,8 @@ import traceback
 from tavern.schemas.extensions import get_wrapped_response_function
 from tavern.util import exceptions
 from tavern.util.dict_util import check_keys_match_recursive, recurse_access_key
+from tavern.util.log_util import Truncated
+from tavern.util.timing import get_stage_timings
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +35,8 @@ class BaseResponse(object):
 
         self.response = None
 
+        self.timings = get_stage_timings(test_block_config)
+
     def _str_errors(self):
         return "- " + "\n- ".join(self.errors)
 
@@ -43,6 +47,16 @@ class BaseResponse(object):
             logger.error(msg, *args)
         self.errors += [(msg % args)]
 
+    def reset(self):
+        """Forget anything from verifying a previous response, so that the same
+        expected response can be checked against a new one"""
+        self.errors = []
+        self.response = None
+
+    def close(self):
+        """Called when the stage has finished checking responses, whether it
+        passed or not"""
+
     @abstractmethod
     def verify(self, response):
         """Verify response against expected values and returns any values that
@@ -82,7 +96,9 @@ class BaseResponse(object):
         if isinstance(block, Mapping):
             block = dict(block)
 
-        logger.debug("expected = %s, actual = %s", expected_block, block)
+        logger.debug(
+            "expected = %s, actual = %s", Truncated(expected_block), Truncated(block)
+        )
 
         try:
             check_keys_match_recursive(expected_block, block, [], strict)
@@ -133,7 +149,9 @@ class BaseResponse(object):
             response (object): Response type. This could be whatever the response type/plugin uses.
         """
         logger.debug(
-            "Calling ext function from '%s' with response '%s'", type(self), response
+            "Calling ext function from '%s' with response '%s'",
+            type(self),
+            Truncated(response),
         )
 
         for vf in self.validate_functions:
@@ -225,6 +243,6 @@ class BaseResponse(object):
                     )
 
         if saved:
-            logger.debug("Saved %s for '%s' from response", saved, key)
+            logger.debug("Saved %s for '%s' from response", Truncated(saved), key)
 
         return saved
@@ -343,7 +343,7 @@ def validate_request_json(value, rule_obj, path):
 
     if any(isinstance(i, ApproxScalar) for i in nested_values(value)):
         # If this is a request data block
-        if not re.search(r"^/stages/\d/(response/json|mqtt_response/json)", path):
+        if not re.search(r"^/stages/\d/(response/json|mqtt_response(/\d+)?/json)", path):
             raise BadSchemaError(
                 "Error at {} - Cannot use a '!approx' in anything other than an expected http response body or mqtt response json".format(
                     path
@@ -500,3 +500,36 @@ def retry_variable(value, rule_obj, path):
             raise BadSchemaError("max_retries must be greater than 0")
 
     return True
+
+
+@functools.lru_cache(maxsize=None)
+def _mqtt_response_message_validator():
+    """Validator for one expected mqtt message, built the first time it is
+    needed"""
+    # pylint: disable=import-outside-toplevel
+    from tavern.schemas.files import CompiledValidator
+
+    # The partial schema has already been loaded by the validator that uses this
+    return CompiledValidator({"include": "mqtt_response_message"})
+
+
+def validate_mqtt_response(value, rule_obj, path):
+    """Make sure 'mqtt_response' is either one expected message or a list of
+    expected messages"""
+    # pylint: disable=unused-argument
+    if not isinstance(value, dict) and not (isinstance(value, list) and value):
+        raise BadSchemaError(
+            "Error at {} - 'mqtt_response' must be a message or a non-empty list of messages".format(
+                path
+            )
+        )
+
+    validator = _mqtt_response_message_validator()
+
+    if isinstance(value, dict):
+        validator.verify(value, path)
+    else:
+        for i, message in enumerate(value):
+            validator.verify(message, "{}/{}".format(path, i))
+
+    return True
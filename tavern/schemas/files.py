@@ -1,28 +1,129 @@
+from collections import OrderedDict
 import contextlib
 import copy
+import datetime
 import functools
 import logging
 import os
 import tempfile
+import threading
 
 import pykwalify
 from pykwalify import core
+from pykwalify.rule import Rule
 import yaml
 
 from tavern.plugins import load_plugins
+from tavern.schemas import extensions
 from tavern.util.exceptions import BadSchemaError
-from tavern.util.loader import IncludeLoader, load_single_document_yaml
+from tavern.util.loader import DefaultIncludeLoader, load_single_document_yaml
 
-core.yaml.safe_load = functools.partial(yaml.load, Loader=IncludeLoader)
+core.yaml.safe_load = functools.partial(yaml.load, Loader=DefaultIncludeLoader)
 
 logger = logging.getLogger(__name__)
 
+# pykwalify looks up partial schemas in a global dict while validating, so
+# registering them and validating against them can't happen at the same time in
+# different threads. This is reentrant because extension functions can validate
+# part of an object while the whole thing is being validated.
+_partial_schemas_lock = threading.RLock()
+
+
+class CompiledValidator(core.Core):
+    """pykwalify validator which only builds the rules for a schema once
+
+    Normally a new Core is created for every validation, which reimports the
+    extension functions from file and rebuilds all the rules from the schema.
+    This does both of those once, and can then be used to validate any number
+    of objects.
+
+    Args:
+        schema (dict): Schema to verify against
+    """
+
+    def __init__(self, schema):
+        # pylint: disable=super-init-not-called
+        # The base constructor requires the data to validate up front and loads
+        # the extensions every time
+        self.source = None
+        self.validation_errors = None
+        self.validation_errors_exceptions = None
+        self.errors = []
+        self.extensions = []
+        self.loaded_extensions = [extensions]
+        self.strict_rule_validation = False
+        self.fix_ruby_style_regex = False
+        self.allow_assertions = False
+
+        self._partial_rules = {}
+        root_schema = {}
+
+        for k, v in schema.items():
+            if k.startswith("schema;"):
+                self._partial_rules[k.split(";", 1)[1]] = Rule(schema=v)
+            else:
+                root_schema[k] = v
+
+        self.schema = root_schema
+        self.root_rule = Rule(schema=root_schema)
+
+        with _partial_schemas_lock:
+            self._register_partial_rules()
+
+        # Path to the object being validated, for error messages
+        self._root_path = ""
+
+    def _register_partial_rules(self):
+        """pykwalify looks up partial schemas globally. They are registered
+        when the validator is built, and only registered again if another
+        schema has since registered a different one with the same name
+
+        Must be called with _partial_schemas_lock held.
+        """
+        registered = pykwalify.partial_schemas
+
+        if any(registered.get(k) is not v for k, v in self._partial_rules.items()):
+            registered.update(self._partial_rules)
+
+    def _start_validate(self, value=None):
+        self.errors = []
+
+        self._register_partial_rules()
+
+        self._validate(value, self.root_rule, self._root_path, [])
+
+    def verify(self, to_verify, path=""):
+        """Verify an object against the schema
+
+        Args:
+            to_verify (object): object to check
+            path (str, optional): where the object is, if it is part of another
+                object which is being validated
+
+        Raises:
+            BadSchemaError: Schema did not match
+        """
+        logger.debug("Verifying %s against %s", to_verify, self.schema)
+
+        # Copy so that the errors/source from different calls don't interfere
+        verifier = copy.copy(self)
+        verifier.source = to_verify
+        verifier._root_path = path  # pylint: disable=protected-access
+
+        try:
+            with _partial_schemas_lock:
+                verifier.validate()
+        except pykwalify.errors.PyKwalifyException as e:
+            logger.exception("Error validating %s", to_verify)
+            raise BadSchemaError() from e
+
 
 class SchemaCache(object):
     """Caches loaded schemas"""
 
     def __init__(self):
         self._loaded = {}
+        self._validators = {}
 
     def _load_base_schema(self, schema_filename):
         try:
@@ -77,10 +178,80 @@ class SchemaCache(object):
 
         return schema
 
+    def get_validator(self, schema_filename, with_plugins):
+        """Get a validator for the schema file, which is only created once
+
+        Args:
+            schema_filename (str): filename of schema
+            with_plugins (bool): Whether to load plugin schema into this schema as well
+
+        Returns:
+            CompiledValidator: validator for schema
+        """
+        key = (schema_filename, with_plugins)
+
+        try:
+            return self._validators[key]
+        except KeyError:
+            schema = self(schema_filename, with_plugins)
+            self._validators[key] = CompiledValidator(schema)
+            return self._validators[key]
+
 
 load_schema_file = SchemaCache()
 
 
+class _GenericValidatorCache(object):
+    """Caches validators for schemas passed to verify_generic
+
+    Schemas are dicts which could be changed after being used, so they are
+    looked up by identity rather than by contents. This means the same schema
+    object being used again (eg. when a stage is retried or polled) only builds
+    the validator once. A reference to each schema is kept so that its id can't
+    be reused by a different schema while it is in the cache.
+
+    Args:
+        maxsize (int): maximum number of validators to keep
+    """
+
+    def __init__(self, maxsize=128):
+        self._maxsize = maxsize
+        self._validators = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_validator(self, schema):
+        """Get a validator for the schema, which is only created once
+
+        Args:
+            schema (dict): Schema to verify against
+
+        Returns:
+            CompiledValidator: validator for schema
+        """
+        key = id(schema)
+
+        with self._lock:
+            try:
+                cached_schema, validator = self._validators[key]
+            except KeyError:
+                pass
+            else:
+                if cached_schema is schema:
+                    self._validators.move_to_end(key)
+                    return validator
+
+            validator = CompiledValidator(schema)
+
+            self._validators[key] = (schema, validator)
+            if len(self._validators) > self._maxsize:
+                self._validators.popitem(last=False)
+
+            return validator
+
+
+_generic_validators = _GenericValidatorCache()
+
+
 def verify_generic(to_verify, schema):
     """Verify a generic file against a given schema
 
@@ -91,22 +262,7 @@ def verify_generic(to_verify, schema):
     Raises:
         BadSchemaError: Schema did not match
     """
-    logger.debug("Verifying %s against %s", to_verify, schema)
-
-    here = os.path.dirname(os.path.abspath(__file__))
-    extension_module_filename = os.path.join(here, "extensions.py")
-
-    verifier = core.Core(
-        source_data=to_verify,
-        schema_data=schema,
-        extensions=[extension_module_filename],
-    )
-
-    try:
-        verifier.validate()
-    except pykwalify.errors.PyKwalifyException as e:
-        logger.exception("Error validating %s", to_verify)
-        raise BadSchemaError() from e
+    _generic_validators.get_validator(schema).verify(to_verify)
 
 
 @contextlib.contextmanager
@@ -132,11 +288,45 @@ def wrapfile(to_wrap):
             os.remove(wrapped_tmp.name)
 
 
+def _freeze(value):
+    """Convert a loaded test into something hashable which compares equal to
+    anything with the same contents
+
+    Raises:
+        TypeError: If something in the test could not be converted
+    """
+    if isinstance(value, dict):
+        return (dict, tuple((_freeze(k), _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_freeze(v) for v in value))
+    if isinstance(value, (str, bytes, int, float, bool, type(None), datetime.date)):
+        # Include the type so that eg 1 and 1.0 and True are all different
+        return (type(value), value)
+
+    # Sentinels, tokens, etc.
+    try:
+        attributes = vars(value)
+    except TypeError as e:
+        # Two different objects could have the same repr, so there's no way of
+        # telling whether they're the same
+        raise TypeError("Can't compare {} by value".format(type(value))) from e
+
+    return (type(value), _freeze(attributes))
+
+
+# Maximum number of tests to remember as having passed validation
+VERIFIED_TESTS_CACHE_SIZE = 4096
+
+# Tests which have already passed validation, least recently used first
+_verified_tests = OrderedDict()
+_verified_tests_lock = threading.Lock()
+
+
 def verify_tests(test_spec, with_plugins=True):
     """Verify that a specific test block is correct
 
-    Todo:
-        Load schema file once. Requires some caching of the file
+    Validation is only done once for each unique test - parametrized tests,
+    tests run multiple times, etc. will only be checked the first time.
 
     Args:
         test_spec (dict): Test in dictionary form
@@ -144,9 +334,29 @@ def verify_tests(test_spec, with_plugins=True):
     Raises:
         BadSchemaError: Schema did not match
     """
+    try:
+        key = (with_plugins, _freeze(test_spec))
+        hash(key)
+    except (TypeError, RecursionError):
+        logger.debug("Unable to memoise validation of test", exc_info=True)
+        key = None
+
+    if key is not None:
+        with _verified_tests_lock:
+            if key in _verified_tests:
+                _verified_tests.move_to_end(key)
+                logger.debug("Test already verified")
+                return
+
     here = os.path.dirname(os.path.abspath(__file__))
 
     schema_filename = os.path.join(here, "tests.schema.yaml")
-    schema = load_schema_file(schema_filename, with_plugins)
+    validator = load_schema_file.get_validator(schema_filename, with_plugins)
+
+    validator.verify(test_spec)
 
-    verify_generic(test_spec, schema)
+    if key is not None:
+        with _verified_tests_lock:
+            _verified_tests[key] = None
+            while len(_verified_tests) > VERIFIED_TESTS_CACHE_SIZE:
+                _verified_tests.popitem(last=False)
@@ -4,12 +4,11 @@ import logging
 import re
 
 from box import Box
-import jmespath
 import jwt
 
 from tavern.schemas.files import verify_generic
 from tavern.testutils.jmesutils import actual_validation, validate_comparison
-from tavern.util import exceptions
+from tavern.util import exceptions, jmespath_util
 from tavern.util.dict_util import check_keys_match_recursive
 
 logger = logging.getLogger(__name__)
@@ -130,11 +129,13 @@ def validate_content(response, comparisons):
                 2. operator : Operator to use to compare data.
                 3. expected : The expected value to match for
     """
+    body = response.json()
+
     for each_comparison in comparisons:
         path, _operator, expected = validate_comparison(each_comparison)
-        logger.debug("Searching for '%s' in '%s'", path, response.json())
+        logger.debug("Searching for '%s' in '%s'", path, body)
 
-        actual = jmespath.search(path, response.json())
+        actual = jmespath_util.search(path, body)
 
         expession = " ".join([str(path), str(_operator), str(expected)])
         parsed_expession = " ".join([str(actual), str(_operator), str(expected)])
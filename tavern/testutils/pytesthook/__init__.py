@@ -1,9 +1,15 @@
-from .hooks import pytest_addhooks, pytest_addoption, pytest_collect_file
+from .hooks import (
+    pytest_addhooks,
+    pytest_addoption,
+    pytest_collect_file,
+    pytest_configure,
+)
 from .util import add_parser_options
 
 __all__ = [
     "pytest_addoption",
     "pytest_collect_file",
+    "pytest_configure",
     "pytest_addhooks",
     "add_parser_options",
 ]
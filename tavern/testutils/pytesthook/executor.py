@@ -0,0 +1,261 @@
+"""Run tavern tests concurrently inside one process
+
+Almost all of the time spent running a Tavern test is spent waiting for
+responses, so running several tests at once in a thread pool can speed up a
+test run a lot without needing multiple processes like pytest-xdist.
+
+Pytest still runs the test protocol (setup, call, teardown, reporting) for
+every item one at a time in the normal order. When pytest gets to an item, the
+next few items after it are started in the background, and when pytest gets
+round to calling runtest() on one of those it just waits for the result. This
+means that reporting, ordering and things like --maxfail work as normal.
+
+Only tests which do not need anything to be done at setup time are run in the
+background - if a test uses fixtures which are not session scoped (including
+autouse fixtures), or has any marks which are handled before the test runs
+(skip, xfail, etc.), it is run normally in the main thread when pytest gets to
+it.
+
+A test which is waiting (for delay_before, delay_after, or between retries)
+does not count towards the number of tests running at once - while it waits,
+another upcoming test is started in its place.
+
+Anything a background test logs is kept and handled again when pytest gets to
+that test, so it is reported with the right test (see logbuffer.py). Output
+printed to stdout/stderr is not treated like this - it is captured for whichever
+test pytest is running at the time.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+
+import pytest
+
+from tavern.plugins import load_plugins
+from tavern.util import exceptions
+from tavern.util.delay import WorkerSlots
+
+from .item import YamlItem
+from .logbuffer import log_buffering
+from .util import get_option_generic, load_global_cfg
+
+logger = logging.getLogger(__name__)
+
+# Marks which are checked before the test is run, which would be bypassed if
+# the test was started early
+_SETUP_MARKS = {"skip", "skipif", "xfail", "usefixtures"}
+
+
+def get_concurrency(pytest_config):
+    """Get how many tests to run at once
+
+    Args:
+        pytest_config (pytest.Config): Pytest config object
+
+    Returns:
+        int: number of tests to run at once
+
+    Raises:
+        exceptions.InvalidConfigurationException: invalid value given
+    """
+    concurrency = get_option_generic(pytest_config, "tavern-concurrency", 1)
+
+    if isinstance(concurrency, list):
+        concurrency = concurrency[0]
+
+    try:
+        concurrency = int(concurrency)
+    except (TypeError, ValueError) as e:
+        raise exceptions.InvalidConfigurationException(
+            "tavern-concurrency must be an integer"
+        ) from e
+
+    if concurrency < 1:
+        raise exceptions.InvalidConfigurationException(
+            "tavern-concurrency must be at least 1"
+        )
+
+    return concurrency
+
+
+def _fixtures_ready(item):
+    """Whether every fixture the item uses has already been set up by pytest
+
+    Only session scoped fixtures are counted, because anything else would be
+    set up (or torn down) specifically around this test.
+    """
+    # pylint: disable=protected-access
+    try:
+        name2fixturedefs = item._fixtureinfo.name2fixturedefs
+    except AttributeError:
+        return False
+
+    for name in item.fixturenames:
+        if name == "request":
+            continue
+
+        fixturedefs = name2fixturedefs.get(name)
+        if not fixturedefs:
+            return False
+
+        fixturedef = fixturedefs[-1]
+        if fixturedef.scope != "session" or fixturedef.cached_result is None:
+            return False
+
+        # Fixture raised an exception - let pytest report it
+        if fixturedef.cached_result[-1] is not None:
+            return False
+
+    return True
+
+
+def _log_handlers(pytest_config):
+    """Handlers which capture logs for a particular test
+
+    Args:
+        pytest_config (pytest.Config): Pytest config object
+
+    Returns:
+        list: handlers from the pytest logging plugin, and any other handlers
+            already on the root logger
+    """
+    handlers = list(logging.getLogger().handlers)
+
+    plugin = pytest_config.pluginmanager.get_plugin("logging-plugin")
+    for name in [
+        "caplog_handler",
+        "report_handler",
+        "log_cli_handler",
+        "log_file_handler",
+    ]:
+        handler = getattr(plugin, name, None)
+        if handler is not None:
+            handlers.append(handler)
+
+    return handlers
+
+
+def can_run_concurrently(item):
+    """Whether this item can be started before pytest gets to it
+
+    Args:
+        item (pytest.Item): test item
+
+    Returns:
+        bool: whether it can be started in the background
+    """
+    if not isinstance(item, YamlItem):
+        return False
+
+    if not _fixtures_ready(item):
+        return False
+
+    for mark in item.iter_markers():
+        if mark.name in _SETUP_MARKS or "dependency" in mark.name:
+            return False
+
+    return True
+
+
+class ConcurrentExecutor(object):
+    """Pytest plugin which starts upcoming tests in a thread pool
+
+    Args:
+        concurrency (int): maximum number of tests to run at once
+    """
+
+    def __init__(self, concurrency):
+        self._concurrency = concurrency
+        self._pool = None
+        self._slots = None
+        self._items = []
+        self._positions = {}
+        self._scheduled = set()
+
+        # Scheduling can also be done from worker threads when a test starts
+        # waiting
+        self._lock = threading.RLock()
+        self._position = None
+        self._session = None
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtestloop(self, session):
+        self._items = list(session.items)
+        self._positions = {item: i for i, item in enumerate(self._items)}
+        self._session = session
+
+        # Make sure these are loaded before any other threads try to use them
+        try:
+            load_plugins(load_global_cfg(session.config))
+        except exceptions.TavernException:
+            logger.debug("Error loading plugins", exc_info=True)
+
+        self._slots = WorkerSlots(self._concurrency, on_wait=self._schedule_upcoming)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self._slots.max_threads, thread_name_prefix="tavern"
+        )
+
+        log_buffering.install(_log_handlers(session.config))
+
+        try:
+            yield
+        finally:
+            try:
+                self._shutdown()
+            finally:
+                log_buffering.uninstall()
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        # pylint: disable=unused-argument
+        try:
+            position = self._positions[item]
+        except KeyError:
+            return
+
+        with self._lock:
+            self._position = position
+            self._schedule_upcoming()
+
+    def _schedule_upcoming(self):
+        """Start the next few tests after the one pytest is currently running
+
+        As many tests are started as can be running at once, plus one for every
+        test which is currently waiting.
+        """
+        with self._lock:
+            if self._pool is None or self._position is None:
+                return
+
+            if self._session.shouldstop or self._session.shouldfail:
+                return
+
+            lookahead = min(
+                self._concurrency + self._slots.waiting, self._slots.max_threads
+            )
+            upcoming = self._items[self._position : self._position + lookahead]
+
+            for to_schedule in upcoming:
+                if to_schedule in self._scheduled or not can_run_concurrently(
+                    to_schedule
+                ):
+                    continue
+
+                logger.debug("Starting %s in the background", to_schedule.nodeid)
+
+                self._scheduled.add(to_schedule)
+                to_schedule.schedule(self._pool, self._slots)
+
+    def _shutdown(self):
+        with self._lock:
+            # Tests which pytest never got to (eg, because of --maxfail) should
+            # not be started if they haven't been already
+            for item in self._scheduled:
+                item.unschedule()
+
+            pool, self._pool = self._pool, None
+
+        pool.shutdown(wait=True)
+        self._slots = None
+        self._position = None
+        self._scheduled.clear()
@@ -1,4 +1,3 @@
-import copy
 import functools
 import itertools
 import logging
@@ -10,8 +9,9 @@ import yaml
 
 from tavern.schemas.files import verify_tests
 from tavern.util import exceptions
+from tavern.util.compiled_cache import CompiledTestCache
 from tavern.util.dict_util import format_keys
-from tavern.util.loader import IncludeLoader
+from tavern.util.loader import DefaultIncludeLoader, track_loaded_files
 
 from .item import YamlItem
 from .util import load_global_cfg
@@ -162,8 +162,9 @@ class YamlFile(pytest.File):
                 keys, vals_combination
             )
 
-            # Change the name
-            spec_new = copy.deepcopy(test_spec)
+            # Change the name. Stages are copied when the test is run, so
+            # nothing else needs to be copied here.
+            spec_new = dict(test_spec)
             spec_new["test_name"] = test_spec["test_name"] + "[{}]".format(
                 inner_formatted
             )
@@ -171,13 +172,13 @@ class YamlFile(pytest.File):
             logger.debug("New test name: %s", spec_new["test_name"])
 
             # Make this new thing available for formatting
-            spec_new.setdefault("includes", []).append(
+            spec_new["includes"] = list(test_spec.get("includes", [])) + [
                 {
                     "name": "parametrized[{}]".format(inner_formatted),
                     "description": "autogenerated by Tavern",
                     "variables": variables,
                 }
-            )
+            ]
             # And create the new item
             item_new = YamlItem(spec_new["test_name"], self, spec_new, self.fspath)
             item_new.add_markers(pytest_marks)
@@ -259,6 +260,63 @@ class YamlFile(pytest.File):
 
         yield item
 
+    def _get_compiled_cache(self):
+        """Get the cache of loaded test files, if it is enabled
+
+        Returns:
+            CompiledTestCache: cache, or None if disabled
+        """
+        config = self.config
+
+        enabled = config.getini("tavern-use-compiled-cache") or config.getoption(
+            "tavern_use_compiled_cache"
+        )
+        if not enabled:
+            return None
+
+        # Not present if the cacheprovider plugin is disabled
+        cache = getattr(config, "cache", None)
+        if cache is None:
+            logger.debug("pytest cache not available, not caching test files")
+            return None
+
+        return CompiledTestCache(cache.makedir("tavern-compiled"))
+
+    def _load_tests(self):
+        """Load all documents from the input file, using the on-disk cache if
+        possible
+
+        Returns:
+            list: all documents in the file
+        """
+        compiled_cache = self._get_compiled_cache()
+        filename = str(self.fspath)
+
+        if compiled_cache:
+            cached = compiled_cache.load(filename)
+            if cached is not None:
+                return cached
+
+        with track_loaded_files() as loaded:
+            try:
+                with self.fspath.open(encoding="utf-8") as fileobj:
+                    # Convert to a list so we can catch parser exceptions
+                    all_tests = list(
+                        yaml.load_all(fileobj, Loader=DefaultIncludeLoader)
+                    )
+            except yaml.parser.ParserError as e:
+                raise exceptions.BadSchemaError from e
+
+        if compiled_cache:
+            if loaded.volatile:
+                logger.debug(
+                    "Not caching %s - has values generated at load time", filename
+                )
+            else:
+                compiled_cache.store(filename, all_tests, loaded.files)
+
+        return all_tests
+
     def collect(self):
         """Load each document in the given input file into a different test
 
@@ -266,13 +324,7 @@ class YamlFile(pytest.File):
             YamlItem: Essentially an individual pytest 'test object'
         """
 
-        try:
-            # Convert to a list so we can catch parser exceptions
-            all_tests = list(
-                yaml.load_all(self.fspath.open(encoding="utf-8"), Loader=IncludeLoader)
-            )
-        except yaml.parser.ParserError as e:
-            raise exceptions.BadSchemaError from e
+        all_tests = self._load_tests()
 
         for test_spec in all_tests:
             if not test_spec:
@@ -1,18 +1,52 @@
+import logging
 import re
 
 import pytest
 
 from tavern.util import exceptions
+from tavern.util.loader import include_cache
 
+from .executor import ConcurrentExecutor, get_concurrency
 from .file import YamlFile
+from .timings import TimingsReport, get_timings_filename
 from .util import add_ini_options, add_parser_options, get_option_generic
 
+logger = logging.getLogger(__name__)
+
 
 def pytest_addoption(parser):
     add_parser_options(parser.addoption, with_defaults=False)
     add_ini_options(parser)
 
 
+def pytest_configure(config):
+    """Set up sharing of included files between processes, running tests
+    concurrently and reporting timings if enabled"""
+    shared_dir = None
+
+    if config.getini("tavern-shared-include-cache") or config.getoption(
+        "tavern_shared_include_cache"
+    ):
+        # Not present if the cacheprovider plugin is disabled
+        cache = getattr(config, "cache", None)
+        if cache is None:
+            logger.warning("pytest cache not available, not sharing included files")
+        else:
+            shared_dir = cache.makedir("tavern-includes")
+
+    include_cache.set_shared_dir(shared_dir)
+
+    concurrency = get_concurrency(config)
+    if concurrency > 1:
+        config.pluginmanager.register(
+            ConcurrentExecutor(concurrency), "tavern-concurrency"
+        )
+
+    timings_filename = get_timings_filename(config)
+    if timings_filename:
+        config.pluginmanager.register(TimingsReport(timings_filename), "tavern-timings")
+
+
 def pytest_collect_file(parent, path):
     """On collecting files, get any files that end in .tavern.yaml or .tavern.yml as tavern
     test files
@@ -1,4 +1,3 @@
-import copy
 import logging
 
 from _pytest import fixtures
@@ -10,8 +9,12 @@ from tavern.plugins import load_plugins
 from tavern.schemas.files import verify_tests
 from tavern.testutils.pytesthook.newhooks import call_hook
 from tavern.util import exceptions
+from tavern.util.jmespath_util import precompile_queries
+from tavern.util.scope import new_test_config
+from tavern.util.timing import TestTimings
 
 from .error import ReprdError
+from .logbuffer import log_buffering
 from .util import load_global_cfg
 import json
 
@@ -37,6 +40,14 @@ class YamlItem(pytest.Item):
 
         self.global_cfg = {}
 
+        # Timings for the last time this test was run
+        self.timings = None
+
+        # Set if this test was started early - see executor.py
+        self._scheduled = None
+        # Messages logged by the test if it was run in the background
+        self._background_logs = []
+
     def initialise_fixture_attrs(self):
         # pylint: disable=protected-access,attribute-defined-outside-init
         self.funcargs = {}
@@ -109,7 +120,7 @@ class YamlItem(pytest.Item):
             if "dependency" in pm.name:
                 if "dependency" == pm.name:
                     pm.mark = pytest.mark.dependency()
-              	else:
+                else:
                     mark_attr = pm.name.split(":", 1)
                     depends_val = json.loads(mark_attr[1])
                     pm.mark = pytest.mark.dependency(depends=depends_val, scope="session")
@@ -146,15 +157,60 @@ class YamlItem(pytest.Item):
 
         return values
 
+    def schedule(self, pool, slots=None):
+        """Start running this test in the background
+
+        runtest() will then wait for it to finish instead of running it
+
+        Args:
+            pool (concurrent.futures.Executor): pool to run test in
+            slots (WorkerSlots, optional): slots limiting how many tests run at
+                once, one of which is held while the test is running
+        """
+        self._background_logs = []
+        self._scheduled = pool.submit(self._runtest_in_background, slots)
+
+    def _runtest_in_background(self, slots):
+        with log_buffering.capture(self._background_logs):
+            if slots is None:
+                self._runtest()
+            else:
+                with slots.held():
+                    self._runtest()
+
+    def unschedule(self):
+        """Stop this test from running in the background if it hasn't started"""
+        if self._scheduled is not None and self._scheduled.cancel():
+            self._scheduled = None
+
     def runtest(self):
-        # Do a deep copy because this sometimes still retains things from previous tests(?)
-        self.global_cfg = copy.deepcopy(load_global_cfg(self.config))
+        scheduled, self._scheduled = self._scheduled, None
+
+        if scheduled is not None:
+            try:
+                # Re-raises any exception from the test
+                scheduled.result()
+            finally:
+                # Now that pytest is running this test, anything it logged can
+                # be captured for it
+                logs, self._background_logs = self._background_logs, []
+                log_buffering.replay(logs)
+        else:
+            self._runtest()
 
-        self.global_cfg.setdefault("variables", {})
+    def _runtest(self):
+        # Anything changed by this test only changes this test's copy of the
+        # config and its own layer of variables
+        self.global_cfg = new_test_config(load_global_cfg(self.config))
 
         load_plugins(self.global_cfg)
 
-        self.global_cfg["tavern_internal"] = {"pytest_hook_caller": self.config.hook}
+        self.timings = TestTimings()
+
+        self.global_cfg["tavern_internal"] = {
+            "pytest_hook_caller": self.config.hook,
+            "timings": self.timings,
+        }
 
         # INTERNAL
         # NOTE - now that we can 'mark' tests, we could use pytest.mark.xfail
@@ -173,7 +229,10 @@ class YamlItem(pytest.Item):
                 variables=self.global_cfg["variables"],
             )
 
-            verify_tests(self.spec)
+            with self.timings.phase("verify_schema"):
+                verify_tests(self.spec)
+                # Reported for this test only, before any requests are sent
+                precompile_queries(self.spec)
 
             run_test(self.path, self.spec, self.global_cfg)
         except exceptions.BadSchemaError:
@@ -192,6 +251,13 @@ class YamlItem(pytest.Item):
                 raise exceptions.TestFailError(
                     "Expected test to fail at {} stage".format(xfail)
                 )
+        finally:
+            # Attached to the test report, so it is available to other plugins
+            # and written into junit xml reports
+            self.user_properties = [
+                p for p in self.user_properties if p[0] != "tavern_timings"
+            ]
+            self.user_properties.append(("tavern_timings", self.timings.as_dict()))
 
     def repr_failure(self, excinfo, style=None):
         """ called when self.runtest() raises an exception.
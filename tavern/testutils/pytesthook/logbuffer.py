@@ -0,0 +1,93 @@
+"""Keep log messages from tests run in the background with the right test
+
+When a test is run in the background (see executor.py), anything it logs would
+normally go straight to whichever handlers pytest has set up at that moment,
+which are capturing logs for whatever test pytest is running in the main
+thread. Instead, messages logged from the thread running a background test are
+kept, and handled again from the main thread when pytest gets round to the test
+they came from, so that they are captured and reported for that test.
+
+This only applies to logging - anything printed to stdout or stderr by a test
+running in the background is still captured for whichever test is running in
+the main thread at the time.
+"""
+import contextlib
+import logging
+import threading
+
+_local = threading.local()
+
+
+def _not_buffered(record):
+    """Filter out messages which are being kept to be handled later"""
+    # pylint: disable=unused-argument
+    return getattr(_local, "records", None) is None
+
+
+class _BufferingHandler(logging.Handler):
+    """Keeps messages logged from threads running a background test"""
+
+    def emit(self, record):
+        records = getattr(_local, "records", None)
+        if records is not None:
+            records.append(record)
+
+
+class _LogBuffering(object):
+    """Installs the handler and filters needed to keep messages from
+    background tests"""
+
+    def __init__(self):
+        self._handler = _BufferingHandler()
+        self._filtered = []
+
+    def install(self, handlers):
+        """Start keeping messages from background tests
+
+        Args:
+            handlers (list): handlers which should not see messages from
+                background tests until they are replayed
+        """
+        logging.getLogger().addHandler(self._handler)
+
+        for handler in handlers:
+            if handler is not self._handler and handler not in self._filtered:
+                handler.addFilter(_not_buffered)
+                self._filtered.append(handler)
+
+    def uninstall(self):
+        logging.getLogger().removeHandler(self._handler)
+
+        for handler in self._filtered:
+            handler.removeFilter(_not_buffered)
+
+        self._filtered = []
+
+    @staticmethod
+    @contextlib.contextmanager
+    def capture(records):
+        """Keep messages logged from the current thread
+
+        Args:
+            records (list): messages are appended to this
+        """
+        _local.records = records
+
+        try:
+            yield
+        finally:
+            _local.records = None
+
+    @staticmethod
+    def replay(records):
+        """Handle messages which were kept from a background test, as if they
+        had been logged from the current thread
+
+        Args:
+            records (list): messages to handle
+        """
+        for record in records:
+            logging.getLogger(record.name).handle(record)
+
+
+log_buffering = _LogBuffering()
@@ -34,6 +34,21 @@ def pytest_tavern_beta_after_every_response(expected, response):
     """
 
 
+def pytest_tavern_beta_after_every_stage(stage, timings):
+    """Called after every stage has been run, whether it passed or failed
+
+    Note:
+        - If a stage is retried this will be called after every attempt
+        - When running tests concurrently this can be called from multiple
+          threads at once
+
+    Args:
+        stage (dict): Stage which was run
+        timings (tavern.util.timing.StageTimings): How long each phase of
+            running the stage took
+    """
+
+
 def call_hook(test_block_config, hookname, **kwargs):
     """Utility to call the hooks"""
     try:
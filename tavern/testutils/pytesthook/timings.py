@@ -0,0 +1,87 @@
+"""Write a summary of how long each part of every test took
+
+Timings for each test are attached to its report as a user property by
+YamlItem, so this works the same way whether or not tests are being run in
+separate processes with pytest-xdist.
+"""
+import json
+import logging
+
+from .util import get_option_generic
+
+logger = logging.getLogger(__name__)
+
+
+def get_timings_filename(pytest_config):
+    """Get the file to write timings to
+
+    Args:
+        pytest_config (pytest.Config): Pytest config object
+
+    Returns:
+        str: filename, or None if timings should not be written
+    """
+    filename = get_option_generic(pytest_config, "tavern-timings-file", None)
+
+    if isinstance(filename, list):
+        filename = filename[0]
+
+    return filename or None
+
+
+class TimingsReport(object):
+    """Pytest plugin which collects timings from every test report and writes
+    them to a JSON file at the end of the session
+
+    Args:
+        filename (str): file to write to
+    """
+
+    def __init__(self, filename):
+        self._filename = filename
+        self._tests = []
+
+    def pytest_runtest_logreport(self, report):
+        if report.when != "call":
+            return
+
+        for name, value in report.user_properties:
+            if name == "tavern_timings":
+                self._tests.append(
+                    {
+                        "nodeid": report.nodeid,
+                        "outcome": report.outcome,
+                        "duration": report.duration,
+                        "timings": value,
+                    }
+                )
+
+    def summary(self):
+        """Get timings for all tests, and the total time spent in each phase
+
+        Returns:
+            dict: summary of timings
+        """
+        totals = {}
+
+        def add_totals(phases):
+            for phase, seconds in phases.items():
+                totals[phase] = totals.get(phase, 0.0) + seconds
+
+        for test in self._tests:
+            add_totals(test["timings"]["phases"])
+            for stage in test["timings"]["stages"]:
+                add_totals(stage["phases"])
+
+        return {"totals": totals, "tests": self._tests}
+
+    def pytest_sessionfinish(self, session):
+        if hasattr(session.config, "workerinput"):
+            # pytest-xdist worker - reports are sent to the controller, which
+            # writes the file
+            return
+
+        logger.debug("Writing timings to %s", self._filename)
+
+        with open(self._filename, "w", encoding="utf-8") as timings_file:
+            json.dump(self.summary(), timings_file, indent=2)
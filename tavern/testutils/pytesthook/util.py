@@ -4,8 +4,10 @@ import os
 
 from box import Box
 
+from tavern.util import exceptions
 from tavern.util.dict_util import format_keys
 from tavern.util.general import load_global_config
+from tavern.util.log_util import DEFAULT_MAX_LENGTH, set_max_length
 from tavern.util.strict_util import StrictLevel
 
 logger = logging.getLogger(__name__)
@@ -65,6 +67,65 @@ def add_parser_options(parser_addoption, with_defaults=True):
         default=False,
         action="store_true",
     )
+    parser_addoption(
+        "--tavern-use-compiled-cache",
+        help="Cache loaded test files between runs",
+        default=False,
+        action="store_true",
+    )
+    parser_addoption(
+        "--tavern-shared-include-cache",
+        help="Share files loaded with !include between processes",
+        default=False,
+        action="store_true",
+    )
+    parser_addoption(
+        "--tavern-concurrency",
+        help="Maximum number of tests to run at once",
+        default=1 if with_defaults else None,
+        type=int,
+    )
+    parser_addoption(
+        "--tavern-timings-file",
+        help="Write how long each part of every test took to this file as JSON",
+        default=None,
+    )
+    parser_addoption(
+        "--tavern-http-pool",
+        help="Share HTTP connection pools between tests",
+        default=False,
+        action="store_true",
+    )
+    parser_addoption(
+        "--tavern-http-pool-connections",
+        help="Number of hosts to keep shared HTTP connection pools for",
+        default=None,
+        type=int,
+    )
+    parser_addoption(
+        "--tavern-http-pool-maxsize",
+        help="Number of HTTP connections to keep alive to each host",
+        default=None,
+        type=int,
+    )
+    parser_addoption(
+        "--tavern-http-pool-block",
+        help="Never open more than tavern-http-pool-maxsize connections to a host",
+        default=False,
+        action="store_true",
+    )
+    parser_addoption(
+        "--tavern-mqtt-pool",
+        help="Keep MQTT connections open and reuse them between tests",
+        default=False,
+        action="store_true",
+    )
+    parser_addoption(
+        "--tavern-log-max-length",
+        help="Maximum number of characters of each request or response value to log (0 for no limit)",
+        default=None,
+        type=int,
+    )
 
 
 def add_ini_options(parser):
@@ -114,6 +175,61 @@ def add_ini_options(parser):
         default=False,
         type="bool",
     )
+    parser.addini(
+        "tavern-use-compiled-cache",
+        help="Cache loaded test files between runs",
+        default=False,
+        type="bool",
+    )
+    parser.addini(
+        "tavern-shared-include-cache",
+        help="Share files loaded with !include between processes",
+        default=False,
+        type="bool",
+    )
+    parser.addini(
+        "tavern-concurrency",
+        help="Maximum number of tests to run at once",
+        default="1",
+    )
+    parser.addini(
+        "tavern-timings-file",
+        help="Write how long each part of every test took to this file as JSON",
+        default=None,
+    )
+    parser.addini(
+        "tavern-http-pool",
+        help="Share HTTP connection pools between tests",
+        type="bool",
+        default=False,
+    )
+    parser.addini(
+        "tavern-http-pool-connections",
+        help="Number of hosts to keep shared HTTP connection pools for",
+        default="10",
+    )
+    parser.addini(
+        "tavern-http-pool-maxsize",
+        help="Number of HTTP connections to keep alive to each host",
+        default="10",
+    )
+    parser.addini(
+        "tavern-http-pool-block",
+        help="Never open more than tavern-http-pool-maxsize connections to a host",
+        type="bool",
+        default=False,
+    )
+    parser.addini(
+        "tavern-mqtt-pool",
+        help="Keep MQTT connections open and reuse them between tests",
+        type="bool",
+        default=False,
+    )
+    parser.addini(
+        "tavern-log-max-length",
+        help="Maximum number of characters of each request or response value to log (0 for no limit)",
+        default=None,
+    )
 
 
 @lru_cache()
@@ -152,6 +268,11 @@ def load_global_cfg(pytest_config):
     global_cfg["follow_redirects"] = _load_global_follow_redirects(pytest_config)
     global_cfg["backends"] = _load_global_backends(pytest_config)
     global_cfg["merge_ext_values"] = _load_global_merge_ext(pytest_config)
+    global_cfg["http_pool"] = _load_global_http_pool(pytest_config)
+    global_cfg["mqtt_pool"] = _load_global_mqtt_pool(pytest_config)
+    global_cfg["log_max_length"] = _load_global_log_max_length(pytest_config)
+
+    set_max_length(global_cfg["log_max_length"])
 
     logger.debug("Global config: %s", global_cfg)
 
@@ -189,6 +310,84 @@ def _load_global_merge_ext(pytest_config):
     return get_option_generic(pytest_config, "tavern-merge-ext-function-values", True)
 
 
+def _load_global_http_pool(pytest_config):
+    """Load settings for HTTP connection pools shared between tests
+
+    Returns:
+        dict: pool settings, or None if pooling is disabled
+
+    Raises:
+        exceptions.InvalidConfigurationException: invalid pool size
+    """
+
+    def enabled(flag):
+        return pytest_config.getini(flag) or pytest_config.getoption(
+            flag.replace("-", "_")
+        )
+
+    if not enabled("tavern-http-pool"):
+        return None
+
+    def pool_size(flag):
+        value = get_option_generic(pytest_config, flag, 10)
+
+        try:
+            value = int(value)
+        except (TypeError, ValueError) as e:
+            raise exceptions.InvalidConfigurationException(
+                "{} must be an integer".format(flag)
+            ) from e
+
+        if value < 1:
+            raise exceptions.InvalidConfigurationException(
+                "{} must be at least 1".format(flag)
+            )
+
+        return value
+
+    return {
+        "pool_connections": pool_size("tavern-http-pool-connections"),
+        "pool_maxsize": pool_size("tavern-http-pool-maxsize"),
+        "pool_block": bool(enabled("tavern-http-pool-block")),
+    }
+
+
+def _load_global_mqtt_pool(pytest_config):
+    """Load whether MQTT connections should be reused between tests"""
+    return bool(
+        pytest_config.getini("tavern-mqtt-pool")
+        or pytest_config.getoption("tavern_mqtt_pool")
+    )
+
+
+def _load_global_log_max_length(pytest_config):
+    """Load how many characters of each value should be logged
+
+    Returns:
+        int: maximum length, or 0 for no limit
+
+    Raises:
+        exceptions.InvalidConfigurationException: invalid length
+    """
+    value = get_option_generic(
+        pytest_config, "tavern-log-max-length", DEFAULT_MAX_LENGTH
+    )
+
+    try:
+        value = int(value)
+    except (TypeError, ValueError) as e:
+        raise exceptions.InvalidConfigurationException(
+            "tavern-log-max-length must be an integer"
+        ) from e
+
+    if value < 0:
+        raise exceptions.InvalidConfigurationException(
+            "tavern-log-max-length must not be negative"
+        )
+
+    return value
+
+
 def get_option_generic(pytest_config, flag, default):
     """Get a configuration option or return the default
 
@@ -0,0 +1,160 @@
+"""On-disk cache of loaded test files
+
+Loading test files with the pure python YAML loader is slow, and for large test
+suites collection can end up being dominated by it. This stores the loaded
+(source mapped) documents for each test file so that on the next run an
+unchanged file does not have to be parsed again.
+
+An entry is only used if the hash of the test file, the hash of every file it
+included (directly or transitively), and the Tavern version all match what they
+were when the entry was written.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+
+from tavern import __version__
+
+logger = logging.getLogger(__name__)
+
+
+def file_hash(filename):
+    """Get a hash of the contents of a file
+
+    Args:
+        filename (str): path to file
+
+    Returns:
+        str: hex digest of file contents
+    """
+    hasher = hashlib.sha256()
+
+    with open(filename, "rb") as fileobj:
+        for chunk in iter(lambda: fileobj.read(65536), b""):
+            hasher.update(chunk)
+
+    return hasher.hexdigest()
+
+
+def read_pickle(path):
+    """Read a pickled object from a file
+
+    Args:
+        path (str): path to file
+
+    Returns:
+        object: unpickled object, or None if it could not be read for any reason
+    """
+    try:
+        with open(path, "rb") as fileobj:
+            return pickle.load(fileobj)
+    except FileNotFoundError:
+        return None
+    except Exception:  # pylint: disable=broad-except
+        # Truncated/corrupt/from an incompatible version - just ignore it
+        logger.debug("Unable to read cache entry from %s", path, exc_info=True)
+        return None
+
+
+def write_pickle(path, obj):
+    """Atomically write a pickled object to a file
+
+    This writes to a temporary file first so that other processes reading the
+    same cache (eg, pytest-xdist workers) never see a partially written entry.
+
+    Args:
+        path (str): path to file
+        obj (object): object to pickle
+    """
+    try:
+        dumped = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:  # pylint: disable=broad-except
+        # Custom yaml tags from plugins etc. might not be picklable
+        logger.debug("Unable to pickle cache entry for %s", path, exc_info=True)
+        return
+
+    directory = os.path.dirname(path)
+
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fileobj:
+            fileobj.write(dumped)
+        os.replace(tmp_path, path)
+    except OSError:
+        logger.warning("Unable to write cache entry to %s", path, exc_info=True)
+
+
+class CompiledTestCache(object):
+    """Caches loaded test documents on disk
+
+    Args:
+        cache_dir (str): directory to store cache entries in
+    """
+
+    def __init__(self, cache_dir):
+        self._cache_dir = str(cache_dir)
+
+    def _entry_path(self, filename):
+        name = hashlib.sha256(os.path.abspath(filename).encode("utf8")).hexdigest()
+        return os.path.join(self._cache_dir, name + ".pickle")
+
+    def load(self, filename):
+        """Load cached documents for a test file if they are still valid
+
+        Args:
+            filename (str): path to test file
+
+        Returns:
+            list: loaded documents, or None if there was no valid cache entry
+        """
+        entry = read_pickle(self._entry_path(filename))
+
+        if not isinstance(entry, dict):
+            return None
+
+        if entry.get("version") != __version__:
+            logger.debug("Cache entry for %s was from a different version", filename)
+            return None
+
+        if entry.get("hash") != file_hash(filename):
+            logger.debug("%s changed since it was cached", filename)
+            return None
+
+        for dependency, dependency_hash in entry.get("dependencies", {}).items():
+            try:
+                current_hash = file_hash(dependency)
+            except OSError:
+                logger.debug("Included file %s no longer exists", dependency)
+                return None
+
+            if current_hash != dependency_hash:
+                logger.debug("Included file %s changed since it was cached", dependency)
+                return None
+
+        logger.debug("Using cached documents for %s", filename)
+
+        return entry["documents"]
+
+    def store(self, filename, documents, dependencies):
+        """Store loaded documents for a test file
+
+        Args:
+            filename (str): path to test file
+            documents (list): documents loaded from the test file
+            dependencies (set): paths to all files included while loading the
+                test file
+        """
+        try:
+            entry = {
+                "version": __version__,
+                "hash": file_hash(filename),
+                "dependencies": {d: file_hash(d) for d in dependencies},
+                "documents": documents,
+            }
+        except OSError:
+            logger.debug("Unable to hash files for %s", filename, exc_info=True)
+            return
+
+        write_pickle(self._entry_path(filename), entry)
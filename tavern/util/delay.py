@@ -1,10 +1,126 @@
+"""Waiting before and after stages, and between retries
+
+When tests are run concurrently (with --tavern-concurrency, or in a load test),
+each test runs in a worker thread, and only a limited number of tests are
+allowed to actually be running at once. A test which is just waiting (for
+delay_before, delay_after, or between retries) does not need to count towards
+that limit, so while it waits it gives up its slot to another test and takes it
+back again when it has finished waiting.
+
+When tests are not being run concurrently, waiting is just a sleep.
+"""
+import contextlib
 import logging
+import threading
 import time
 
 from .dict_util import format_keys
 
 logger = logging.getLogger(__name__)
 
+# How many tests can be waiting at once for every test which is allowed to be
+# running, which limits the number of threads which are started
+WAITING_PER_SLOT = 4
+
+_local = threading.local()
+
+
+class WorkerSlots(object):
+    """Limits how many tests are running at once, not counting tests which are
+    waiting
+
+    Args:
+        concurrency (int): number of tests which can be running at once
+        on_wait (callable, optional): called (with no arguments) whenever a
+            test gives up its slot to wait, so that something else can be
+            started in its place
+
+    Attributes:
+        waiting (int): number of tests currently waiting
+    """
+
+    def __init__(self, concurrency, on_wait=None):
+        self.concurrency = concurrency
+        self.waiting = 0
+
+        self._semaphore = threading.Semaphore(concurrency)
+        self._lock = threading.Lock()
+        self._on_wait = on_wait
+
+    @property
+    def max_threads(self):
+        """Most threads which will be needed to run tests in these slots"""
+        return self.concurrency * (1 + WAITING_PER_SLOT)
+
+    @contextlib.contextmanager
+    def held(self):
+        """Hold a slot while running a test in the current thread"""
+        self._semaphore.acquire()
+        _local.slots = self
+
+        try:
+            yield
+        finally:
+            _local.slots = None
+            self._semaphore.release()
+
+    def wait(self, seconds):
+        """Give up the slot held by this thread and sleep
+
+        Args:
+            seconds (float): how long to wait
+        """
+        self._semaphore.release()
+
+        with self._lock:
+            self.waiting += 1
+
+        try:
+            if self._on_wait is not None:
+                self._on_wait()
+
+            time.sleep(seconds)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+            self._semaphore.acquire()
+
+
+def sleep(seconds):
+    """Wait, letting another test run in the meantime if tests are being run
+    concurrently
+
+    Args:
+        seconds (float): how long to wait
+    """
+    if seconds <= 0:
+        return
+
+    slots = getattr(_local, "slots", None)
+
+    if slots is None:
+        time.sleep(seconds)
+    else:
+        slots.wait(seconds)
+
+
+def get_delay(stage, when, variables):
+    """Get the length of delay_before/delay_after
+
+    Args:
+        stage (dict): test stage
+        when (str): 'before' or 'after'
+        variables (dict): Variables to format with
+
+    Returns:
+        float: length of delay, or None if there is no delay
+    """
+    try:
+        return format_keys(stage["delay_{}".format(when)], variables)
+    except KeyError:
+        return None
+
 
 def delay(stage, when, variables):
     """Look for delay_before/delay_after and sleep
@@ -15,10 +131,8 @@ def delay(stage, when, variables):
         variables (dict): Variables to format with
     """
 
-    try:
-        length = format_keys(stage["delay_{}".format(when)], variables)
-    except KeyError:
-        pass
-    else:
+    length = get_delay(stage, when, variables)
+
+    if length is not None:
         logger.debug("Delaying %s request for %.2f seconds", when, length)
-        time.sleep(length)
+        sleep(length)
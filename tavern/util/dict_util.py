@@ -1,9 +1,13 @@
+import bisect
 import collections
+import collections.abc
+import functools
+import heapq
 import logging
 import re
 import string
 
-from box import Box
+from box import Box, BoxList
 import jmespath
 
 from tavern.util.loader import (
@@ -14,7 +18,8 @@ from tavern.util.loader import (
     TypeSentinel,
 )
 
-from . import exceptions
+from . import exceptions, jmespath_util
+from .log_util import Truncated
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +34,176 @@ class _FormattedString(str):
         super(_FormattedString, self).__init__(s)
 
 
-def _check_and_format_values(to_format, box_vars):
+class _NeedsFallback(Exception):
+    """A format string can't be rendered by _render_template and needs to be
+    formatted using Box and str.format instead"""
+
+
+_FIELD_FIRST = re.compile(r"[^.[]*")
+_FIELD_ACCESSOR = re.compile(r"\.([^.[]*)|\[([^\]]*)\]")
+
+
+def _split_field_name(field_name):
+    """Split the name of a format field into the first name and the attributes
+    and items accessed on it, the same way str.format does
+
+    Example:
+
+        >>> _split_field_name("a.b[0]")
+        ('a', ((True, 'b'), (False, 0)))
+
+    Args:
+        field_name (str): field name from string.Formatter().parse
+
+    Returns:
+        tuple: first name, and a tuple of (is_attribute, key) accessors. The
+            first name and item keys are ints if they are all digits.
+
+    Raises:
+        ValueError: Invalid field name
+    """
+
+    def maybe_int(value):
+        return int(value) if value.isdecimal() else value
+
+    end = _FIELD_FIRST.match(field_name).end()
+    first = maybe_int(field_name[:end])
+
+    accessors = []
+
+    while end < len(field_name):
+        match = _FIELD_ACCESSOR.match(field_name, end)
+        if match is None:
+            raise ValueError("Invalid format field '{}'".format(field_name))
+
+        attribute, key = match.groups()
+        if not (attribute or key):
+            raise ValueError("Empty attribute in format field '{}'".format(field_name))
+
+        if attribute is not None:
+            accessors.append((True, attribute))
+        else:
+            accessors.append((False, maybe_int(key)))
+
+        end = match.end()
+
+    return first, tuple(accessors)
+
+
+@functools.lru_cache(maxsize=4096)
+def _compile_template(to_format):
+    """Parse a format string into literal text and fields
+
+    Args:
+        to_format (str): format string
+
+    Returns:
+        str, tuple, None: If there are no fields in the string, the string
+            with any escaped braces replaced. Otherwise a tuple of (literal
+            text, field) pairs, where field is a tuple of (first name, list of
+            (is_attribute, key) accessors, conversion, format spec) or None.
+            None if the string can't be rendered by _render_template.
+
+    Raises:
+        ValueError: Invalid format string
+    """
+    segments = []
+
+    for (literal, field_name, format_spec, conversion) in string.Formatter().parse(
+        to_format
+    ):
+        if field_name is None:
+            segments.append((literal, None))
+            continue
+
+        if "{" in format_spec or "}" in format_spec:
+            # Nested fields in the format spec - rare enough to not bother with
+            return None
+
+        try:
+            first, accessors = _split_field_name(field_name)
+        except ValueError:
+            # Let the fallback raise the same error as it used to
+            return None
+
+        segments.append((literal, (first, accessors, conversion, format_spec)))
+
+    if all(field is None for (_, field) in segments):
+        return "".join(literal for (literal, _) in segments)
+
+    return tuple(segments)
+
+
+def _resolve_field(first, accessors, variables):
+    """Get the value of a format field by accessing variables directly
+
+    This has to give exactly the same result as getting the field from
+    Box(variables), so anything which Box might handle differently (missing
+    keys, attributes which exist on Box, etc.) raises _NeedsFallback.
+    """
+    if not isinstance(first, str) or not first:
+        raise _NeedsFallback
+
+    try:
+        value = variables[first]
+
+        for (is_attribute, key) in accessors:
+            if not is_attribute:
+                value = value[key]
+            elif isinstance(value, collections.abc.Mapping):
+                if hasattr(Box, key):
+                    raise _NeedsFallback
+                value = value[key]
+            elif isinstance(value, list):
+                if hasattr(BoxList, key):
+                    raise _NeedsFallback
+                value = getattr(value, key)
+            else:
+                value = getattr(value, key)
+    except (KeyError, IndexError, AttributeError, TypeError) as e:
+        raise _NeedsFallback from e
+
+    if isinstance(value, (collections.abc.Mapping, list)):
+        # Would be converted to a Box/BoxList, which format differently
+        raise _NeedsFallback
+
+    return value
+
+
+def _render_template(segments, variables):
+    resolved = []
+
+    for (_, field) in segments:
+        if field is None:
+            resolved.append(None)
+            continue
+
+        (first, accessors, _, _) = field
+        resolved.append(_resolve_field(first, accessors, variables))
+
+    for field, value in zip(segments, resolved):
+        if field[1] is not None and not isinstance(value, (str, int, float)):
+            logger.warning(
+                "Formatting '%s' will result in it being coerced to a string (it is a %s)",
+                field[1][0],
+                type(value),
+            )
+
+    formatter = string.Formatter()
+    rendered = []
+
+    for (literal, field), value in zip(segments, resolved):
+        rendered.append(literal)
+
+        if field is not None:
+            (_, _, conversion, format_spec) = field
+            value = formatter.convert_field(value, conversion)
+            rendered.append(format(value, format_spec))
+
+    return "".join(rendered)
+
+
+def _format_with_box(to_format, box_vars):
     formatter = string.Formatter()
     would_format = formatter.parse(to_format)
 
@@ -41,7 +215,9 @@ def _check_and_format_values(to_format, box_vars):
             would_replace = formatter.get_field(field_name, [], box_vars)[0]
         except KeyError as e:
             logger.error(
-                "Failed to resolve string [%s] with variables [%s]", to_format, box_vars
+                "Failed to resolve string [%s] with variables [%s]",
+                to_format,
+                Truncated(box_vars),
             )
             logger.error("Key(s) not found in format: %s", field_name)
             raise exceptions.MissingFormatError(field_name) from e
@@ -59,6 +235,37 @@ def _check_and_format_values(to_format, box_vars):
     return to_format.format(**box_vars)
 
 
+def _check_and_format_values(to_format, variables):
+    """Format a string with the given variables
+
+    The string is only parsed the first time it is seen, and if possible the
+    fields are then looked up directly in the variables. Anything unusual is
+    formatted using Box instead, which also gives the same errors as before.
+
+    Args:
+        to_format (str): string to format
+        variables (dict): variables to format with
+
+    Returns:
+        str: formatted string
+
+    Raises:
+        MissingFormatError: field in string was not in variables
+    """
+    template = _compile_template(to_format)
+
+    if isinstance(template, str):
+        return template
+
+    if template is not None:
+        try:
+            return _render_template(template, variables)
+        except _NeedsFallback:
+            logger.debug("Formatting '%s' using Box", to_format)
+
+    return _format_with_box(to_format, Box(variables))
+
+
 def _attempt_find_include(to_format, box_vars):
     formatter = string.Formatter()
     would_format = list(formatter.parse(to_format))
@@ -110,28 +317,27 @@ def format_keys(val, variables, no_double_format=True):
         str,int,list,dict: recursively formatted values
     """
     formatted = val
-    box_vars = Box(variables)
 
     if isinstance(val, dict):
         formatted = {}
-        # formatted = {key: format_keys(val[key], box_vars) for key in val}
+        # formatted = {key: format_keys(val[key], variables) for key in val}
         for key in val:
-            formatted[key] = format_keys(val[key], box_vars)
+            formatted[key] = format_keys(val[key], variables)
     elif isinstance(val, (list, tuple)):
-        formatted = [format_keys(item, box_vars) for item in val]
+        formatted = [format_keys(item, variables) for item in val]
     elif isinstance(formatted, _FormattedString):
         logger.debug("Already formatted %s, not double-formatting", formatted)
     elif isinstance(val, str):
-        formatted = _check_and_format_values(val, box_vars)
+        formatted = _check_and_format_values(val, variables)
 
         if no_double_format:
             formatted = _FormattedString(formatted)
     elif isinstance(val, TypeConvertToken):
         logger.debug("Got type convert token '%s'", val)
         if isinstance(val, ForceIncludeToken):
-            formatted = _attempt_find_include(val.value, box_vars)
+            formatted = _attempt_find_include(val.value, Box(variables))
         else:
-            value = format_keys(val.value, box_vars)
+            value = format_keys(val.value, variables)
             formatted = val.constructor(value)
     else:
         logger.debug("Not formatting something of type '%s'", type(formatted))
@@ -159,7 +365,7 @@ def recurse_access_key(data, query):
     """
 
     try:
-        from_jmespath = jmespath.search(query, data)
+        from_jmespath = jmespath_util.search(query, data)
     except jmespath.exceptions.ParseError as e:
         logger.error("Error parsing JMES query")
 
@@ -202,7 +408,9 @@ def _deprecated_recurse_access_key(current_val, keys):
     Returns:
         str or dict: value of subkey in dict
     """
-    logger.debug("Recursively searching for '%s' in '%s'", keys, current_val)
+    logger.debug(
+        "Recursively searching for '%s' in '%s'", keys, Truncated(current_val)
+    )
 
     if not keys:
         return current_val
@@ -325,6 +533,204 @@ def yield_keyvals(block):
             yield [sidx], sidx, val
 
 
+def _types_match(expected_val, actual_type):
+    """Whether the type of the actual value is compatible with the expected
+    value - see check_keys_match_recursive"""
+    return (
+        # If they are the same type
+        isinstance(expected_val, actual_type)
+        or
+        # Handles the case where, for example, the 'actual type' returned by
+        # a custom backend returns an OrderedDict, which is a subclass of
+        # dict but will raise a confusing error if the contents are
+        # different
+        issubclass(actual_type, type(expected_val))
+    )
+
+
+def _is_match(expected_val, actual_val, strict):
+    """Whether check_keys_match_recursive would pass for these values
+
+    This follows exactly the same rules, but returns as soon as it finds a
+    difference instead of raising an exception with an error message, which is
+    a lot faster when checking lots of values that are expected not to match.
+
+    Args:
+        expected_val (object): expected value
+        actual_val (object): actual value
+        strict (bool): whether to do strict key checking
+
+    Returns:
+        bool: whether the values match
+    """
+    # pylint: disable=too-many-return-statements
+
+    if actual_val == expected_val or expected_val is ANYTHING:
+        return True
+
+    actual_type = type(actual_val)
+
+    if isinstance(expected_val, TypeSentinel):
+        if expected_val.constructor != actual_type:
+            return False
+
+        if isinstance(expected_val, RegexSentinel):
+            return expected_val.passes(actual_val)
+
+        return True
+
+    if not _types_match(expected_val, actual_type):
+        return False
+
+    if isinstance(expected_val, dict):
+        ekeys = expected_val.keys()
+
+        if strict:
+            if ekeys != actual_val.keys():
+                return False
+        elif not ekeys <= actual_val.keys():
+            return False
+
+        return all(
+            _is_match(e_val, actual_val[key], strict)
+            for key, e_val in expected_val.items()
+        )
+    elif isinstance(expected_val, list):
+        if strict:
+            return len(expected_val) == len(actual_val) and all(
+                _is_match(e_val, a_val, strict)
+                for e_val, a_val in zip(expected_val, actual_val)
+            )
+
+        index = _ListIndex(actual_val)
+        position = 0
+
+        for e_val in expected_val:
+            found = index.find(e_val, position, strict)
+            if found is None:
+                return False
+            position = found + 1
+
+        return True
+
+    return False
+
+
+class _ListIndex(object):
+    """Index of the items in a list in a response, used to quickly find the
+    next item which matches an expected value when checking a list without
+    strict key checking
+
+    Items are indexed by their type and, if they can be hashed, their value, so
+    only items which could possibly match need to be checked.
+
+    Args:
+        items (list): items in the response
+    """
+
+    def __init__(self, items):
+        self._items = items
+        self._by_type = {}
+        self._by_value = {}
+
+        for position, item in enumerate(items):
+            self._by_type.setdefault(type(item), []).append(position)
+
+            try:
+                self._by_value.setdefault(item, []).append(position)
+            except TypeError:
+                # Unhashable - only matched by type
+                pass
+
+    def _candidates(self, expected_val):
+        """Get positions of all the items which could match this value
+
+        Returns:
+            Sequence: sorted positions
+        """
+        if expected_val is ANYTHING:
+            return range(len(self._items))
+
+        if isinstance(expected_val, TypeSentinel):
+            return self._by_type.get(expected_val.constructor, [])
+
+        if isinstance(expected_val, (dict, list)):
+            compatible = [
+                positions
+                for actual_type, positions in self._by_type.items()
+                if _types_match(expected_val, actual_type)
+            ]
+
+            if len(compatible) == 1:
+                return compatible[0]
+
+            return list(heapq.merge(*compatible))
+
+        try:
+            # Anything else has to be equal to match
+            return self._by_value.get(expected_val, [])
+        except TypeError:
+            return range(len(self._items))
+
+    def find(self, expected_val, start, strict):
+        """Find the first item at or after 'start' which matches
+
+        Args:
+            expected_val (object): expected value
+            start (int): position to start looking from
+            strict (bool): whether to do strict key checking
+
+        Returns:
+            int: position of matching item, or None if there wasn't one
+        """
+        candidates = self._candidates(expected_val)
+
+        for i in range(bisect.bisect_left(candidates, start), len(candidates)):
+            position = candidates[i]
+            if _is_match(expected_val, self._items[position], strict):
+                return position
+
+        return None
+
+
+class _KeyPath(object):
+    """Path to the value currently being checked
+
+    Each level only keeps a reference to the level above it, so going down a
+    level is cheap. The full list of keys is only built when it is needed for
+    an error message.
+    """
+
+    __slots__ = ("_parent", "_key")
+
+    def __init__(self, parent=None, key=None):
+        self._parent = parent
+        self._key = key
+
+    @classmethod
+    def from_keys(cls, keys):
+        path = cls()
+        for key in keys:
+            path = path.child(key)
+        return path
+
+    def child(self, key):
+        return _KeyPath(self, key)
+
+    def keys(self):
+        keys = []
+
+        node = self
+        while node._parent is not None:
+            keys.append(node._key)
+            node = node._parent
+
+        return keys[::-1]
+
+    def __str__(self):
+        return "".join('["{}"]'.format(key) for key in self.keys())
+
+
 def check_keys_match_recursive(expected_val, actual_val, keys, strict=True):
     """Utility to recursively check response values
 
@@ -357,8 +763,42 @@ def check_keys_match_recursive(expected_val, actual_val, keys, strict=True):
     Raises:
         KeyMismatchError: expected_val and actual_val did not match
     """
+    _check_keys_match(expected_val, actual_val, _KeyPath.from_keys(keys), strict)
+
+
+def values_match(expected_val, actual_val, strict=True):
+    """Check whether values match, using the same rules as
+    check_keys_match_recursive
 
-    # pylint: disable=too-many-locals,too-many-statements
+    Use this instead of catching the error from check_keys_match_recursive if
+    the error message is not needed - it is a lot faster if the values do not
+    match.
+
+    Args:
+        expected_val (dict, list, str): expected value
+        actual_val (dict, list, str): actual value
+        strict (bool): Whether 'strict' key checking should be done
+
+    Returns:
+        bool: whether the values match
+    """
+    return _is_match(expected_val, actual_val, strict)
+
+
+def _check_keys_match(expected_val, actual_val, path, strict):
+    """Implementation of check_keys_match_recursive
+
+    Error messages (which can be very large, as they include the whole of the
+    expected and actual values) are only built if there is an error.
+
+    Args:
+        path (_KeyPath): path to the values being checked
+    """
+
+    # pylint: disable=too-many-branches
+
+    if actual_val == expected_val:
+        return
 
     def full_err():
         """Get error in the format:
@@ -366,16 +806,13 @@ def check_keys_match_recursive(expected_val, actual_val, keys, strict=True):
         a["b"]["c"] = 4, b["b"]["c"] = {'key': 'value'}
         """
 
-        def _format_err(which):
-            return "{}{}".format(which, "".join('["{}"]'.format(key) for key in keys))
+        formatted_path = str(path)
 
-        e_formatted = _format_err("expected")
-        a_formatted = _format_err("actual")
         return "{} = '{}' (type = {}), {} = '{}' (type = {})".format(
-            e_formatted,
+            "expected" + formatted_path,
             expected_val,
             type(expected_val),
-            a_formatted,
+            "actual" + formatted_path,
             actual_val,
             type(actual_val),
         )
@@ -383,53 +820,43 @@ def check_keys_match_recursive(expected_val, actual_val, keys, strict=True):
     actual_type = type(actual_val)
 
     if expected_val is ANYTHING:
-        # Match anything. We could just early exit here but having the debug
-        # logging below is useful
-        expected_matches = True
-    elif isinstance(expected_val, TypeSentinel):
+        logger.debug("Value at %s matches !anything", path)
+        return
+
+    if isinstance(expected_val, TypeSentinel):
         # If the 'expected' type is actually just a sentinel for another type,
         # then it should match
         expected_matches = expected_val.constructor == actual_type
     else:
         # Normal matching
-        expected_matches = (
-            # If they are the same type
-            isinstance(expected_val, actual_type)
-            or
-            # Handles the case where, for example, the 'actual type' returned by
-            # a custom backend returns an OrderedDict, which is a subclass of
-            # dict but will raise a confusing error if the contents are
-            # different
-            issubclass(actual_type, type(expected_val))
-        )
+        expected_matches = _types_match(expected_val, actual_type)
 
-    try:
-        assert actual_val == expected_val
-    except AssertionError as e:
-        # At this point, there is likely to be an error unless we're using any
-        # of the type sentinels
-
-        if not (expected_val is ANYTHING):  # pylint: disable=superfluous-parens
-            if not expected_matches:
-                if isinstance(expected_val, RegexSentinel):
-                    msg = "Expected a string to match regex '{}' ({})".format(
-                        expected_val.compiled, full_err()
-                    )
-                else:
-                    msg = "Type of returned data was different than expected ({})".format(
-                        full_err()
-                    )
+    # At this point, there is likely to be an error unless we're using any of
+    # the type sentinels
 
-                raise exceptions.KeyMismatchError(msg) from e
+    if not expected_matches:
+        if isinstance(expected_val, RegexSentinel):
+            msg = "Expected a string to match regex '{}' ({})".format(
+                expected_val.compiled, full_err()
+            )
+        else:
+            msg = "Type of returned data was different than expected ({})".format(
+                full_err()
+            )
 
-        if isinstance(expected_val, dict):
-            akeys = set(actual_val.keys())
-            ekeys = set(expected_val.keys())
+        raise exceptions.KeyMismatchError(msg)
 
-            if akeys != ekeys:
-                extra_actual_keys = akeys - ekeys
-                extra_expected_keys = ekeys - akeys
+    if isinstance(expected_val, dict):
+        akeys = set(actual_val.keys())
+        ekeys = set(expected_val.keys())
 
+        if akeys != ekeys:
+            extra_actual_keys = akeys - ekeys
+            extra_expected_keys = ekeys - akeys
+
+            # If there are more keys in 'expected' compared to 'actual',
+            # this is still a hard error and we shouldn't continue
+            if extra_expected_keys or strict:
                 msg = ""
                 if extra_actual_keys:
                     msg += " - Extra keys in response: {}".format(extra_actual_keys)
@@ -438,112 +865,69 @@ def check_keys_match_recursive(expected_val, actual_val, keys, strict=True):
                         extra_expected_keys
                     )
 
-                full_msg = "Structure of returned data was different than expected {} ({})".format(
-                    msg, full_err()
+                raise exceptions.KeyMismatchError(
+                    "Structure of returned data was different than expected {} ({})".format(
+                        msg, full_err()
+                    )
                 )
 
-                # If there are more keys in 'expected' compared to 'actual',
-                # this is still a hard error and we shouldn't continue
-                if extra_expected_keys or strict:
-                    raise exceptions.KeyMismatchError(full_msg) from e
-                else:
-                    logger.debug(
-                        "Mismatch in returned data, continuing due to strict=%s: %s",
-                        strict,
-                        full_msg,
-                        exc_info=True,
-                    )
+            logger.debug(
+                "Skipping comparing extra keys %s at %s due to strict=%s",
+                extra_actual_keys,
+                path,
+                strict,
+            )
+
+        # If strict is True, an error will be raised above. If not, every
+        # expected key is in the response and any extra ones are ignored
+        for key in akeys:
+            if key in expected_val:
+                _check_keys_match(
+                    expected_val[key], actual_val[key], path.child(key), strict
+                )
+    elif isinstance(expected_val, list):
+        if not strict:
+            missing = []
 
-            # If strict is True, an error will be raised above. If not, recurse
-            # through both sets of keys and just ignore missing ones
-            to_recurse = akeys | ekeys
+            index = _ListIndex(actual_val)
+            position = 0
 
-            for key in to_recurse:
-                try:
-                    check_keys_match_recursive(
-                        expected_val[key], actual_val[key], keys + [key], strict
-                    )
-                except KeyError:
-                    logger.debug(
-                        "Skipping comparing missing key '%s' due to strict=%s",
-                        key,
-                        strict,
-                    )
-        elif isinstance(expected_val, list):
-            if not strict:
-                missing = []
-
-                actual_iter = iter(actual_val)
-
-                # Iterate over list items to see if any of them match _IN ORDER_
-                for i, e_val in enumerate(expected_val):
-                    while 1:
-                        try:
-                            current_response_val = next(actual_iter)
-                        except StopIteration:
-                            # Still iterating checking for a value, but ran out of response values
-                            logger.debug("Ran out of list response items to check")
-                            missing.append(e_val)
-                            break
-                        else:
-                            logger.debug(
-                                "Got '%s' from response to check against '%s' from expected",
-                                current_response_val,
-                                e_val,
-                            )
-
-                        # Found one - check if it matches
-                        try:
-                            check_keys_match_recursive(
-                                e_val, current_response_val, keys + [i], strict
-                            )
-                        except exceptions.KeyMismatchError:
-                            # Doesn't match what we're looking for
-                            logger.debug(
-                                "%s did not match next response value %s",
-                                e_val,
-                                current_response_val,
-                            )
-                        else:
-                            logger.debug("'%s' present in response", e_val)
-                            break
-
-                if missing:
-                    msg = "List item(s) not present in response: {}".format(missing)
-                    raise exceptions.KeyMismatchError(msg) from e
-
-                logger.debug("All expected list items present")
-            else:
-                if len(expected_val) != len(actual_val):
-                    raise exceptions.KeyMismatchError(
-                        "Length of returned list was different than expected - expected {} items from got {} ({}".format(
-                            len(expected_val), len(actual_val), full_err()
-                        )
-                    ) from e
-
-                for i, (e_val, a_val) in enumerate(zip(expected_val, actual_val)):
-                    try:
-                        check_keys_match_recursive(e_val, a_val, keys + [i], strict)
-                    except exceptions.KeyMismatchError as sub_e:
-                        # This should _ALWAYS_ raise an error, but it will be more
-                        # obvious where the error came from (in python 3 at least)
-                        # and will take ANYTHING into account
-                        raise sub_e from e
-        elif expected_val is ANYTHING:
-            logger.debug("Actual value = '%s' - matches !anything", actual_val)
-        elif isinstance(expected_val, TypeSentinel) and expected_matches:
-            if isinstance(expected_val, RegexSentinel):
-                if not expected_val.passes(actual_val):
-                    raise exceptions.KeyMismatchError(
-                        "Regex mismatch: ({})".format(full_err())
-                    ) from e
+            # Find each expected item in the response _IN ORDER_
+            for i, e_val in enumerate(expected_val):
+                found = index.find(e_val, position, strict)
 
-            logger.debug(
-                "Actual value = '%s' - matches !any%s",
-                actual_val,
-                expected_val.constructor,
-            )
+                if found is None:
+                    # Nothing after this can match either
+                    logger.debug("Ran out of list response items to check")
+                    missing = expected_val[i:]
+                    break
+
+                position = found + 1
+
+            if missing:
+                msg = "List item(s) not present in response: {}".format(missing)
+                raise exceptions.KeyMismatchError(msg)
+
+            logger.debug("All expected list items present at %s", path)
         else:
-            raise exceptions.KeyMismatchError(
-                "Key mismatch: ({})".format(full_err())
-            ) from e
+            if len(expected_val) != len(actual_val):
+                raise exceptions.KeyMismatchError(
+                    "Length of returned list was different than expected - expected {} items from got {} ({}".format(
+                        len(expected_val), len(actual_val), full_err()
+                    )
+                )
+
+            for i, (e_val, a_val) in enumerate(zip(expected_val, actual_val)):
+                _check_keys_match(e_val, a_val, path.child(i), strict)
+    elif isinstance(expected_val, TypeSentinel):
+        if isinstance(expected_val, RegexSentinel):
+            if not expected_val.passes(actual_val):
+                raise exceptions.KeyMismatchError(
+                    "Regex mismatch: ({})".format(full_err())
+                )
+
+        logger.debug(
+            "Value at %s matches !any%s", path, expected_val.constructor,
+        )
+    else:
+        raise exceptions.KeyMismatchError("Key mismatch: ({})".format(full_err()))
@@ -73,6 +73,10 @@ class MQTTTLSError(TavernException):
     """Error with TLS arguments to MQTT client"""
 
 
+class MQTTBufferOverflowError(MQTTError):
+    """Messages were dropped because the buffer for a subscription was full"""
+
+
 class PluginLoadError(TavernException):
     """Error loading a plugin"""
 
@@ -1,12 +1,134 @@
+import functools
 import logging
 
 import jmespath
 
 from tavern.util import exceptions
-from tavern.util.dict_util import check_keys_match_recursive
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of compiled queries to keep
+QUERY_CACHE_SIZE = 1024
+
+
+@functools.lru_cache(maxsize=QUERY_CACHE_SIZE)
+def compile_query(query):
+    """Compile a JMES query, reusing the result if it has been compiled recently
+
+    Args:
+        query (str): JMES query
+
+    Returns:
+        jmespath.parser.ParsedResult: compiled query
+
+    Raises:
+        jmespath.exceptions.ParseError: query was invalid
+    """
+    return jmespath.compile(query)
+
+
+def search(query, data):
+    """Same as jmespath.search, but uses a compiled version of the query
+
+    Args:
+        query (str): JMES query
+        data (dict, list): data to search in
+
+    Returns:
+        object: Whatever was found by the search
+    """
+    return compile_query(query).search(data)
+
+
+# Functions which can be used in verify_response_with that take JMES queries,
+# and how to get the queries out of the extra_kwargs
+_EXT_FUNCTION_QUERIES = {
+    "tavern.testutils.helpers:validate_content": lambda kwargs: [
+        c.get("jmespath") for c in kwargs.get("comparisons", []) if isinstance(c, dict)
+    ],
+    "tavern.util.jmespath_util:check_jmespath_match": lambda kwargs: [
+        kwargs.get("query")
+    ],
+}
+
+
+def _response_queries(response_block):
+    """Get all the JMES queries used in one response block
+
+    Args:
+        response_block (dict): expected response
+
+    Yields:
+        str: query
+    """
+    save = response_block.get("save")
+    if isinstance(save, dict):
+        for key, block in save.items():
+            if key != "$ext" and isinstance(block, dict):
+                yield from block.values()
+
+    stream = response_block.get("stream")
+    if isinstance(stream, dict) and isinstance(stream.get("save"), dict):
+        for block in stream["save"].values():
+            if isinstance(block, dict):
+                yield block.get("query")
+
+    verify_with = response_block.get("verify_response_with") or []
+    if isinstance(verify_with, dict):
+        verify_with = [verify_with]
+
+    for ext in verify_with:
+        try:
+            get_queries = _EXT_FUNCTION_QUERIES[ext["function"]]
+        except (KeyError, TypeError):
+            # Some other function, or invalid - will be caught by schema
+            # validation
+            continue
+
+        yield from get_queries(ext.get("extra_kwargs") or {})
+
+
+def precompile_queries(test_spec):
+    """Compile every JMES query in the save and verify_response_with blocks of
+    a test, so invalid queries are caught before the test starts instead of
+    halfway through running it
+
+    Queries which will be formatted with variables are skipped, as they can't
+    be compiled until the test is run.
+
+    Args:
+        test_spec (dict): test to check
+
+    Raises:
+        BadSchemaError: a query was invalid
+    """
+    for stage in test_spec.get("stages", []) + test_spec.get("finally", []):
+        if not isinstance(stage, dict):
+            # Will be caught by schema validation
+            continue
+
+        for key in ["response", "mqtt_response"]:
+            response_blocks = stage.get(key) or []
+            if isinstance(response_blocks, dict):
+                response_blocks = [response_blocks]
+
+            for response_block in response_blocks:
+                if not isinstance(response_block, dict):
+                    continue
+
+                for query in _response_queries(response_block):
+                    if not isinstance(query, str) or "{" in query:
+                        continue
+
+                    try:
+                        compile_query(query)
+                    except jmespath.exceptions.ParseError as e:
+                        raise exceptions.BadSchemaError(
+                            "Invalid JMES query '{}' in stage '{}'".format(
+                                query, stage.get("name")
+                            )
+                        ) from e
+
 
 def check_jmespath_match(parsed_response, query, expected=None):
     """
@@ -18,7 +140,10 @@ def check_jmespath_match(parsed_response, query, expected=None):
         expected (str, optional): Possible value to match against. If None,
             'query' will just check that _something_ is present
     """
-    actual = jmespath.search(query, parsed_response)
+    # pylint: disable=import-outside-toplevel
+    from tavern.util.dict_util import check_keys_match_recursive
+
+    actual = search(query, parsed_response)
 
     msg = "JMES path '{}' not found in response".format(query)
 
@@ -1,6 +1,9 @@
 # https://gist.github.com/joshbode/569627ced3076931b02f
 from abc import abstractmethod
+import contextlib
+import copy
 from distutils.util import strtobool
+import hashlib
 import logging
 import os.path
 import re
@@ -15,14 +18,67 @@ from yaml.reader import Reader
 from yaml.resolver import Resolver
 from yaml.scanner import Scanner
 
+try:
+    from yaml.cyaml import CParser
+except ImportError:
+    # pyyaml was built without libyaml
+    CParser = None
+
+from tavern import __version__
 from tavern.util import exceptions
+from tavern.util.compiled_cache import read_pickle, write_pickle
 from tavern.util.exceptions import BadSchemaError
 
 logger = logging.getLogger(__name__)
 
 
+class _LoadedFiles(object):
+    """Files which were pulled in while loading some YAML
+
+    Attributes:
+        files (set): absolute paths of every file loaded via !include
+        volatile (bool): whether anything was loaded which will be different
+            every time it is loaded (eg, !uuid)
+    """
+
+    def __init__(self):
+        self.files = set()
+        self.volatile = False
+
+
+# Currently active trackers - see track_loaded_files
+_trackers = []
+
+
+@contextlib.contextmanager
+def track_loaded_files():
+    """Record which files are included while loading YAML inside this context
+
+    Yields:
+        _LoadedFiles: record of included files
+    """
+    loaded = _LoadedFiles()
+    _trackers.append(loaded)
+
+    try:
+        yield loaded
+    finally:
+        _trackers.remove(loaded)
+
+
+def _record_loaded_file(filename):
+    for tracker in _trackers:
+        tracker.files.add(os.path.abspath(filename))
+
+
+def _record_volatile():
+    for tracker in _trackers:
+        tracker.volatile = True
+
+
 def makeuuid(loader, node):
     # pylint: disable=unused-argument
+    _record_volatile()
     return str(uuid.uuid4())
 
 
@@ -58,6 +114,8 @@ def create_node_class(cls):
         #     return cls.__new__(self, x)
 
     node_class.__name__ = "%s_node" % cls.__name__
+    # So that they can be pickled
+    node_class.__qualname__ = node_class.__name__
     return node_class
 
 
@@ -122,6 +180,115 @@ class IncludeLoader(
         SourceMappingConstructor.__init__(self)
 
 
+def _stat_signature(filename):
+    stat = os.stat(filename)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class _IncludeCache(object):
+    """Caches files loaded via !include for the lifetime of the process
+
+    The same file tends to be included in a lot of tests, so this avoids
+    opening and parsing it every time. A cached file is loaded again if it or
+    anything it includes has changed (based on modification time and size).
+
+    Optionally, loaded files can also be shared between processes (eg,
+    pytest-xdist workers) via a directory on disk - see set_shared_dir.
+    """
+
+    def __init__(self):
+        self._loaded = {}
+        self._shared_dir = None
+
+    def set_shared_dir(self, shared_dir):
+        """Set where to store loaded files to share them between processes
+
+        Args:
+            shared_dir (str): directory to use, or None to not share
+        """
+        self._shared_dir = str(shared_dir) if shared_dir is not None else None
+
+    def clear(self):
+        """Forget all files loaded in this process"""
+        self._loaded.clear()
+
+    def _shared_path(self, filename):
+        name = hashlib.sha256(filename.encode("utf8")).hexdigest()
+        return os.path.join(self._shared_dir, name + ".pickle")
+
+    @staticmethod
+    def _is_valid(entry):
+        if not isinstance(entry, dict) or entry.get("version") != __version__:
+            return False
+
+        try:
+            return all(
+                _stat_signature(f) == signature
+                for f, signature in entry["signatures"].items()
+            )
+        except OSError:
+            return False
+
+    def _load_fresh(self, filename):
+        signature = _stat_signature(filename)
+
+        with track_loaded_files() as loaded:
+            contents = load_single_document_yaml(filename)
+
+        if loaded.volatile:
+            logger.debug("Not caching %s - has values generated at load time", filename)
+            return None, contents
+
+        signatures = {f: _stat_signature(f) for f in loaded.files}
+        signatures[filename] = signature
+
+        entry = {"version": __version__, "signatures": signatures, "contents": contents}
+
+        if self._shared_dir is not None:
+            write_pickle(self._shared_path(filename), entry)
+
+        return entry, contents
+
+    def load(self, filename):
+        """Load a file, using a cached copy if possible
+
+        Args:
+            filename (str): absolute path to file
+
+        Returns:
+            object: contents of file. This is a copy which can be safely
+                modified by the caller.
+        """
+        entry = self._loaded.get(filename)
+
+        if not self._is_valid(entry):
+            entry = None
+
+            if self._shared_dir is not None:
+                entry = read_pickle(self._shared_path(filename))
+                if not self._is_valid(entry):
+                    entry = None
+
+            if entry is None:
+                entry, contents = self._load_fresh(filename)
+                if entry is None:
+                    return contents
+
+            self._loaded[filename] = entry
+        else:
+            logger.debug("Using cached copy of %s", filename)
+
+        # Anything tracking loaded files needs to know about the file and
+        # everything it included, even if it wasn't actually loaded again
+        for included in entry["signatures"]:
+            _record_loaded_file(included)
+
+        return copy.deepcopy(entry["contents"])
+
+
+include_cache = _IncludeCache()
+
+
 def construct_include(loader, node):
     """Include file referenced at node."""
 
@@ -138,13 +305,72 @@ def construct_include(loader, node):
             )
         )
 
-    return load_single_document_yaml(filename)
+    return include_cache.load(filename)
 
 
 IncludeLoader.add_constructor("!include", construct_include)
 IncludeLoader.add_constructor("!uuid", makeuuid)
 
 
+if CParser is not None:
+
+    class _CRememberComposer(RememberComposer):
+        """Composer which works on events from the libyaml parser
+
+        The libyaml parser doesn't have an equivalent of process_empty_scalar to
+        patch, so empty values are checked for here instead. They come through
+        as zero-width plain scalars with no tag or anchor, which is exactly what
+        the pure python parser creates in process_empty_scalar.
+        """
+
+        def compose_scalar_node(self, anchor):
+            event = self.peek_event()
+
+            if (
+                event.value == ""
+                and event.style == ""
+                and event.tag is None
+                and anchor is None
+                and event.start_mark.index == event.end_mark.index
+            ):
+                error_on_empty_scalar(self, event.start_mark)
+
+            return RememberComposer.compose_scalar_node(self, anchor)
+
+    # pylint: disable=too-many-ancestors
+    class CIncludeLoader(
+        _CRememberComposer, CParser, Resolver, SourceMappingConstructor, SafeConstructor
+    ):
+        """Same as IncludeLoader, but parses using libyaml
+
+        Only the parsing is done in C - nodes are still composed in python
+        (which is what lets anchors be kept between documents) and constructed
+        with the same constructors as IncludeLoader.
+        """
+
+        def __init__(self, stream):
+            """Initialise Loader."""
+
+            try:
+                self._root = os.path.split(stream.name)[0]
+            except AttributeError:
+                self._root = os.path.curdir
+
+            CParser.__init__(self, stream)
+            _CRememberComposer.__init__(self)
+            SafeConstructor.__init__(self)
+            Resolver.__init__(self)
+            SourceMappingConstructor.__init__(self)
+
+    # Share the same dicts so that anything registered on IncludeLoader
+    # (including the tags below and any added by plugins) works with both
+    CIncludeLoader.yaml_constructors = IncludeLoader.yaml_constructors
+
+    DefaultIncludeLoader = CIncludeLoader
+else:
+    DefaultIncludeLoader = IncludeLoader
+
+
 class TypeSentinel(yaml.YAMLObject):
     """This is a sentinel for expecting a type in a response. Any value
     associated with these is going to be ignored - these are only used as a
@@ -266,6 +492,10 @@ class AnythingSentinel(TypeSentinel):
         """
         return ANYTHING
 
+    def __reduce__(self):
+        """Unpickle to ANYTHING for the same reason as above"""
+        return "ANYTHING"
+
 
 # One instance of this (see above)
 ANYTHING = AnythingSentinel()
@@ -404,9 +634,11 @@ def load_single_document_yaml(filename):
         UnexpectedDocumentsError: If more than one document was in the file
     """
 
+    _record_loaded_file(filename)
+
     with open(filename, "r", encoding="utf-8") as fileobj:
         try:
-            contents = yaml.load(fileobj, Loader=IncludeLoader)
+            contents = yaml.load(fileobj, Loader=DefaultIncludeLoader)
         except yaml.composer.ComposerError as e:
             msg = "Expected only one document in this file but found multiple"
             raise exceptions.UnexpectedDocumentsError(msg) from e
@@ -0,0 +1,99 @@
+"""Helpers for logging request and response data without slowing down tests
+
+Logging calls which pass values as arguments (``logger.debug("%s", value)``)
+only turn those values into strings if the message is actually going to be
+written somewhere. These helpers keep it that way for values which are
+expensive to build or very large:
+
+- ``lazy`` wraps a function which builds the string, so it is only called if
+  the message is logged
+- ``Truncated`` wraps a value so that when it is logged, only the start of it
+  is written
+
+Logged values are cut down to ``max_length`` characters, which can be changed
+with ``--tavern-log-max-length``. Setting it to 0 logs values in full.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_LENGTH = 1000
+
+_max_length = DEFAULT_MAX_LENGTH
+
+
+def set_max_length(length):
+    """Set how much of each value is logged
+
+    Args:
+        length (int): maximum number of characters to log for each value, or 0
+            to log values in full
+    """
+    global _max_length  # pylint: disable=global-statement
+    _max_length = length
+
+
+def get_max_length():
+    return _max_length
+
+
+def truncate(text, max_length=None):
+    """Cut a string down to the maximum log length
+
+    Args:
+        text (str): string to truncate
+        max_length (int, optional): maximum length. Defaults to the globally
+            configured maximum.
+
+    Returns:
+        str: text, with anything past the maximum length replaced with a note
+            of how much was left out
+    """
+    if max_length is None:
+        max_length = _max_length
+
+    if not max_length or len(text) <= max_length:
+        return text
+
+    return "{}...<{} more characters>".format(text[:max_length], len(text) - max_length)
+
+
+class Truncated(object):
+    """Value which is truncated when it is logged
+
+    Args:
+        value (object): value to log
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return truncate(str(self.value))
+
+    def __repr__(self):
+        return truncate(repr(self.value))
+
+
+class lazy(object):
+    """String which is only built if it is logged
+
+    Args:
+        func (callable): function which returns the string to log
+        args (list): arguments for func
+    """
+
+    # pylint: disable=invalid-name,too-few-public-methods
+
+    __slots__ = ("_func", "_args")
+
+    def __init__(self, func, *args):
+        self._func = func
+        self._args = args
+
+    def __str__(self):
+        return truncate(str(self._func(*self._args)))
+
+    __repr__ = __str__
@@ -0,0 +1,245 @@
+"""Polling a stage until the response matches
+
+Retrying a stage with max_retries runs the whole stage again, formatting the
+request and expected response each time. If a stage has a 'poll' block instead,
+the request and expected response are only created once, and the request is
+sent again until the response matches or the timeout is reached:
+
+- timeout: how long to keep polling for, in seconds
+- interval: how long to wait after the first request
+- multiplier: how much longer to wait after each request than the one before
+- max_interval: longest time to wait between requests
+- retry_after: if the response has a Retry-After header, wait for that long
+  instead
+
+Values are only saved from the response which matched.
+"""
+from datetime import datetime, timezone
+from distutils.util import strtobool
+from email.utils import parsedate_to_datetime
+import logging
+import time
+
+from . import exceptions
+from .delay import sleep
+from .dict_util import format_keys
+from .retry import format_seconds
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 1.0
+DEFAULT_MULTIPLIER = 1.5
+
+
+def _get_retry_after(response):
+    """Get how long a response said to wait before making another request
+
+    Args:
+        response: response to the request. Only HTTP responses have headers, for
+            anything else this always returns None.
+
+    Returns:
+        float: number of seconds, or None if there was no valid Retry-After header
+    """
+    try:
+        value = response.headers["Retry-After"]
+    except (AttributeError, KeyError, TypeError):
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        logger.warning("Invalid Retry-After header '%s'", value)
+        return None
+
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class Poll(object):
+    """Sends the request for a stage until the response matches
+
+    Args:
+        timeout (float): how long to keep polling for, in seconds
+        interval (float): time to wait after the first request
+        multiplier (float): how much longer to wait after each request than
+            the one before it
+        maximum (float, optional): longest time to wait between requests
+        retry_after (bool): whether to use the Retry-After header in responses
+    """
+
+    # pylint: disable=too-many-arguments
+
+    def __init__(
+        self,
+        timeout,
+        interval=DEFAULT_INTERVAL,
+        multiplier=DEFAULT_MULTIPLIER,
+        maximum=None,
+        retry_after=True,
+    ):
+        self.timeout = timeout
+        self.interval = interval
+        self.multiplier = multiplier
+        self.maximum = maximum
+        self.retry_after = retry_after
+
+    def get_wait(self, attempt, response=None):
+        """Get how long to wait before sending the request again
+
+        Args:
+            attempt (int): number of requests which have been made, minus 1
+            response: the last response, if there was one
+
+        Returns:
+            float: time to wait, in seconds
+        """
+        if self.retry_after:
+            retry_after = _get_retry_after(response)
+            if retry_after is not None:
+                return retry_after
+
+        wait = self.interval * self.multiplier ** min(attempt, 64)
+
+        if self.maximum is not None:
+            wait = min(wait, self.maximum)
+
+        return wait
+
+    def run(self, name, request, verifiers, timings):
+        """Send the request and verify the response until it matches
+
+        Args:
+            name (str): stage name
+            request (BaseRequest): request to send
+            verifiers (list): BaseResponse objects to verify each response with
+            timings (StageTimings): timings for the stage, which will have the
+                number of polls and the time to convergence recorded on it
+
+        Returns:
+            dict: values saved from the response which matched
+
+        Raises:
+            TavernException: the response still did not match at the end of the
+                timeout. This is the error from verifying the last response.
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+
+        polls = 0
+
+        while True:
+            polls += 1
+            timings.polls = polls
+
+            response = None
+
+            try:
+                with timings.phase("send"):
+                    response = request.run()
+
+                with timings.phase("verify"):
+                    saved = {}
+                    for v in verifiers:
+                        v.reset()
+                        saved.update(v.verify(response))
+            except exceptions.BadSchemaError:
+                raise
+            except exceptions.TavernException:
+                remaining = deadline - time.monotonic()
+
+                if remaining <= 0:
+                    logger.error(
+                        "Stage '%s' did not match within %s seconds (%i polls)",
+                        name,
+                        self.timeout,
+                        polls,
+                    )
+                    raise
+
+                wait = min(self.get_wait(polls - 1, response), remaining)
+
+                logger.info(
+                    "Stage '%s' did not match after %i polls. Polling again in %.2f seconds.",
+                    name,
+                    polls,
+                    wait,
+                )
+
+                with timings.phase("delay"):
+                    sleep(wait)
+            else:
+                timings.converged = time.monotonic() - start
+
+                logger.info(
+                    "Stage '%s' matched after %i polls (%.2f seconds)",
+                    name,
+                    polls,
+                    timings.converged,
+                )
+
+                return saved
+
+    def __repr__(self):
+        return "Poll(timeout={}, interval={}, multiplier={}, maximum={}, retry_after={})".format(
+            self.timeout, self.interval, self.multiplier, self.maximum, self.retry_after
+        )
+
+
+def get_poll(stage, test_block_config):
+    """Get polling settings from the poll block in a stage
+
+    Args:
+        stage (dict): test stage
+        test_block_config (dict): Configuration for current test
+
+    Returns:
+        Poll: poll settings, or None if the stage should not be polled
+
+    Raises:
+        BadSchemaError: poll was used with max_retries or retry_until
+        InvalidRetryException: invalid poll block
+    """
+    spec = stage.get("poll")
+    if spec is None:
+        return None
+
+    for key in ["max_retries", "retry_until", "retry_backoff"]:
+        if key in stage:
+            raise exceptions.BadSchemaError(
+                "Can't use '{}' with 'poll' in the same stage".format(key)
+            )
+
+    def get(key, default):
+        if key not in spec:
+            return default
+
+        return format_seconds(spec[key], "poll.{}".format(key), test_block_config)
+
+    retry_after = format_keys(
+        spec.get("retry_after", True), test_block_config["variables"]
+    )
+    if isinstance(retry_after, str):
+        retry_after = strtobool(retry_after)
+
+    poll = Poll(
+        get("timeout", None),
+        interval=get("interval", DEFAULT_INTERVAL),
+        multiplier=get("multiplier", DEFAULT_MULTIPLIER),
+        maximum=get("max_interval", None),
+        retry_after=bool(retry_after),
+    )
+
+    if poll.timeout is None:
+        raise exceptions.InvalidRetryException("poll.timeout must be given")
+
+    logger.debug("Polling for stage '%s': %s", stage["name"], poll)
+
+    return poll
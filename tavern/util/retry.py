@@ -1,16 +1,72 @@
 from functools import wraps
 import logging
+import random
+import time
 
 from . import exceptions
-from .delay import delay
+from .delay import get_delay, sleep
 from .dict_util import format_keys
 
 logger = logging.getLogger(__name__)
 
+# Default time to wait before the first retry when using retry_backoff
+DEFAULT_INITIAL_BACKOFF = 1.0
+
+
+class Backoff(object):
+    """Exponential backoff between retries
+
+    Args:
+        initial (float): time to wait before the first retry
+        multiplier (float): how much longer to wait before each retry than the
+            one before it
+        maximum (float, optional): longest time to wait between retries
+        jitter (float): fraction of each wait which is randomised, between 0
+            (no jitter) and 1 ('full' jitter)
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, initial, multiplier=2.0, maximum=None, jitter=0.0):
+        self.initial = initial
+        self.multiplier = multiplier
+        self.maximum = maximum
+        self.jitter = jitter
+
+    def get_wait(self, attempt):
+        """Get how long to wait after an attempt failed
+
+        Args:
+            attempt (int): number of attempts which have failed so far, minus 1
+
+        Returns:
+            float: time to wait, in seconds
+        """
+        # Limit the exponent so it can't overflow when retrying until a timeout
+        wait = self.initial * self.multiplier ** min(attempt, 64)
+
+        if self.maximum is not None:
+            wait = min(wait, self.maximum)
+
+        if self.jitter:
+            wait -= wait * self.jitter * random.random()
+
+        return wait
+
+    def __repr__(self):
+        return "Backoff(initial={}, multiplier={}, maximum={}, jitter={})".format(
+            self.initial, self.multiplier, self.maximum, self.jitter
+        )
+
 
 def retry(stage, test_block_config):
     """Look for retry and try to repeat the stage `retry` times.
 
+    Between attempts, this waits for delay_after, or for an exponentially
+    increasing time if retry_backoff is given. If retry_until is given, the
+    stage is retried until that many seconds have passed since the first
+    attempt (up to max_retries times, if that is also given).
+
     Args:
         test_block_config (dict): Configuration for current test
         stage (dict): test stage
@@ -21,9 +77,11 @@ def retry(stage, test_block_config):
             stage.get("max_retries"), test_block_config
         )
     else:
-        max_retries = 0
+        max_retries = None
 
-    if max_retries == 0:
+    retry_until = maybe_format_retry_until(stage.get("retry_until"), test_block_config)
+
+    if not max_retries and retry_until is None:
 
         def catch_wrapper(fn):
             @wraps(fn)
@@ -36,40 +94,68 @@ def retry(stage, test_block_config):
 
         return catch_wrapper
     else:
+        backoff = get_backoff(stage, test_block_config)
+
+        def get_wait(attempt):
+            if backoff is not None:
+                return backoff.get_wait(attempt)
+
+            return get_delay(stage, "after", test_block_config["variables"]) or 0
 
         def retry_wrapper(fn):
             @wraps(fn)
             def wrapped(*args, **kwargs):
+                # pylint: disable=too-many-branches
+                deadline = None
+                if retry_until is not None:
+                    deadline = time.monotonic() + retry_until
+
                 i = 0
                 res = None
-                for i in range(max_retries + 1):
+                while True:
                     try:
                         res = fn(*args, **kwargs)
                     except exceptions.BadSchemaError:
                         raise
                     except exceptions.TavernException as e:
-                        if i < max_retries:
+                        wait = get_wait(i)
+
+                        if deadline is not None:
+                            # Don't wait past the deadline, but do make one
+                            # last attempt when it is reached
+                            remaining = deadline - time.monotonic()
+                            wait = min(wait, remaining)
+
+                        if (max_retries is None or i < max_retries) and (
+                            deadline is None or remaining > 0
+                        ):
                             logger.info(
-                                "Stage '%s' failed for %i time. Retrying.",
+                                "Stage '%s' failed for %i time. Retrying in %.2f seconds.",
                                 stage["name"],
                                 i + 1,
+                                wait,
+                            )
+                            sleep(wait)
+                            i += 1
+                            continue
+
+                        if deadline is not None and remaining <= 0:
+                            message = "stage did not succeed within {} seconds ({} retries)".format(
+                                retry_until, i
                             )
-                            delay(stage, "after", test_block_config["variables"])
                         else:
-                            logger.error(
-                                "Stage '%s' did not succeed in %i retries.",
-                                stage["name"],
-                                max_retries,
+                            message = "stage did not succeed in {} retries".format(
+                                max_retries
                             )
 
-                            if isinstance(e, exceptions.TestFailError):
-                                raise
-                            else:
-                                raise exceptions.TestFailError(
-                                    "Test '{}' failed: stage did not succeed in {} retries.".format(
-                                        stage["name"], max_retries
-                                    )
-                                ) from e
+                        logger.error("Stage '%s' failed: %s.", stage["name"], message)
+
+                        if isinstance(e, exceptions.TestFailError):
+                            raise
+                        else:
+                            raise exceptions.TestFailError(
+                                "Test '{}' failed: {}.".format(stage["name"], message)
+                            ) from e
                     else:
                         break
 
@@ -98,3 +184,96 @@ def maybe_format_max_retries(max_retries, test_block_config):
         raise exceptions.InvalidRetryException("max_retries must be greater than 0")
 
     return max_retries
+
+
+def format_seconds(value, name, test_block_config):
+    """Format a number of seconds (or other number) in a retry or poll spec and
+    check that it is valid
+
+    Args:
+        value (float, str): value from the stage, possibly a format variable
+        name (str): name of the key the value came from, for error messages
+        test_block_config (dict): Configuration for current test
+
+    Returns:
+        float: formatted value
+
+    Raises:
+        InvalidRetryException: value was not a non-negative number
+    """
+    value = format_keys(value, test_block_config["variables"])
+
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise exceptions.InvalidRetryException(
+            "Invalid type for {} - was {}".format(name, type(value))
+        )
+
+    if value < 0:
+        raise exceptions.InvalidRetryException("{} must not be negative".format(name))
+
+    return float(value)
+
+
+def maybe_format_retry_until(retry_until, test_block_config):
+    """Get how long to keep retrying a stage for
+
+    Args:
+        retry_until (float, str): retry_until from the stage, possibly a format
+            variable
+        test_block_config (dict): Configuration for current test
+
+    Returns:
+        float: number of seconds, or None if not given
+    """
+    if retry_until is None:
+        return None
+
+    return format_seconds(retry_until, "retry_until", test_block_config)
+
+
+def get_backoff(stage, test_block_config):
+    """Get backoff settings from retry_backoff in a stage
+
+    Args:
+        stage (dict): test stage
+        test_block_config (dict): Configuration for current test
+
+    Returns:
+        Backoff: backoff settings, or None if retry_backoff was not given
+
+    Raises:
+        InvalidRetryException: invalid retry_backoff
+    """
+    spec = stage.get("retry_backoff")
+    if spec is None:
+        return None
+
+    def get(key, default):
+        if key not in spec:
+            return default
+
+        return format_seconds(
+            spec[key], "retry_backoff.{}".format(key), test_block_config
+        )
+
+    initial = get("initial", None)
+    if initial is None:
+        initial = get_delay(stage, "after", test_block_config["variables"])
+        if initial is None:
+            initial = DEFAULT_INITIAL_BACKOFF
+
+    backoff = Backoff(
+        initial,
+        multiplier=get("multiplier", 2.0),
+        maximum=get("max", None),
+        jitter=get("jitter", 0.0),
+    )
+
+    if backoff.jitter > 1:
+        raise exceptions.InvalidRetryException(
+            "retry_backoff.jitter must be between 0 and 1"
+        )
+
+    logger.debug("Backoff for stage '%s': %s", stage["name"], backoff)
+
+    return backoff
@@ -0,0 +1,69 @@
+"""Configuration and variables for each test, layered on top of the global config
+
+The global configuration (variables and stages from --tavern-global-cfg, and
+settings from the command line) is loaded once and shared by every test.
+Rather than deep copying all of it for every test, each test gets:
+
+- a shallow copy of the global config, so that settings can be overridden for
+  the test without changing anything for other tests
+- a new layer of variables on top of the global variables. Variables from
+  included files, fixtures and values saved from responses are written to this
+  layer, while lookups fall through to the global variables below it.
+- a copy of the top level of each stage and of each block in it, which is what
+  the requests and responses change when they are run
+
+Nothing in the global config is ever changed by a test, so the global layer is
+never copied.
+"""
+import collections
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class VariableScope(collections.ChainMap):
+    """Variables available to a test
+
+    Writes (including saving values from responses) only ever change the
+    innermost layer. Lookups go through each layer from the innermost one
+    outwards, so values in inner layers hide any with the same name in the
+    layers below them.
+    """
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, dict(self))
+
+
+def new_test_config(global_cfg):
+    """Get the config for one test
+
+    Args:
+        global_cfg (dict): global configuration, which is not changed
+
+    Returns:
+        dict: configuration for the test, with a new layer of variables on top
+            of the global variables
+    """
+    test_block_config = dict(global_cfg)
+    test_block_config["variables"] = VariableScope({}, global_cfg.get("variables", {}))
+
+    return test_block_config
+
+
+def copy_stage(stage):
+    """Copy a stage so that running it doesn't change the original
+
+    Only the top level of the stage and of each block in it (request, response,
+    etc.) are copied - anything below that is formatted into new objects before
+    it is used.
+
+    Args:
+        stage (dict): stage specification
+
+    Returns:
+        dict: copy of the stage
+    """
+    return {
+        key: dict(value) if isinstance(value, dict) else value
+        for key, value in stage.items()
+    }
@@ -0,0 +1,249 @@
+"""Record how long each part of running a test takes
+
+Each stage records the time spent in these phases:
+
+- format: formatting the request and expected response
+- send: preparing the request and handing it to the connection
+- first_byte: waiting for the response headers after sending the request
+- download: reading the response body
+- verify: checking the response against what was expected
+- save: saving values from the response
+- delay: delay_before and delay_after, and waiting between polls
+
+Sending a large request body can also be recorded as 'upload', along with how
+much was sent, so the upload throughput can be seen for each stage.
+
+If a stage polls until the response matches, the number of requests made and
+how long it took for the response to match are recorded as well.
+
+Not every backend can tell the difference between sending the request, waiting
+for the response and downloading the body - if it can't, all of the time spent
+making the request is recorded as 'send'.
+
+Schema verification is done once per test rather than per stage, so it is
+recorded on the test instead of on each stage.
+"""
+import contextlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Timings(object):
+    """Time spent in each phase of running something
+
+    Phases can be nested, in which case time spent in the inner phase is not
+    counted towards the outer phase as well.
+
+    Attributes:
+        phases (dict): mapping of phase name to time spent in it, in seconds
+        transferred (dict): mapping of phase name to bytes sent or received in
+            it, for phases which transfer data
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.transferred = {}
+
+        # Time spent in nested phases, for each phase currently being timed
+        self._nested = []
+
+    def _record(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add(self, name, seconds):
+        """Record time which was measured elsewhere
+
+        If this is called while timing another phase, the time is subtracted
+        from that phase.
+
+        Args:
+            name (str): phase name
+            seconds (float): time spent
+        """
+        self._record(name, seconds)
+
+        if self._nested:
+            self._nested[-1] += seconds
+
+    def add_transfer(self, name, size, seconds):
+        """Record time spent sending or receiving data, and how much was
+        transferred
+
+        Args:
+            name (str): phase name
+            size (int): number of bytes transferred
+            seconds (float): time spent
+        """
+        self.add(name, seconds)
+        self.transferred[name] = self.transferred.get(name, 0) + size
+
+    def throughput(self, name):
+        """Average speed of a phase which transferred data
+
+        Args:
+            name (str): phase name
+
+        Returns:
+            float: bytes per second, or None if no data was transferred
+        """
+        size = self.transferred.get(name)
+        seconds = self.phases.get(name)
+
+        if size is None or not seconds:
+            return None
+
+        return size / seconds
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Context manager which records the time spent inside it
+
+        Args:
+            name (str): phase name
+        """
+        start = time.perf_counter()
+        self._nested.append(0.0)
+
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._nested.pop()
+
+            self._record(name, elapsed - nested)
+
+            if self._nested:
+                self._nested[-1] += elapsed
+
+    @property
+    def total(self):
+        return sum(self.phases.values())
+
+    def as_dict(self):
+        as_dict = {"total": self.total, "phases": dict(self.phases)}
+
+        if self.transferred:
+            as_dict["transferred"] = {
+                name: {"bytes": size, "bytes_per_second": self.throughput(name)}
+                for name, size in self.transferred.items()
+            }
+
+        return as_dict
+
+
+class StageTimings(Timings):
+    """Timings for one run of a stage
+
+    Args:
+        name (str): stage name
+
+    Attributes:
+        failed (bool): whether this run of the stage failed
+        polls (int): number of requests made, if the stage was polled
+        converged (float): seconds from the first poll until the response
+            matched, or None if it never did
+    """
+
+    def __init__(self, name):
+        super(StageTimings, self).__init__()
+        self.name = name
+        self.failed = False
+
+        self.polls = None
+        self.converged = None
+
+    def as_dict(self):
+        as_dict = super(StageTimings, self).as_dict()
+        as_dict["name"] = self.name
+        as_dict["failed"] = self.failed
+
+        if self.polls is not None:
+            as_dict["polls"] = {"count": self.polls, "converged": self.converged}
+
+        return as_dict
+
+
+class TestTimings(Timings):
+    """Timings for a whole test
+
+    Phases which happen once per test (eg, schema verification) are recorded
+    directly on this, and each run of a stage (including retries) is recorded
+    separately in 'stages'.
+    """
+
+    # Stop pytest trying to collect this
+    __test__ = False
+
+    def __init__(self):
+        super(TestTimings, self).__init__()
+        self.stages = []
+
+    def start_stage(self, name):
+        """Start recording timings for a stage
+
+        Args:
+            name (str): stage name
+
+        Returns:
+            StageTimings: timings for this run of the stage
+        """
+        stage_timings = StageTimings(name)
+        self.stages.append(stage_timings)
+        return stage_timings
+
+    @property
+    def current_stage(self):
+        """Timings for the stage currently being run
+
+        Returns:
+            StageTimings: timings, or None if no stage has been started
+        """
+        return self.stages[-1] if self.stages else None
+
+    @property
+    def total(self):
+        return super(TestTimings, self).total + sum(s.total for s in self.stages)
+
+    def as_dict(self):
+        as_dict = super(TestTimings, self).as_dict()
+        as_dict["stages"] = [s.as_dict() for s in self.stages]
+        return as_dict
+
+
+def get_test_timings(test_block_config):
+    """Get the timings object for the test currently being run
+
+    Args:
+        test_block_config (dict): config for test
+
+    Returns:
+        TestTimings: timings for test. If the test is not being run from Pytest,
+            this will be a new object which is not reported anywhere.
+    """
+    internal = test_block_config.setdefault("tavern_internal", {})
+
+    try:
+        return internal["timings"]
+    except KeyError:
+        timings = internal["timings"] = TestTimings()
+        return timings
+
+
+def get_stage_timings(test_block_config):
+    """Get the timings object for the stage currently being run
+
+    Args:
+        test_block_config (dict): config for test
+
+    Returns:
+        Timings: timings for stage. If no stage is being run, this will be a new
+            object which is not reported anywhere.
+    """
+    stage_timings = get_test_timings(test_block_config).current_stage
+
+    if stage_timings is None:
+        return Timings()
+
+    return stage_timings
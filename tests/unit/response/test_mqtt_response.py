@@ -1,7 +1,9 @@
 from unittest.mock import Mock
 
+import paho.mqtt.client as paho
 import pytest
 
+from tavern._plugins.mqtt.buffer import MessageBuffers
 from tavern._plugins.mqtt.client import MQTTClient
 from tavern._plugins.mqtt.response import MQTTResponse
 from tavern.util import exceptions
@@ -45,7 +47,7 @@ class TestResponse(object):
         def yield_all_messages():
             msg_copy = fake_messages[:]
 
-            def inner(timeout):
+            def inner(timeout, topic=None):
                 try:
                     return msg_copy.pop(0)
                 except IndexError:
@@ -103,3 +105,158 @@ class TestResponse(object):
         assert len(verifier.received_messages) == 2
         assert verifier.received_messages[0].topic == fake_message_bad.topic
         assert verifier.received_messages[1].topic == fake_message_good.topic
+
+    def test_wildcard_topic(self, includes):
+        """Message on a topic matching a wildcard subscription"""
+
+        expected = {"topic": "/a/+/c", "payload": "hello"}
+
+        fake_message = FakeMessage({"topic": "/a/b/c", "payload": "hello"})
+
+        verifier = self._get_fake_verifier(expected, [fake_message], includes)
+
+        verifier.verify(expected)
+
+    def test_buffer_overflow_fails(self, includes):
+        """Messages being dropped is an error even if the message was found"""
+
+        expected = {"topic": "/a/b/c", "payload": "hello"}
+
+        verifier = self._get_fake_verifier(expected, [FakeMessage(expected)], includes)
+        verifier._client.check_overflow.side_effect = exceptions.MQTTBufferOverflowError(
+            "dropped"
+        )
+
+        with pytest.raises(exceptions.TestFailError):
+            verifier.verify(expected)
+
+
+class TestMultipleMessages(TestResponse):
+    def test_all_received(self, includes):
+        """Messages on different topics are all matched"""
+
+        expected = [
+            {"topic": "/a/b/c", "payload": "hello"},
+            {"topic": "/d/e/f", "payload": "goodbye"},
+        ]
+
+        fake_messages = [FakeMessage(e) for e in expected]
+
+        verifier = self._get_fake_verifier(expected, fake_messages, includes)
+
+        verifier.verify(expected)
+
+        assert len(verifier.received_messages) == 2
+
+    def test_one_missing_fails(self, includes):
+        expected = [
+            {"topic": "/a/b/c", "payload": "hello"},
+            {"topic": "/d/e/f", "payload": "goodbye"},
+        ]
+
+        verifier = self._get_fake_verifier(
+            expected, [FakeMessage(expected[0])], includes
+        )
+
+        with pytest.raises(exceptions.TestFailError) as e:
+            verifier.verify(expected)
+
+        assert "/d/e/f" in str(e.value)
+
+    def test_out_of_order_fails(self, includes):
+        """Messages have to arrive in the order they are listed by default"""
+
+        expected = [
+            {"topic": "/a/b/c", "payload": "hello"},
+            {"topic": "/a/b/c", "payload": "goodbye"},
+        ]
+
+        fake_messages = [FakeMessage(e) for e in reversed(expected)]
+
+        verifier = self._get_fake_verifier(expected, fake_messages, includes)
+
+        with pytest.raises(exceptions.TestFailError):
+            verifier.verify(expected)
+
+    def test_unordered(self, includes):
+        """Unordered messages can arrive at any time"""
+
+        expected = [
+            {"topic": "/a/b/c", "payload": "hello"},
+            {"topic": "/a/b/c", "payload": "goodbye", "unordered": True},
+        ]
+
+        fake_messages = [FakeMessage(e) for e in reversed(expected)]
+
+        verifier = self._get_fake_verifier(expected, fake_messages, includes)
+
+        verifier.verify(expected)
+
+    def test_shared_timeout(self, includes):
+        """All messages are waited for for the longest timeout given"""
+
+        expected = [
+            {"topic": "/a/b/c", "payload": "hello", "timeout": 0.1},
+            {"topic": "/d/e/f", "payload": "goodbye", "timeout": 5},
+        ]
+
+        verifier = self._get_fake_verifier(expected, [], includes)
+        verifier._client.message_received = Mock(return_value=None)
+
+        with pytest.raises(exceptions.TestFailError):
+            verifier.verify(expected)
+
+        timeout, = verifier._client.message_received.call_args[0]
+        assert 4 < timeout <= 5
+        assert verifier._client.message_received.call_args[1]["topic"] == [
+            "/a/b/c",
+            "/d/e/f",
+        ]
+
+    def test_save_from_each(self, includes):
+        expected = [
+            {"topic": "/a/b/c", "json": {"a": 1}, "save": {"json": {"first": "a"}}},
+            {
+                "topic": "/d/e/f",
+                "json": {"b": 2},
+                "save": {"json": {"second": "b"}},
+                "unordered": True,
+            },
+        ]
+
+        fake_messages = [
+            FakeMessage({"topic": "/d/e/f", "payload": '{"b": 2}'}),
+            FakeMessage({"topic": "/a/b/c", "payload": '{"a": 1}'}),
+        ]
+
+        verifier = self._get_fake_verifier(expected, fake_messages, includes)
+
+        assert verifier.verify(expected) == {"first": 1, "second": 2}
+
+    def test_overlapping_subscriptions(self, includes):
+        """A message received on more than one subscription is only checked
+        once, and isn't changed while checking it"""
+        expected = [
+            {"topic": "dev/a", "json": {"x": 1}},
+            {"topic": "dev/+", "json": {"y": 2}},
+        ]
+
+        buffers = MessageBuffers()
+        for e in expected:
+            buffers.add(e["topic"])
+
+        sent = []
+        for topic, payload in [("dev/a", '{"x": 1}'), ("dev/b", '{"y": 2}')]:
+            msg = paho.MQTTMessage(topic=topic.encode("utf8"))
+            msg.payload = payload.encode("utf8")
+            buffers.put(msg)
+            sent.append(msg)
+
+        fake_client = Mock(spec=MQTTClient, message_received=buffers.get)
+
+        verifier = MQTTResponse(fake_client, "Test stage", expected, includes)
+
+        verifier.verify(expected)
+
+        assert [m.topic for m in verifier.received_messages] == ["dev/a", "dev/b"]
+        assert [m.payload for m in sent] == [b'{"x": 1}', b'{"y": 2}']
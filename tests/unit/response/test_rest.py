@@ -1,8 +1,10 @@
+import logging
 from unittest.mock import Mock, patch
 
 import pytest
+import requests
 
-from tavern._plugins.rest.response import RestResponse
+from tavern._plugins.rest.response import ParsedResponse, RestResponse
 from tavern.util import exceptions
 from tavern.util.dict_util import format_keys
 from tavern.util.loader import ANYTHING
@@ -390,6 +392,99 @@ class TestFull:
 
         r.verify(FakeResponse())
 
+    def test_body_decoded_once(self, example_response, includes):
+        """Logging, validation and saving should all share one decoded body"""
+        example_response["save"] = {"json": {"test_code": "code"}}
+        r = RestResponse(Mock(), "Test 1", example_response, includes)
+
+        json_mock = Mock(return_value=example_response["json"])
+
+        class FakeResponse:
+            headers = example_response["headers"]
+            content = "test".encode("utf8")
+            json = json_mock
+            status_code = example_response["status_code"]
+
+        r.verify(FakeResponse())
+
+        assert json_mock.call_count == 1
+
+    @pytest.mark.parametrize("level", ("DEBUG", "INFO"))
+    def test_verbose_log_only_at_debug(self, example_response, includes, level):
+        """Headers and body are only formatted for the log if they will be
+        logged"""
+        r = RestResponse(Mock(), "Test 1", example_response, includes)
+
+        with patch("tavern._plugins.rest.response._format_block") as fmock, patch(
+            "tavern._plugins.rest.response.logger.isEnabledFor",
+            side_effect=lambda lvl: lvl >= getattr(logging, level),
+        ), patch("tavern._plugins.rest.response.logger.debug") as dmock:
+            r._verbose_log_response(
+                Mock(headers=example_response["headers"], json=Mock(return_value={}))
+            )
+
+            for args, _ in dmock.call_args_list:
+                str(args[-1])
+
+        assert fmock.called == (level == "DEBUG")
+
+
+class TestParsedResponse:
+    @pytest.fixture(autouse=True)
+    def no_orjson(self):
+        with patch("tavern._plugins.rest.response.orjson", None):
+            yield
+
+    def test_json_memoised(self):
+        response = Mock(json=Mock(return_value={"a": 1}))
+        parsed = ParsedResponse(response)
+
+        assert parsed.json() is parsed.json()
+        assert response.json.call_count == 1
+
+    def test_json_error_memoised(self):
+        response = Mock(json=Mock(side_effect=ValueError))
+        parsed = ParsedResponse(response)
+
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                parsed.json()
+
+        assert response.json.call_count == 1
+
+    def test_passes_through(self):
+        response = Mock(status_code=404, text="abc")
+        response.__bool__ = Mock(return_value=False)
+        parsed = ParsedResponse(response)
+
+        assert parsed.status_code == 404
+        assert parsed.text == "abc"
+        assert not parsed
+
+
+class TestFastJson:
+    @pytest.mark.parametrize(
+        "content, expected",
+        ((b'{"a": [1, "b"]}', {"a": [1, "b"]}), (b'{"a": NaN}', {"a": float("nan")})),
+    )
+    def test_decode(self, content, expected):
+        """Should decode the same way whether or not orjson is installed"""
+        response = requests.Response()
+        response._content = content
+        response.encoding = "utf-8"
+
+        decoded = ParsedResponse(response).json()
+
+        assert str(decoded) == str(expected)
+
+    def test_invalid(self):
+        response = requests.Response()
+        response._content = b"abc"
+        response.encoding = "utf-8"
+
+        with pytest.raises(ValueError):
+            ParsedResponse(response).json()
+
 
 def test_status_code_warns(example_response, includes):
     """Should continue if the status code is nonexistent
@@ -0,0 +1,219 @@
+import hashlib
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+import requests
+
+from tavern._plugins.rest.response import RestResponse
+from tavern._plugins.rest.stream import iter_json_array, iter_lines, iter_ndjson
+from tavern.util import exceptions
+from tavern.util.loader import IntSentinel
+
+
+def chunked(body, size):
+    return [body[i : i + size] for i in range(0, len(body), size)]
+
+
+class FakeStreamedResponse:
+    def __init__(self, body, chunk_size=7, status_code=200, error=None):
+        self.status_code = status_code
+        self.headers = {"content-type": "application/x-ndjson"}
+        self.cookies = {}
+        self.history = []
+        self.close = Mock()
+        self.json = Mock(side_effect=AssertionError("whole body read"))
+
+        self._chunks = chunked(body, chunk_size)
+        self._error = error
+        self.read = 0
+
+    def iter_content(self, chunk_size):
+        # pylint: disable=unused-argument
+        for chunk in self._chunks:
+            self.read += 1
+            yield chunk
+
+            if self._error is not None:
+                raise self._error
+
+
+class TestParsing:
+    @pytest.mark.parametrize("chunk_size", (1, 3, 1000))
+    def test_lines(self, chunk_size):
+        body = b"a\n\nbc\r\ndef"
+        assert list(iter_lines(chunked(body, chunk_size))) == [b"a", b"bc\r", b"def"]
+
+    @pytest.mark.parametrize("chunk_size", (1, 5, 1000))
+    def test_ndjson(self, chunk_size):
+        items = [{"a": 1}, [1, 2], "x", 12345]
+        body = "\n".join(json.dumps(i) for i in items).encode("utf8")
+
+        assert list(iter_ndjson(chunked(body, chunk_size))) == items
+
+    def test_ndjson_invalid(self):
+        with pytest.raises(ValueError) as e:
+            list(iter_ndjson([b'{"a": 1}\n{"a": \n']))
+
+        assert "line 2" in str(e.value)
+
+    @pytest.mark.parametrize("chunk_size", (1, 4, 1000))
+    def test_json_array(self, chunk_size):
+        items = [{"a": "é" * 3}, 12345, 1.5e10, [], None, True, "x,]"]
+        body = json.dumps(items, indent=2).encode("utf8")
+
+        assert list(iter_json_array(chunked(body, chunk_size))) == items
+
+    def test_large_element(self):
+        """An element much larger than a chunk is only decoded a few times"""
+        items = [1, {"a": "x" * (4 * 1024 * 1024), "b": [1] * 1000}, 2]
+        body = json.dumps(items).encode("utf8")
+
+        calls = []
+
+        class CountingDecoder(json.JSONDecoder):
+            def raw_decode(self, s, idx=0):
+                calls.append(idx)
+                return super().raw_decode(s, idx)
+
+        with patch("tavern._plugins.rest.stream.json.JSONDecoder", CountingDecoder):
+            decoded = list(iter_json_array(chunked(body, 64 * 1024)))
+
+        assert decoded == items
+        # 70 chunks - without reading ahead this would be decoded after each one
+        assert len(calls) < 15
+
+    def test_empty_array(self):
+        assert list(iter_json_array([b" [ ", b" ] "])) == []
+
+    @pytest.mark.parametrize(
+        "body", (b'{"a": 1}', b"[1, 2", b"[1 2]", b"[1, }]", b"[1] 2")
+    )
+    def test_json_array_invalid(self, body):
+        with pytest.raises(ValueError):
+            list(iter_json_array(chunked(body, 2)))
+
+
+class TestStreamedResponse:
+    @pytest.fixture(name="ndjson_body")
+    def fix_ndjson_body(self):
+        return b"".join(
+            json.dumps({"id": i, "name": "item{}".format(i)}).encode("utf8") + b"\n"
+            for i in range(20)
+        )
+
+    def _verify(self, stream, body, includes, **kwargs):
+        expected = {"status_code": 200, "stream": stream}
+        r = RestResponse(Mock(), "Test 1", expected, includes)
+        response = FakeStreamedResponse(body, **kwargs)
+
+        return r.verify(response), response
+
+    def test_items_and_save(self, ndjson_body, includes):
+        stream = {
+            "format": "ndjson",
+            "count": 20,
+            "items": {"id": IntSentinel(), "name": IntSentinel()},
+            "save": {
+                "first_name": {"item": 0, "query": "name"},
+                "last": {"item": -1},
+            },
+        }
+        includes["strict"] = includes["strict"].all_off()
+        stream["items"].pop("name")
+
+        saved, response = self._verify(stream, ndjson_body, includes)
+
+        assert saved == {"first_name": "item0", "last": {"id": 19, "name": "item19"}}
+        assert response.close.called
+
+    def test_item_mismatch(self, ndjson_body, includes):
+        stream = {"format": "ndjson", "items": {"id": 0, "name": "item0"}}
+
+        with pytest.raises(exceptions.TestFailError) as e:
+            self._verify(stream, ndjson_body, includes)
+
+        assert "Item 1:" in str(e.value)
+        assert "Item 0:" not in str(e.value)
+        assert "and 9 more items" in str(e.value)
+
+    def test_count(self, ndjson_body, includes):
+        with pytest.raises(exceptions.TestFailError) as e:
+            self._verify({"format": "ndjson", "count": 19}, ndjson_body, includes)
+
+        assert "Expected 19 items in body but got 20" in str(e.value)
+
+    def test_digest(self, ndjson_body, includes):
+        stream = {"digest": {"sha256": hashlib.sha256(ndjson_body).hexdigest()}}
+        self._verify(stream, ndjson_body, includes)
+
+        with pytest.raises(exceptions.TestFailError):
+            self._verify({"digest": {"sha256": "abc"}}, ndjson_body, includes)
+
+    def test_max_size_stops_reading(self, ndjson_body, includes):
+        with pytest.raises(exceptions.TestFailError) as e:
+            self._verify({"max_size": 10}, ndjson_body, includes, chunk_size=5)
+
+        assert "larger than the maximum size of 10 bytes" in str(e.value)
+
+    def test_connection_error(self, ndjson_body, includes):
+        """Errors while reading the body fail the test"""
+        error = requests.exceptions.ChunkedEncodingError("Connection reset")
+
+        with pytest.raises(exceptions.TestFailError) as e:
+            self._verify(
+                {"format": "ndjson"}, ndjson_body, includes, chunk_size=5, error=error
+            )
+
+        assert "Error reading body after 5 bytes: Connection reset" in str(e.value)
+
+    def test_body_not_read_if_status_wrong(self, ndjson_body, includes):
+        expected = {"status_code": 200, "stream": {"format": "ndjson"}}
+        r = RestResponse(Mock(), "Test 1", expected, includes)
+        response = FakeStreamedResponse(ndjson_body, status_code=500)
+
+        with pytest.raises(exceptions.TestFailError):
+            r.verify(response)
+
+        assert response.read == 0
+        assert response.close.called
+
+    def test_save_out_of_range(self, ndjson_body, includes):
+        stream = {"format": "ndjson", "save": {"a": {"item": 20}}}
+
+        with pytest.raises(exceptions.TestFailError):
+            self._verify(stream, ndjson_body, includes)
+
+    def test_save_missing(self, ndjson_body, includes):
+        stream = {"format": "ndjson", "save": {"a": {"item": 1, "query": "nothing"}}}
+
+        with pytest.raises(exceptions.TestFailError) as e:
+            self._verify(stream, ndjson_body, includes)
+
+        assert "Wanted to save 'nothing' from item 1, but it did not exist" in str(
+            e.value
+        )
+
+    def test_save_invalid_query(self, includes):
+        stream = {"format": "ndjson", "save": {"a": {"item": 1, "query": "a[0"}}}
+
+        with pytest.raises(exceptions.BadSchemaError):
+            RestResponse(Mock(), "Test 1", {"stream": stream}, includes)
+
+    @pytest.mark.parametrize(
+        "stream",
+        (
+            {"format": "raw", "count": 1},
+            {"format": "xml"},
+            {"digest": {"not-a-hash": "abc"}},
+        ),
+    )
+    def test_invalid_stream_block(self, includes, stream):
+        with pytest.raises(exceptions.BadSchemaError):
+            RestResponse(Mock(), "Test 1", {"stream": stream}, includes)
+
+    def test_no_json_block(self, includes):
+        expected = {"stream": {"format": "ndjson"}, "json": {"a": 1}}
+
+        with pytest.raises(exceptions.BadSchemaError):
+            RestResponse(Mock(), "Test 1", expected, includes)
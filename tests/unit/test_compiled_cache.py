@@ -0,0 +1,194 @@
+import os
+from textwrap import dedent
+from unittest.mock import patch
+
+import pytest
+import yaml
+
+from tavern.util import loader
+from tavern.util.compiled_cache import CompiledTestCache
+from tavern.util.loader import ANYTHING, IncludeLoader, track_loaded_files
+
+
+@pytest.fixture(name="test_dir")
+def fix_test_dir(tmpdir):
+    tmpdir.join("included.yaml").write(
+        dedent(
+            """
+            ---
+            variables:
+              key: value
+            """
+        )
+    )
+
+    tmpdir.join("test_a.tavern.yaml").write(
+        dedent(
+            """
+            ---
+            test_name: A test
+
+            includes:
+              - !include included.yaml
+
+            stages:
+              - name: Do something
+                request:
+                  url: http://localhost/
+                response:
+                  json:
+                    thing: !anything
+            """
+        )
+    )
+
+    return tmpdir
+
+
+def _load(filename):
+    with track_loaded_files() as loaded:
+        with open(filename, "r", encoding="utf-8") as fileobj:
+            documents = list(yaml.load_all(fileobj, Loader=IncludeLoader))
+
+    return documents, loaded
+
+
+class TestCompiledCache:
+    def test_roundtrip(self, test_dir):
+        cache = CompiledTestCache(test_dir.mkdir("cache"))
+        filename = str(test_dir.join("test_a.tavern.yaml"))
+
+        assert cache.load(filename) is None
+
+        documents, loaded = _load(filename)
+        assert loaded.files == {str(test_dir.join("included.yaml"))}
+        assert not loaded.volatile
+
+        cache.store(filename, documents, loaded.files)
+        cached = cache.load(filename)
+
+        assert cached == documents
+        # Source mapping should be kept
+        assert cached[0].start_mark.line == documents[0].start_mark.line
+
+    def test_anything_singleton(self, test_dir):
+        cache = CompiledTestCache(test_dir.mkdir("cache"))
+        filename = str(test_dir.join("test_a.tavern.yaml"))
+
+        documents, loaded = _load(filename)
+        cache.store(filename, documents, loaded.files)
+        cached = cache.load(filename)
+
+        assert cached[0]["stages"][0]["response"]["json"]["thing"] is ANYTHING
+
+    @pytest.mark.parametrize("changed", ("test_a.tavern.yaml", "included.yaml"))
+    def test_invalidated_on_change(self, test_dir, changed):
+        cache = CompiledTestCache(test_dir.mkdir("cache"))
+        filename = str(test_dir.join("test_a.tavern.yaml"))
+
+        documents, loaded = _load(filename)
+        cache.store(filename, documents, loaded.files)
+
+        test_dir.join(changed).write("\n# changed", mode="a")
+
+        assert cache.load(filename) is None
+
+    def test_uuid_is_volatile(self, test_dir):
+        filename = test_dir.join("test_uuid.tavern.yaml")
+        filename.write(
+            dedent(
+                """
+                ---
+                test_name: A test
+
+                includes:
+                  - variables:
+                      id: !uuid
+                """
+            )
+        )
+
+        _, loaded = _load(str(filename))
+
+        assert loaded.volatile
+
+
+class TestIncludeCache:
+    @pytest.fixture(name="nested")
+    def fix_nested(self, test_dir):
+        test_dir.join("outer.yaml").write("inner: !include included.yaml\n")
+        return str(test_dir.join("outer.yaml"))
+
+    @staticmethod
+    def _load_counted(include_cache, filename):
+        with patch(
+            "tavern.util.loader.load_single_document_yaml",
+            wraps=loader.load_single_document_yaml,
+        ) as pload:
+            loaded = include_cache.load(filename)
+
+        return loaded, pload.call_count
+
+    def test_only_parsed_once(self, nested):
+        include_cache = loader._IncludeCache()
+
+        first, count = self._load_counted(include_cache, nested)
+        assert count == 2
+
+        second, count = self._load_counted(include_cache, nested)
+        assert count == 0
+
+        assert first == second == {"inner": {"variables": {"key": "value"}}}
+
+    def test_returns_copy(self, nested):
+        include_cache = loader._IncludeCache()
+
+        include_cache.load(nested)["inner"]["variables"]["key"] = "changed"
+
+        assert include_cache.load(nested)["inner"]["variables"]["key"] == "value"
+
+    def test_reloaded_on_change(self, test_dir, nested):
+        include_cache = loader._IncludeCache()
+        include_cache.load(nested)
+
+        test_dir.join("included.yaml").write("variables:\n  key: other\n")
+        # Make sure it's picked up even on filesystems with coarse mtimes
+        os.utime(str(test_dir.join("included.yaml")), ns=(0, 0))
+
+        loaded, count = self._load_counted(include_cache, nested)
+        assert count == 2
+        assert loaded["inner"]["variables"]["key"] == "other"
+
+    def test_dependencies_recorded_on_hit(self, test_dir, nested):
+        include_cache = loader._IncludeCache()
+        include_cache.load(nested)
+
+        with track_loaded_files() as loaded:
+            include_cache.load(nested)
+
+        assert loaded.files == {nested, str(test_dir.join("included.yaml"))}
+
+    def test_volatile_not_cached(self, test_dir):
+        test_dir.join("volatile.yaml").write("id: !uuid\n")
+        filename = str(test_dir.join("volatile.yaml"))
+
+        include_cache = loader._IncludeCache()
+
+        first = include_cache.load(filename)
+        second = include_cache.load(filename)
+
+        assert first["id"] != second["id"]
+
+    def test_shared_between_processes(self, test_dir, nested):
+        shared_dir = test_dir.mkdir("shared")
+
+        include_cache = loader._IncludeCache()
+        include_cache.set_shared_dir(shared_dir)
+        include_cache.load(nested)
+
+        other_process = loader._IncludeCache()
+        other_process.set_shared_dir(shared_dir)
+
+        loaded, count = self._load_counted(other_process, nested)
+        assert count == 0
+        assert loaded == {"inner": {"variables": {"key": "value"}}}
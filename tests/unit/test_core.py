@@ -8,9 +8,14 @@ import paho.mqtt.client as paho
 import pytest
 import requests
 
+from tavern._plugins.mqtt.buffer import MessageBuffers
 from tavern._plugins.mqtt.client import MQTTClient
 from tavern.core import run_test
+from tavern.plugins import get_expected
 from tavern.util import exceptions
+from tavern.util.poll import Poll
+from tavern.util.scope import new_test_config
+from tavern.util.timing import StageTimings
 
 
 @pytest.fixture(name="fulltest")
@@ -64,6 +69,49 @@ class TestRunStages:
 
         assert pmock.called
 
+    def test_stage_timings(self, fulltest, mockargs, includes):
+        """Timings are recorded and passed to the hook after every stage"""
+
+        mock_response = Mock(**mockargs)
+
+        with patch(
+            "tavern._plugins.rest.request.requests.Session.request",
+            return_value=mock_response,
+        ):
+            run_test("heif", fulltest, includes)
+
+        hook_caller = includes["tavern_internal"]["pytest_hook_caller"]
+        stage_hook = hook_caller.pytest_tavern_beta_after_every_stage
+
+        assert stage_hook.call_count == 1
+        timings = stage_hook.call_args[1]["timings"]
+        assert timings.name == "step 1"
+        assert {"format", "send", "verify", "save"} <= set(timings.phases)
+
+    def test_stage_hook_error_after_failure(self, fulltest, includes):
+        """An error from the hook doesn't replace the error from the stage"""
+        hook_caller = includes["tavern_internal"]["pytest_hook_caller"]
+        hook_caller.pytest_tavern_beta_after_every_stage.side_effect = RuntimeError
+
+        with patch(
+            "tavern._plugins.rest.request.requests.Session.request",
+            side_effect=requests.exceptions.ConnectionError,
+        ):
+            with pytest.raises(exceptions.RestRequestException):
+                run_test("heif", fulltest, includes)
+
+        assert hook_caller.pytest_tavern_beta_after_every_stage.called
+
+    def test_no_hook_caller(self, fulltest, includes):
+        del includes["tavern_internal"]["pytest_hook_caller"]
+
+        with patch(
+            "tavern._plugins.rest.request.requests.Session.request",
+            side_effect=requests.exceptions.ConnectionError,
+        ):
+            with pytest.raises(exceptions.RestRequestException):
+                run_test("heif", fulltest, includes)
+
     def test_invalid_code(self, fulltest, mockargs, includes):
         """Wrong status code
         """
@@ -186,6 +234,29 @@ class TestIncludeStages:
 
         self.check_mocks_called(pmock)
 
+    def test_global_stage_not_changed(self, fulltest, mockargs, includes, fake_stages):
+        """Running a global stage doesn't change it for the next test"""
+        mock_response = Mock(**mockargs)
+
+        fake_stages[0]["request"]["follow_redirects"] = True
+        original = deepcopy(fake_stages)
+
+        includes["stages"] = fake_stages
+
+        for _ in range(2):
+            newtest = deepcopy(fulltest)
+            newtest["stages"].insert(0, {"type": "ref", "id": "my_external_stage"})
+
+            with patch(
+                "tavern._plugins.rest.request.requests.Session.request",
+                return_value=mock_response,
+            ) as pmock:
+                run_test("heif", newtest, new_test_config(includes))
+
+            assert pmock.call_args_list[0][1]["allow_redirects"] is True
+
+        assert fake_stages == original
+
     def test_both_stages(self, fulltest, mockargs, includes, fake_stages):
         """ Load stage defined in both - raise a warning for now
         """
@@ -257,6 +328,20 @@ class TestRetry:
 
         assert pmock.call_count == 2
 
+    def test_attempts_marked_failed(self, fulltest, mockargs, includes):
+        fulltest["stages"][0]["max_retries"] = 1
+        mockargs["status_code"] = 400
+        mock_response = Mock(**mockargs)
+
+        with patch(
+            "tavern._plugins.rest.request.requests.Session.request",
+            return_value=mock_response,
+        ):
+            with pytest.raises(exceptions.TestFailError) as excinfo:
+                run_test("heif", fulltest, includes)
+
+        assert [s.failed for s in excinfo.value.timings.stages] == [True, True]
+
     def test_run_once(self, fulltest, mockargs, includes):
         mock_responses = Mock(**mockargs)
 
@@ -268,6 +353,241 @@ class TestRetry:
 
         assert pmock.call_count == 1
 
+    def test_backoff(self, fulltest, mockargs, includes):
+        fulltest["stages"][0]["max_retries"] = 3
+        fulltest["stages"][0]["retry_backoff"] = {
+            "initial": 0.5,
+            "multiplier": 3,
+            "max": 2,
+        }
+        mockargs["status_code"] = 400
+        mock_response = Mock(**mockargs)
+
+        with patch(
+            "tavern._plugins.rest.request.requests.Session.request",
+            return_value=mock_response,
+        ) as pmock:
+            with patch("tavern.util.delay.time.sleep") as smock:
+                with pytest.raises(exceptions.TestFailError):
+                    run_test("heif", fulltest, includes)
+
+        assert pmock.call_count == 4
+        assert [c[0][0] for c in smock.call_args_list] == [0.5, 1.5, 2]
+
+    def test_backoff_jitter(self, fulltest, mockargs, includes):
+        fulltest["stages"][0]["max_retries"] = 2
+        fulltest["stages"][0]["delay_after"] = 4
+        fulltest["stages"][0]["retry_backoff"] = {"jitter": 0.5}
+        mockargs["status_code"] = 400
+        mock_response = Mock(**mockargs)
+
+        with patch(
+            "tavern._plugins.rest.request.requests.Session.request",
+            return_value=mock_response,
+        ):
+            with patch("tavern.util.delay.time.sleep") as smock:
+                with patch("tavern.util.retry.random.random", return_value=1):
+                    with pytest.raises(exceptions.TestFailError):
+                        run_test("heif", fulltest, includes)
+
+        # Starts from delay_after
+        assert [c[0][0] for c in smock.call_args_list] == [2, 4]
+
+    def test_retry_until(self, fulltest, mockargs, includes):
+        """Retries until the deadline even without max_retries, and doesn't
+        wait past it"""
+        fulltest["stages"][0]["retry_until"] = 10
+        fulltest["stages"][0]["delay_after"] = 4
+        mockargs["status_code"] = 400
+        mock_response = Mock(**mockargs)
+
+        clock = iter([0, 0, 4, 8, 10])
+
+        with patch(
+            "tavern._plugins.rest.request.requests.Session.request",
+            return_value=mock_response,
+        ) as pmock:
+            with patch("tavern.util.delay.time.sleep") as smock:
+                with patch(
+                    "tavern.util.retry.time.monotonic", side_effect=lambda: next(clock)
+                ):
+                    with pytest.raises(exceptions.TestFailError):
+                        run_test("heif", fulltest, includes)
+
+        assert pmock.call_count == 4
+        assert [c[0][0] for c in smock.call_args_list] == [4, 4, 2]
+
+    def test_invalid_backoff(self, fulltest, includes):
+        fulltest["stages"][0]["max_retries"] = 2
+        fulltest["stages"][0]["retry_backoff"] = {"jitter": 2}
+
+        with pytest.raises(exceptions.InvalidRetryException):
+            run_test("heif", fulltest, includes)
+
+
+class TestPoll:
+    @pytest.fixture(autouse=True)
+    def add_poll(self, fulltest):
+        fulltest["stages"][0]["poll"] = {"timeout": 30}
+
+    def test_polls_until_match(self, fulltest, mockargs, includes):
+        """Request and expected response are only created once"""
+        failed_mockargs = deepcopy(mockargs)
+        failed_mockargs["status_code"] = 404
+
+        mock_responses = [
+            Mock(**failed_mockargs),
+            Mock(**failed_mockargs),
+            Mock(**mockargs),
+        ]
+
+        with patch(
+            "tavern._plugins.rest.request.requests.Session.request",
+            side_effect=mock_responses,
+        ) as pmock:
+            with patch("tavern.util.delay.time.sleep") as smock:
+                with patch(
+                    "tavern.core.get_expected", wraps=get_expected
+                ) as expected_mock:
+                    run_test("heif", fulltest, includes)
+
+        assert pmock.call_count == 3
+        assert expected_mock.call_count == 1
+        assert [c[0][0] for c in smock.call_args_list] == [1, 1.5]
+
+    def test_retry_after(self, fulltest, mockargs, includes):
+        fulltest["stages"][0]["poll"]["max_interval"] = 1
+        failed_mockargs = deepcopy(mockargs)
+        failed_mockargs["status_code"] = 503
+        failed_mockargs["headers"] = {"Retry-After": "5"}
+
+        mock_responses = [Mock(**failed_mockargs), Mock(**mockargs)]
+
+        with patch(
+            "tavern._plugins.rest.request.requests.Session.request",
+            side_effect=mock_responses,
+        ):
+            with patch("tavern.util.delay.time.sleep") as smock:
+                run_test("heif", fulltest, includes)
+
+        smock.assert_called_once_with(5)
+
+    def test_timeout(self, fulltest, mockargs, includes):
+        """Doesn't wait past the timeout, and records how many polls were made"""
+        fulltest["stages"][0]["poll"]["timeout"] = 3
+        mockargs["status_code"] = 404
+        mock_response = Mock(**mockargs)
+
+        clock = iter([0, 1, 2.5, 3])
+
+        with patch(
+            "tavern._plugins.rest.request.requests.Session.request",
+            return_value=mock_response,
+        ) as pmock:
+            with patch("tavern.util.delay.time.sleep") as smock:
+                with patch(
+                    "tavern.util.poll.time.monotonic", side_effect=lambda: next(clock)
+                ):
+                    with pytest.raises(exceptions.TestFailError) as excinfo:
+                        run_test("heif", fulltest, includes)
+
+        assert pmock.call_count == 3
+        assert [c[0][0] for c in smock.call_args_list] == [1, 0.5]
+
+        stage_timings = excinfo.value.timings.stages[0].as_dict()
+        assert stage_timings["polls"] == {"count": 3, "converged": None}
+
+    def test_converged(self):
+        request = Mock(spec=["run"])
+        verifier = Mock(spec=["reset", "verify"])
+        verifier.verify.side_effect = [exceptions.TestFailError("no"), {"a": 1}]
+        timings = StageTimings("step 1")
+
+        clock = iter([10, 11, 12.5])
+
+        with patch("tavern.util.delay.time.sleep"):
+            with patch(
+                "tavern.util.poll.time.monotonic", side_effect=lambda: next(clock)
+            ):
+                saved = Poll(5).run("step 1", request, [verifier], timings)
+
+        assert saved == {"a": 1}
+        assert verifier.reset.call_count == 2
+        assert timings.as_dict()["polls"] == {"count": 2, "converged": 2.5}
+
+    def test_files(self, fulltest, mockargs, includes, tmpdir):
+        """Files are opened again for each request"""
+        tmpdir.join("upload.txt").write("some data")
+
+        request = fulltest["stages"][0]["request"]
+        request["method"] = "POST"
+        request["files"] = {"file1": str(tmpdir.join("upload.txt"))}
+
+        failed_mockargs = deepcopy(mockargs)
+        failed_mockargs["status_code"] = 404
+        mock_responses = [Mock(**failed_mockargs), Mock(**mockargs)]
+
+        sent = []
+
+        def send(*args, **kwargs):
+            sent.append(kwargs["files"]["file1"][1].read())
+            return mock_responses.pop(0)
+
+        with patch(
+            "tavern._plugins.rest.request.requests.Session.request", side_effect=send
+        ):
+            with patch("tavern.util.delay.time.sleep"):
+                run_test("heif", fulltest, includes)
+
+        assert sent == [b"some data", b"some data"]
+
+    def test_mqtt(self, includes):
+        """Subscriptions are kept until the stage has finished polling, so
+        messages are still received after the first attempt"""
+        spec = {
+            "test_name": "Poll an mqtt response",
+            "mqtt": {"connect": "localhost"},
+            "stages": [
+                {
+                    "name": "step 1",
+                    "poll": {"timeout": 30},
+                    "mqtt_publish": {"topic": "/abc/123", "payload": "status"},
+                    "mqtt_response": {"topic": "/abc/456", "payload": "ready"},
+                }
+            ],
+        }
+
+        buffers = MessageBuffers()
+        replies = ["starting", "starting", "ready"]
+
+        def publish(*args, **kwargs):
+            reply = Mock(spec=paho.MQTTMessage, topic="/abc/456")
+            reply.payload = replies.pop(0).encode("utf8")
+            buffers.put(reply)
+
+        fake_client = MagicMock(spec=MQTTClient)
+        fake_client.subscribe.side_effect = lambda topic, *a, **kw: buffers.add(topic)
+        fake_client.publish.side_effect = publish
+        fake_client.message_received.side_effect = buffers.get
+        fake_client.unsubscribe_all.side_effect = buffers.remove_all
+
+        with patch(
+            "tavern.core.get_extra_sessions", return_value={"paho-mqtt": fake_client}
+        ):
+            with patch("tavern.util.delay.time.sleep") as smock:
+                run_test("heif", spec, includes)
+
+        assert fake_client.publish.call_count == 3
+        assert smock.call_count == 2
+        fake_client.unsubscribe_all.assert_called_once_with()
+
+    @pytest.mark.parametrize("key", ["max_retries", "retry_until"])
+    def test_not_with_retries(self, fulltest, includes, key):
+        fulltest["stages"][0][key] = 2
+
+        with pytest.raises(exceptions.BadSchemaError):
+            run_test("heif", fulltest, includes)
+
 
 class TestDelay:
     def test_sleep_before(self, fulltest, mockargs, includes):
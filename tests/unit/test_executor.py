@@ -0,0 +1,216 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import pytest
+
+from tavern.testutils.pytesthook.executor import can_run_concurrently, get_concurrency
+from tavern.testutils.pytesthook.item import YamlItem
+from tavern.testutils.pytesthook.logbuffer import log_buffering
+from tavern.util import exceptions
+from tavern.util.delay import WorkerSlots, sleep
+
+
+def fake_config(ini, cli):
+    return Mock(getini=Mock(return_value=ini), getoption=Mock(return_value=cli))
+
+
+class TestGetConcurrency:
+    @pytest.mark.parametrize(
+        "ini, cli, expected", (("1", None, 1), ("3", None, 3), ("1", 5, 5))
+    )
+    def test_concurrency(self, ini, cli, expected):
+        assert get_concurrency(fake_config(ini, cli)) == expected
+
+    @pytest.mark.parametrize("ini, cli", (("abc", None), ("1", 0), ("-2", None)))
+    def test_invalid(self, ini, cli):
+        with pytest.raises(exceptions.InvalidConfigurationException):
+            get_concurrency(fake_config(ini, cli))
+
+
+def fake_item(markers=(), fixturenames=("request",)):
+    item = YamlItem.__new__(YamlItem)
+    item._scheduled = None
+    item.fixturenames = list(fixturenames)
+    item._fixtureinfo = Mock(name2fixturedefs={})
+    item.iter_markers = Mock(return_value=[SimpleNamespace(name=m) for m in markers])
+    return item
+
+
+class TestCanRunConcurrently:
+    def test_plain_test(self):
+        assert can_run_concurrently(fake_item())
+
+    def test_not_tavern_test(self):
+        assert not can_run_concurrently(Mock())
+
+    @pytest.mark.parametrize("mark", ("skip", "skipif", "xfail", "usefixtures"))
+    def test_setup_marks(self, mark):
+        assert not can_run_concurrently(fake_item(markers=[mark]))
+
+    @pytest.mark.parametrize("scope", ("function", "module"))
+    def test_non_session_fixture(self, scope):
+        item = fake_item(fixturenames=["request", "abc"])
+        item._fixtureinfo.name2fixturedefs = {
+            "abc": [Mock(scope=scope, cached_result=(1, None, None))]
+        }
+
+        assert not can_run_concurrently(item)
+
+    @pytest.mark.parametrize(
+        "cached_result, expected",
+        ((None, False), ((1, None, None), True), ((None, None, Exception()), False)),
+    )
+    def test_session_fixture(self, cached_result, expected):
+        item = fake_item(fixturenames=["request", "abc"])
+        item._fixtureinfo.name2fixturedefs = {
+            "abc": [Mock(scope="session", cached_result=cached_result)]
+        }
+
+        assert can_run_concurrently(item) == expected
+
+
+class TestScheduledRun:
+    def test_waits_for_scheduled(self):
+        item = fake_item()
+
+        with patch.object(YamlItem, "_runtest") as prun:
+            with ThreadPoolExecutor(1) as pool:
+                item.schedule(pool)
+                item.runtest()
+
+            assert prun.call_count == 1
+
+            # Not started in the background this time
+            item.runtest()
+            assert prun.call_count == 2
+
+    def test_reraises(self):
+        item = fake_item()
+
+        with patch.object(
+            YamlItem, "_runtest", side_effect=exceptions.TestFailError("bad")
+        ):
+            with ThreadPoolExecutor(1) as pool:
+                item.schedule(pool)
+
+                with pytest.raises(exceptions.TestFailError):
+                    item.runtest()
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestLogBuffering:
+    @pytest.fixture(name="handler")
+    def fix_handler(self):
+        handler = ListHandler()
+        logging.getLogger().addHandler(handler)
+        log_buffering.install([handler])
+
+        try:
+            yield handler
+        finally:
+            log_buffering.uninstall()
+            logging.getLogger().removeHandler(handler)
+
+    def test_replayed_with_test(self, handler):
+        first = fake_item()
+        second = fake_item()
+
+        def log_from_test():
+            logging.getLogger("tavern.test").warning("from background")
+
+        with patch.object(YamlItem, "_runtest", side_effect=log_from_test):
+            with ThreadPoolExecutor(1) as pool:
+                first.schedule(pool)
+                second.schedule(pool)
+
+                # Finished in the background, but not reported for any test yet
+                second._scheduled.result()
+                assert not handler.records
+
+                first.runtest()
+                assert len(handler.records) == 1
+
+                second.runtest()
+                assert len(handler.records) == 2
+
+        assert handler.records[0].getMessage() == "from background"
+        assert handler.records[0].threadName.startswith("ThreadPoolExecutor")
+
+    def test_replayed_on_failure(self, handler):
+        item = fake_item()
+
+        def fail():
+            logging.getLogger("tavern.test").error("about to fail")
+            raise exceptions.TestFailError("bad")
+
+        with patch.object(YamlItem, "_runtest", side_effect=fail):
+            with ThreadPoolExecutor(1) as pool:
+                item.schedule(pool)
+
+                with pytest.raises(exceptions.TestFailError):
+                    item.runtest()
+
+        assert [r.getMessage() for r in handler.records] == ["about to fail"]
+
+    def test_main_thread_not_buffered(self, handler):
+        logging.getLogger("tavern.test").warning("from main thread")
+
+        assert len(handler.records) == 1
+
+
+class TestWorkerSlots:
+    def test_waiting_gives_up_slot(self):
+        """While one test waits, another can run in its slot"""
+        on_wait = Mock()
+        slots = WorkerSlots(1, on_wait=on_wait)
+
+        waiting = threading.Event()
+        other_ran = threading.Event()
+
+        def first():
+            with slots.held():
+                waiting.set()
+                sleep(0.2)
+                # Only one test can hold the slot
+                assert other_ran.is_set()
+
+        def second():
+            waiting.wait()
+            with slots.held():
+                other_ran.set()
+
+        with ThreadPoolExecutor(2) as pool:
+            futures = [pool.submit(first), pool.submit(second)]
+            for future in futures:
+                future.result()
+
+        assert on_wait.call_count == 1
+        assert slots.waiting == 0
+
+    def test_sleep_without_slots(self):
+        with patch("tavern.util.delay.time.sleep") as smock:
+            sleep(1)
+
+        smock.assert_called_once_with(1)
+
+    def test_scheduled_in_slot(self):
+        item = fake_item()
+        slots = WorkerSlots(1)
+
+        with patch.object(YamlItem, "_runtest") as prun:
+            with ThreadPoolExecutor(1) as pool:
+                item.schedule(pool, slots)
+                item.runtest()
+
+        assert prun.call_count == 1
@@ -0,0 +1,214 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+# pylint: disable=wrong-import-position
+from tavern._plugins.httpx.client import (  # noqa: E402
+    HttpxSession,
+    _convert_body,
+    _convert_timeout,
+)
+from tavern._plugins.httpx.request import HttpxRequest  # noqa: E402
+from tavern._plugins.rest.stream import StreamChecker  # noqa: E402
+from tavern._plugins.rest.upload import file_body  # noqa: E402
+from tavern.util import exceptions  # noqa: E402
+
+
+def _echo(request):
+    return httpx.Response(
+        200,
+        json={
+            "method": request.method,
+            "url": str(request.url),
+            "cookie": request.headers.get("cookie"),
+            "body": request.content.decode("utf8"),
+        },
+        headers={"set-cookie": "session=abc; Path=/"},
+    )
+
+
+@pytest.fixture(name="session")
+def fix_session():
+    transport = httpx.MockTransport(_echo)
+
+    with patch("tavern._plugins.httpx.client.transports.get", return_value=transport):
+        with HttpxSession() as session:
+            yield session
+
+
+@pytest.fixture(name="block_config")
+def fix_block_config():
+    return {"variables": {"host": "http://example.com"}}
+
+
+class TestConversion:
+    def test_timeout_default(self):
+        assert _convert_timeout(None) == httpx.Timeout(None)
+
+    def test_timeout_tuple(self):
+        timeout = _convert_timeout((1, 2))
+        assert timeout.connect == 1
+        assert timeout.read == 2
+
+    @pytest.mark.parametrize("data", ("abc", b"abc"))
+    def test_raw_body(self, data):
+        assert _convert_body({"data": data}) == {"content": data}
+
+    def test_form_body(self):
+        assert _convert_body({"data": {"a": "b"}}) == {"data": {"a": "b"}}
+
+    def test_upload_body(self, tmpdir):
+        tmpdir.join("body.txt").write("abc")
+
+        body = file_body(str(tmpdir.join("body.txt")))
+        converted = _convert_body({"data": body})
+        body.close()
+
+        assert converted["headers"] == {"Content-Length": "3"}
+        assert hasattr(converted["content"], "__aiter__")
+
+    def test_send_upload_body(self, session, block_config, tmpdir):
+        tmpdir.join("body.txt").write("abc")
+        rspec = {
+            "url": "{host}/a",
+            "method": "POST",
+            "file_body": str(tmpdir.join("body.txt")),
+            "upload": {"mmap": True},
+        }
+
+        response = HttpxRequest(session, rspec, block_config).run()
+
+        assert response.json()["body"] == "abc"
+
+
+class TestSession:
+    def test_send_json(self, session, block_config):
+        rspec = {"url": "{host}/a", "method": "POST", "json": {"a": 1}}
+
+        response = HttpxRequest(session, rspec, block_config).run()
+
+        assert response.status_code == 200
+        assert response.json()["url"] == "http://example.com/a"
+        assert json.loads(response.json()["body"]) == {"a": 1}
+
+    def test_cookies_saved_in_session(self, session, block_config):
+        rspec = {"url": "{host}/a", "method": "GET"}
+
+        HttpxRequest(session, dict(rspec), block_config).run()
+        assert session.cookies.get_dict() == {"session": "abc"}
+
+        response = HttpxRequest(session, dict(rspec), block_config).run()
+        assert response.json()["cookie"] == "session=abc"
+
+    def test_override_cookies(self, session, block_config):
+        HttpxRequest(session, {"url": "{host}/a"}, block_config).run()
+
+        rspec = {"url": "{host}/a", "cookies": [{"other": "value"}]}
+        response = HttpxRequest(session, rspec, block_config).run()
+
+        assert response.json()["cookie"] == "other=value"
+        # Original cookies are put back afterwards
+        assert session.cookies.get_dict() == {"session": "abc"}
+
+    def test_request_error(self, block_config):
+        def fail(request):
+            raise httpx.ConnectError("failed", request=request)
+
+        with patch(
+            "tavern._plugins.httpx.client.transports.get",
+            return_value=httpx.MockTransport(fail),
+        ):
+            with HttpxSession() as session:
+                with pytest.raises(exceptions.RestRequestException):
+                    HttpxRequest(session, {"url": "{host}/a"}, block_config).run()
+
+    def test_stream(self):
+        """Body isn't read until it is used"""
+        sent = []
+
+        class StreamingTransport(httpx.AsyncBaseTransport):
+            async def handle_async_request(self, request):
+                async def body():
+                    for chunk in [b"ab", b"cd", b"ef"]:
+                        sent.append(chunk)
+                        yield chunk
+
+                return httpx.Response(200, content=body())
+
+        with patch(
+            "tavern._plugins.httpx.client.transports.get",
+            return_value=StreamingTransport(),
+        ):
+            with HttpxSession() as session:
+                response = session.request("GET", "http://example.com", stream=True)
+
+                assert not sent
+
+                chunks = response.iter_bytes()
+                assert next(chunks) == b"ab"
+                assert sent == [b"ab"]
+                assert list(chunks) == [b"cd", b"ef"]
+
+        assert response.is_closed
+
+    def test_check_stream(self):
+        """Streamed bodies can be checked as they are read"""
+        checker = StreamChecker({"format": "json", "count": 4}, True)
+
+        with patch(
+            "tavern._plugins.httpx.client.transports.get",
+            return_value=httpx.MockTransport(
+                lambda r: httpx.Response(200, json=[1, 2, 3, 4])
+            ),
+        ):
+            with HttpxSession() as session:
+                checker.check(session.request("GET", "http://a", stream=True))
+
+        assert not checker.errors
+
+    def test_check_stream_error(self):
+        class FailingTransport(httpx.AsyncBaseTransport):
+            async def handle_async_request(self, request):
+                async def body():
+                    yield b"[1, "
+                    raise httpx.ReadError("Connection reset", request=request)
+
+                return httpx.Response(200, content=body())
+
+        checker = StreamChecker({"format": "json"}, True)
+
+        with patch(
+            "tavern._plugins.httpx.client.transports.get",
+            return_value=FailingTransport(),
+        ):
+            with HttpxSession() as session:
+                checker.check(session.request("GET", "http://a", stream=True))
+
+        assert len(checker.errors) == 1
+        assert checker.errors[0].startswith("Error reading body after")
+        assert "Connection reset" in checker.errors[0]
+
+    def test_stream_read(self, session):
+        response = session.request("GET", "http://example.com/a", stream=True)
+
+        assert response.json()["method"] == "GET"
+        assert session.cookies.get_dict() == {"session": "abc"}
+
+    def test_clients_closed(self, block_config):
+        transport = httpx.MockTransport(_echo)
+
+        with patch(
+            "tavern._plugins.httpx.client.transports.get", return_value=transport
+        ):
+            with HttpxSession() as session:
+                HttpxRequest(session, {"url": "{host}/a"}, block_config).run()
+                clients = list(session._clients.values())
+
+            with HttpxSession() as session:
+                # Shared transport wasn't closed with the first session
+                HttpxRequest(session, {"url": "{host}/a"}, block_config).run()
+
+        assert clients and all(client.is_closed for client in clients)
@@ -0,0 +1,121 @@
+from unittest.mock import patch
+
+import pytest
+
+from tavern.load import LoadResults, LoadRunner, percentile
+from tavern.util import exceptions
+from tavern.util.timing import TestTimings
+
+
+@pytest.mark.parametrize(
+    "percent, expected", ((0, 1), (10, 1), (50, 5), (90, 9), (99, 10), (100, 10))
+)
+def test_percentile(percent, expected):
+    assert percentile(list(range(1, 11)), percent) == expected
+
+
+def test_percentile_empty():
+    assert percentile([], 50) is None
+
+
+def _test_timings(*stages):
+    timings = TestTimings()
+
+    for name, seconds, *failed in stages:
+        stage_timings = timings.start_stage(name)
+        stage_timings.add("send", seconds)
+        stage_timings.failed = bool(failed and failed[0])
+
+    return timings
+
+
+class TestLoadResults:
+    def test_success(self):
+        results = LoadResults()
+        results.elapsed = 2
+
+        results.record("test", _test_timings(("a", 1), ("b", 2)), False)
+        results.record("test", _test_timings(("a", 3), ("b", 4)), False)
+
+        summary = results.summary()
+
+        assert summary["test: a"]["count"] == 2
+        assert summary["test: a"]["mean"] == 2
+        assert summary["test: a"]["throughput"] == 1
+        assert summary["test: b"]["max"] == 4
+        assert results.errors == 0
+
+    def test_failed_stage(self):
+        results = LoadResults()
+        results.elapsed = 1
+
+        results.record("test", _test_timings(("a", 1), ("b", 2, True)), True)
+
+        summary = results.summary()
+
+        assert summary["test: a"]["errors"] == 0
+        assert summary["test: b"]["errors"] == 1
+        assert summary["test: b"]["error_rate"] == 1
+        assert summary["test: b"]["p50"] is None
+        assert results.failed_tests == 1
+
+        # Should still be able to format it
+        assert "test: b" in results.format_table()
+
+    def test_failed_before_stages(self):
+        """Failures outside of a stage are still counted"""
+        results = LoadResults()
+        results.elapsed = 1
+
+        results.record("test", TestTimings(), True)
+
+        assert results.summary()["test: (setup)"]["errors"] == 1
+        assert results.errors == 1
+        assert results.failed_tests == 1
+
+    def test_retried_stage(self):
+        """Attempts which failed aren't counted as successful requests, even if
+        the stage passed when it was retried"""
+        results = LoadResults()
+        results.elapsed = 1
+
+        timings = _test_timings(("a", 5, True), ("a", 5, True), ("a", 1))
+        results.record("test", timings, False)
+
+        summary = results.summary()
+
+        assert summary["test: a"]["count"] == 3
+        assert summary["test: a"]["errors"] == 2
+        assert summary["test: a"]["max"] == 1
+        assert results.failed_tests == 0
+
+
+class TestLoadRunner:
+    @staticmethod
+    def _fake_run_test(in_file, test_spec, test_block_config):
+        # pylint: disable=unused-argument
+        timings = test_block_config["tavern_internal"]["timings"]
+        stage_timings = timings.start_stage("stage")
+        stage_timings.add("send", 0.001)
+
+        # Saved values should not leak into the next run
+        assert "saved" not in test_block_config["variables"]
+        test_block_config["variables"]["saved"] = 1
+
+        if test_spec["test_name"] == "bad":
+            stage_timings.failed = True
+            raise exceptions.TestFailError("bad")
+
+    def test_runs_all_tests(self):
+        tests = [{"test_name": "good"}, {"test_name": "bad"}]
+
+        with patch("tavern.load.run_test", side_effect=self._fake_run_test):
+            runner = LoadRunner("file", tests, {"variables": {}}, 0.2, 2, rate=50)
+            results = runner.run()
+
+        summary = results.summary()
+
+        assert summary["good: stage"]["errors"] == 0
+        assert summary["bad: stage"]["errors"] == summary["bad: stage"]["count"]
+        # Runs for 0.2s at 50 per second
+        assert 8 <= sum(s["count"] for s in summary.values()) <= 12
@@ -5,7 +5,9 @@ from unittest.mock import MagicMock, Mock, patch
 import paho.mqtt.client as paho
 import pytest
 
+from tavern._plugins.mqtt.buffer import MessageBuffers
 from tavern._plugins.mqtt.client import MQTTClient, _handle_tls_args, _Subscription
+from tavern._plugins.mqtt.pool import _ClientPool
 from tavern._plugins.mqtt.request import MQTTRequest
 from tavern.util import exceptions
 
@@ -35,9 +37,12 @@ class TestClient(object):
     def test_message_queued(self, fake_client):
         """Returns message in queue"""
 
-        message = "abc123"
+        message = Mock(topic="abc")
 
-        fake_client._userdata["queue"].put(message)
+        with patch.object(fake_client._client, "subscribe", return_value=(0, 123)):
+            fake_client.subscribe("abc")
+
+        fake_client._userdata["buffers"].put(message)
         assert fake_client.message_received(0) == message
 
     def test_context_connection_failure(self, fake_client):
@@ -53,13 +58,48 @@ class TestClient(object):
     def test_context_connection_success(self, fake_client):
         """returns self on success"""
 
+        def connect(**kwargs):
+            fake_client._on_connect(fake_client._client, None, {}, 0)
+
         with patch.object(fake_client._client, "loop_start"), patch.object(
-            fake_client._client, "connect_async"
+            fake_client._client, "connect_async", side_effect=connect
         ):
-            fake_client._client._state = paho.mqtt_cs_connected
             with fake_client as x:
                 assert fake_client == x
 
+    def test_context_connection_refused(self, fake_client):
+        """Fails straight away if the broker refuses the connection"""
+
+        fake_client._connect_timeout = 10
+
+        def connect(**kwargs):
+            threading.Timer(
+                0.05, fake_client._on_connect, (fake_client._client, None, {}, 5)
+            ).start()
+
+        with patch.object(fake_client._client, "loop_start"), patch.object(
+            fake_client._client, "connect_async", side_effect=connect
+        ):
+            with pytest.raises(exceptions.MQTTError, match="not authorised"):
+                with fake_client:
+                    pass
+
+    def test_wait_for_suback(self, fake_client):
+        """Stops waiting as soon as the subscription is acknowledged"""
+
+        fake_client._connect_timeout = 10
+
+        with patch.object(fake_client._client, "subscribe", return_value=(0, 123)):
+            fake_client.subscribe("abc")
+
+        threading.Timer(
+            0.05, fake_client._on_subscribe, (fake_client._client, None, 123, (0,))
+        ).start()
+
+        fake_client._wait_for_subscriptions()
+
+        assert fake_client._subscribed[123].subscribed
+
     def test_assert_message_published(self, fake_client):
         """If it couldn't immediately publish the message, error out"""
 
@@ -152,6 +192,7 @@ class TestSubscription(object):
             _client=mock_paho,
             _subscribed={},
             _subscribe_lock=MagicMock(),
+            _message_buffers=MessageBuffers(),
         )
         return mock_client
 
@@ -175,6 +216,7 @@ class TestSubscription(object):
         MQTTClient.subscribe(mock_client, "abc")
 
         assert mock_client._subscribed == {}
+        assert mock_client._message_buffers._buffers == {}
 
     def test_no_subscribe_on_unrecognised_suback(self):
         def subscribe_success(topic, *args, **kwargs):
@@ -185,3 +227,170 @@ class TestSubscription(object):
         MQTTClient._on_subscribe(mock_client, "abc", {}, 123, 0)
 
         assert mock_client._subscribed == {}
+
+
+class TestPooledClient:
+    @pytest.fixture(name="pool")
+    def fix_pool(self):
+        pool = _ClientPool()
+        yield pool
+        pool.close()
+
+    @pytest.fixture(name="fake_paho")
+    def fix_fake_paho(self):
+        def connect(self, **kwargs):
+            self.on_connect(self, None, {}, 0)
+
+        with patch.object(
+            paho.Client, "connect_async", autospec=True, side_effect=connect
+        ) as pconnect, patch.object(paho.Client, "loop_start"), patch.object(
+            paho.Client, "loop_stop"
+        ), patch.object(
+            paho.Client, "disconnect"
+        ), patch.object(
+            paho.Client, "unsubscribe"
+        ):
+            yield pconnect
+
+    args = {"connect": {"host": "localhost"}}
+
+    def test_reuses_connection(self, pool, fake_paho):
+        with pool.get(**self.args) as first:
+            pass
+
+        with pool.get(**self.args) as second:
+            pass
+
+        assert first is second
+        assert fake_paho.call_count == 1
+
+    def test_concurrent_tests_get_different_clients(self, pool, fake_paho):
+        with pool.get(**self.args) as first:
+            with pool.get(**self.args) as second:
+                assert first is not second
+
+    def test_different_settings(self, pool, fake_paho):
+        first = pool.get(**self.args)
+        pool.release(first._key, first)
+
+        assert pool.get(connect={"host": "otherhost"}) is not first
+
+    def test_reset_between_tests(self, pool, fake_paho):
+        with pool.get(**self.args) as client:
+            with patch.object(client._client, "subscribe", return_value=(0, 123)):
+                client.subscribe("abc")
+
+            client._userdata["buffers"].put(Mock(topic="abc"))
+
+        assert client._subscribed == {}
+        assert client.message_received(0) is None
+
+    def test_reconnects(self, pool, fake_paho):
+        with pool.get(**self.args) as client:
+            client._connect_timeout = 0.05
+
+        # Connection dropped and paho couldn't reconnect
+        client._on_disconnect(client._client, None, 1)
+
+        with pool.get(**self.args) as same_client:
+            assert same_client is client
+
+        assert fake_paho.call_count == 2
+
+
+class TestMessageBuffers:
+    @staticmethod
+    def message(topic):
+        return Mock(topic=topic)
+
+    def test_routes_by_topic(self):
+        buffers = MessageBuffers()
+        buffers.add("a/b")
+        buffers.add("c/d")
+
+        first = self.message("a/b")
+        second = self.message("c/d")
+        buffers.put(first)
+        buffers.put(second)
+
+        assert buffers.get(0, "c/d") is second
+        assert buffers.get(0, "a/b") is first
+        assert buffers.get(0, "a/b") is None
+
+    @pytest.mark.parametrize(
+        "subscription, topic, matches",
+        (
+            ("a/+/c", "a/b/c", True),
+            ("a/+/c", "a/b/d", False),
+            ("a/#", "a/b/c", True),
+            ("#", "a/b/c", True),
+            ("a/b", "a/b/c", False),
+        ),
+    )
+    def test_wildcards(self, subscription, topic, matches):
+        buffers = MessageBuffers()
+        buffers.add(subscription)
+
+        message = self.message(topic)
+        buffers.put(message)
+
+        assert (buffers.get(0, subscription) is message) == matches
+
+    def test_not_subscribed(self):
+        buffers = MessageBuffers()
+        buffers.put(self.message("a/b"))
+
+        assert buffers.get(0) is None
+
+    def test_wakes_waiter(self):
+        buffers = MessageBuffers()
+        buffers.add("a")
+
+        message = self.message("a")
+        threading.Timer(0.05, buffers.put, (message,)).start()
+
+        assert buffers.get(10, "a") is message
+
+    @pytest.mark.parametrize(
+        "overflow, expected", (("drop_oldest", [1, 2]), ("drop_newest", [0, 1]))
+    )
+    def test_drop_policies(self, overflow, expected):
+        buffers = MessageBuffers(capacity=2, overflow=overflow)
+        buffers.add("a")
+
+        messages = [self.message("a") for _ in range(3)]
+        for message in messages:
+            buffers.put(message)
+
+        # Not an error with these policies
+        buffers.check_overflow("a")
+
+        assert [buffers.get(0, "a") for _ in range(2)] == [
+            messages[i] for i in expected
+        ]
+        assert buffers.get(0, "a") is None
+
+    def test_overflow_error(self):
+        buffers = MessageBuffers(capacity=1)
+        buffers.add("a")
+        buffers.add("b")
+
+        first = self.message("a")
+        buffers.put(first)
+        buffers.put(self.message("a"))
+
+        with pytest.raises(exceptions.MQTTBufferOverflowError):
+            buffers.check_overflow("a")
+
+        # Only reported once, and other subscriptions are not affected
+        buffers.check_overflow("a")
+        buffers.check_overflow("b")
+
+        assert buffers.get(0, "a") is first
+
+    @pytest.mark.parametrize(
+        "kwargs", ({"capacity": 0}, {"capacity": "abc"}, {"overflow": "abc"})
+    )
+    def test_invalid_settings(self, kwargs):
+        with pytest.raises(exceptions.MQTTError):
+            MessageBuffers(**kwargs)
@@ -0,0 +1,91 @@
+from unittest.mock import patch
+
+import pytest
+import stevedore
+
+from tavern.plugins import _PluginCache, get_request_type
+from tavern.util import exceptions
+
+
+@pytest.fixture(name="plugin_cache")
+def fix_plugin_cache():
+    return _PluginCache()
+
+
+class TestPluginCache:
+    def test_loaded_once(self, plugin_cache, includes):
+        with patch(
+            "tavern.plugins.stevedore.EnabledExtensionManager",
+            wraps=stevedore.EnabledExtensionManager,
+        ) as mmanager:
+            first = plugin_cache(includes)
+            second = plugin_cache(includes)
+
+        assert first is second
+        # once for each backend
+        assert mmanager.call_count == 2
+
+    def test_no_config(self, plugin_cache, includes):
+        with pytest.raises(exceptions.PluginLoadError):
+            plugin_cache()
+
+        loaded = plugin_cache(includes)
+        assert plugin_cache() is loaded
+
+    def test_reloaded_for_other_backends(self, plugin_cache, includes):
+        first = plugin_cache(includes)
+
+        includes["backends"] = dict(includes["backends"], http="httpx")
+        second = plugin_cache(includes)
+
+        assert first is not second
+        assert [p.name for p in second] == ["httpx", "paho-mqtt"]
+
+
+class TestDispatch:
+    def test_blocks(self, plugin_cache, includes):
+        dispatch = plugin_cache.get_dispatch(includes)
+
+        assert set(dispatch.requests) == {"request", "mqtt_publish"}
+        assert set(dispatch.responses) == {"response", "mqtt_response"}
+
+    def test_response_order(self, plugin_cache, includes):
+        """Responses are checked in plugin order, not the order in the stage"""
+        dispatch = plugin_cache.get_dispatch(includes)
+
+        stage = {"name": "a", "mqtt_response": {}, "request": {}, "response": {}}
+
+        assert [p.name for p in dispatch.response_plugins(stage)] == [
+            "requests",
+            "paho-mqtt",
+        ]
+
+    def test_session_plugins(self, plugin_cache, includes):
+        dispatch = plugin_cache.get_dispatch(includes)
+
+        stages = [
+            {"name": "a", "request": {}, "response": {}},
+            {"name": "b", "request": {}, "mqtt_response": {}},
+        ]
+
+        assert [p.name for p in dispatch.session_plugins(stages)] == [
+            "requests",
+            "paho-mqtt",
+        ]
+        assert [p.name for p in dispatch.session_plugins(stages[:1])] == [
+            "requests"
+        ]
+
+
+class TestRequestType:
+    def test_duplicate(self, includes):
+        stage = {"name": "a", "request": {}, "mqtt_publish": {}}
+
+        with pytest.raises(exceptions.DuplicateKeysError):
+            get_request_type(stage, includes, {})
+
+    def test_missing(self, includes):
+        stage = {"name": "a", "response": {}}
+
+        with pytest.raises(exceptions.MissingKeysError):
+            get_request_type(stage, includes, {})
@@ -1,10 +1,13 @@
-from unittest.mock import Mock
+from contextlib import ExitStack
+from unittest.mock import Mock, patch
 
 from faker import Faker
 import py
 import pytest
 
 from tavern.testutils.pytesthook.file import YamlFile
+from tavern.testutils.pytesthook.item import YamlItem
+from tavern.util import exceptions
 
 
 def mock_args():
@@ -135,3 +138,41 @@ class TestMakeFile(object):
         # [w, x, y, z, 1, 2]
         # etc.
         assert len(tests) == 36
+
+
+class TestInvalidQuery:
+    def test_fails_only_that_test(self):
+        """An invalid query is reported when the test is run, like any other
+        error in the test, so other tests in the same file still run"""
+        item = YamlItem.__new__(YamlItem)
+        item.config = Mock()
+        item.user_properties = []
+        item.spec = {
+            "test_name": "bad query",
+            "stages": [
+                {
+                    "name": "step 1",
+                    "request": {"url": "http://www.example.com"},
+                    "response": {"save": {"json": {"a": "a[0"}}},
+                }
+            ],
+        }
+
+        module = "tavern.testutils.pytesthook.item"
+
+        with ExitStack() as stack:
+            for name in ["load_plugins", "call_hook", "verify_tests"]:
+                stack.enter_context(patch("{}.{}".format(module, name)))
+            stack.enter_context(
+                patch("{}.load_global_cfg".format(module), return_value={})
+            )
+            stack.enter_context(
+                patch.object(YamlItem, "_load_fixture_values", return_value={})
+            )
+            prun = stack.enter_context(patch("{}.run_test".format(module)))
+
+            with pytest.raises(exceptions.BadSchemaError):
+                item._runtest()
+
+        assert not prun.called
+        assert item.user_properties[0][0] == "tavern_timings"
@@ -1,20 +1,28 @@
+import asyncio
 from contextlib import ExitStack
+import datetime
 import os
 import tempfile
-from unittest.mock import Mock
+import threading
+from unittest.mock import Mock, patch
 
 import pytest
 import requests
 from requests.cookies import RequestsCookieJar
 
+from tavern._plugins.rest import upload as upload_body
+from tavern._plugins.rest.pool import PooledSession, shared_adapters
 from tavern._plugins.rest.request import (
     RestRequest,
     _check_allow_redirects,
     _get_file_arguments,
+    _get_upload_arguments,
     _read_expected_cookies,
     get_request_args,
 )
+from tavern._plugins.rest.tavernhook import TavernRestPlugin
 from tavern.util import exceptions
+from tavern.util.timing import TestTimings
 
 
 @pytest.fixture(name="req")
@@ -400,3 +408,148 @@ class TestGetFiles(object):
         assert file[0] == os.path.basename(tfile.name)
         assert file[2] == "abc123"
         assert file[3] == {"Content-Encoding": "def456"}
+
+
+class TestUpload:
+    @pytest.fixture(name="upload_files")
+    def fix_upload_files(self, tmpdir):
+        tmpdir.join("a.json").write('{"a": 1}')
+        tmpdir.join("b.bin").write_binary(bytes(range(256)) * 100)
+
+        return {
+            "file1": str(tmpdir.join("a.json")),
+            "file2": {"file_path": str(tmpdir.join("b.bin")), "content_encoding": "gzip"},
+        }
+
+    @pytest.mark.parametrize("use_mmap", (True, False))
+    def test_same_as_requests(self, upload_files, use_mmap):
+        """Body should be exactly what requests would have sent"""
+        data = {"a": "b", "c": ["1", "2"]}
+        upload = {"chunk_size": 1000, "mmap": use_mmap}
+
+        with patch(
+            "tavern._plugins.rest.upload.choose_boundary", return_value="xyz"
+        ), patch("urllib3.filepost.choose_boundary", return_value="xyz"):
+            with ExitStack() as stack:
+                args = _get_upload_arguments(
+                    {"files": upload_files, "data": data}, None, upload, stack
+                )
+                body = b"".join(bytes(c) for c in args["data"])
+
+                files = _get_file_arguments({"files": upload_files}, stack)["files"]
+                expected, content_type = requests.PreparedRequest._encode_files(
+                    files, data
+                )
+
+        assert body == expected
+        assert args["data"].len == len(expected)
+        assert args["headers"]["Content-Type"] == content_type
+        assert args["files"] is None
+
+    def test_chunked(self, upload_files):
+        with ExitStack() as stack:
+            args = _get_upload_arguments(
+                {"files": upload_files}, None, {"chunked": True}, stack
+            )
+
+        assert args["data"].len is None
+
+    def test_file_body(self, upload_files):
+        upload = {"chunk_size": 1000}
+
+        with ExitStack() as stack:
+            args = _get_upload_arguments({}, upload_files["file1"], upload, stack)
+            body = args["data"]
+            chunks = list(body)
+
+        assert chunks == [b'{"a": 1}']
+        assert body.len == body.sent == 8
+        assert body.elapsed is not None
+
+    def test_aiter(self, upload_files):
+        """Files are read off the event loop, and memory mapped chunks are not
+        copied"""
+        body = upload_body.file_body(
+            upload_files["file2"]["file_path"], chunk_size=1000, use_mmap=True
+        )
+        read_in = set()
+        iter_chunks = upload_body._FilePart.iter_chunks
+
+        def record_thread(part, chunk_size):
+            for chunk in iter_chunks(part, chunk_size):
+                read_in.add(threading.get_ident())
+                yield chunk
+
+        async def read_body():
+            return [chunk async for chunk in body.aiter()], threading.get_ident()
+
+        loop = asyncio.new_event_loop()
+        try:
+            with patch.object(upload_body._FilePart, "iter_chunks", record_thread):
+                chunks, loop_thread = loop.run_until_complete(read_body())
+        finally:
+            loop.close()
+
+        assert all(isinstance(c, memoryview) for c in chunks)
+        assert b"".join(chunks) == bytes(range(256)) * 100
+        assert read_in and loop_thread not in read_in
+
+        del chunks
+        body.close()
+
+    def test_data_must_be_form(self, upload_files):
+        with pytest.raises(exceptions.BadSchemaError):
+            _get_upload_arguments(
+                {"files": upload_files, "data": "abc"}, None, {}, Mock()
+            )
+
+    def test_upload_timings(self, upload_files, includes):
+        session = Mock(spec=requests.Session, cookies=RequestsCookieJar())
+
+        def send(**kwargs):
+            for _ in kwargs["data"]:
+                pass
+            return Mock(history=[], elapsed=datetime.timedelta(seconds=1))
+
+        session.request.side_effect = send
+
+        timings = includes["tavern_internal"]["timings"] = TestTimings()
+        stage_timings = timings.start_stage("upload")
+
+        rspec = {"url": "http://example.com", "method": "POST", "upload": {}}
+        rspec["files"] = upload_files
+        RestRequest(session, rspec, includes).run()
+
+        assert stage_timings.transferred["upload"] > 25600
+        assert "upload" in stage_timings.phases
+
+
+class TestPooledSession:
+    pool_settings = {"pool_connections": 2, "pool_maxsize": 3, "pool_block": False}
+
+    def test_disabled_by_default(self):
+        session = TavernRestPlugin.get_session({"http_pool": None})
+        assert not isinstance(session, PooledSession)
+
+    def test_shares_adapter(self):
+        config = {"http_pool": self.pool_settings}
+
+        first = TavernRestPlugin.get_session(config)
+        second = TavernRestPlugin.get_session(config)
+
+        adapter = first.get_adapter("https://example.com")
+        assert adapter is second.get_adapter("https://example.com")
+        assert adapter is first.get_adapter("http://example.com")
+        assert adapter._pool_maxsize == 3
+
+        # But nothing else is shared
+        assert first.cookies is not second.cookies
+
+    def test_exit_keeps_pool_open(self):
+        adapter = shared_adapters.get(**self.pool_settings)
+
+        with patch.object(adapter, "close") as pclose:
+            with PooledSession(self.pool_settings):
+                pass
+
+        assert not pclose.called
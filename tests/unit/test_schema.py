@@ -1,12 +1,25 @@
 import contextlib
+import copy
 import os
 import tempfile
 from textwrap import dedent
+import threading
+from unittest.mock import patch
+import uuid
 
+import pykwalify
 import pytest
 import yaml
 
-from tavern.schemas.files import verify_tests
+from tavern.schemas.extensions import _mqtt_response_message_validator
+from tavern.schemas.files import (
+    CompiledValidator,
+    _freeze,
+    _partial_schemas_lock,
+    _verified_tests,
+    verify_generic,
+    verify_tests,
+)
 from tavern.util.exceptions import BadSchemaError
 from tavern.util.loader import load_single_document_yaml
 
@@ -205,3 +218,242 @@ class TestBadSchemaAtCollect:
         with TestBadSchemaAtCollect.wrapfile_nondict(text) as filename:
             with pytest.raises(BadSchemaError):
                 load_single_document_yaml(filename)
+
+
+class TestCompiledValidator:
+    def test_only_verified_once(self, test_dict):
+        # Make sure it hasn't been verified by a previous test
+        test_dict["test_name"] = str(uuid.uuid4())
+
+        with patch.object(
+            CompiledValidator,
+            "verify",
+            autospec=True,
+            side_effect=CompiledValidator.verify,
+        ) as pverify:
+            verify_tests(test_dict)
+            verify_tests(copy.deepcopy(test_dict))
+
+        assert pverify.call_count == 1
+
+    def test_changed_test_verified_again(self, test_dict):
+        verify_tests(test_dict)
+
+        test_dict["stages"][0]["request"]["methd"] = "GET"
+
+        with pytest.raises(BadSchemaError):
+            verify_tests(test_dict)
+
+    def test_failure_not_memoised(self, test_dict):
+        test_dict["stages"][0]["response"]["status_code"] = "abc"
+
+        for _ in range(2):
+            with pytest.raises(BadSchemaError):
+                verify_tests(test_dict)
+
+    def test_unknown_type_not_memoised(self):
+        class Slotted:
+            __slots__ = ("value",)
+
+            def __init__(self, value):
+                self.value = value
+
+            def __repr__(self):
+                return "Slotted()"
+
+        with pytest.raises(TypeError):
+            _freeze({"a": Slotted(1)})
+
+    def test_memo_bounded(self, test_dict):
+        tests = []
+        for _ in range(3):
+            test = copy.deepcopy(test_dict)
+            test["test_name"] = str(uuid.uuid4())
+            tests.append(test)
+
+        with patch("tavern.schemas.files.VERIFIED_TESTS_CACHE_SIZE", 2):
+            with patch.object(
+                CompiledValidator,
+                "verify",
+                autospec=True,
+                side_effect=CompiledValidator.verify,
+            ) as pverify:
+                for test in tests + tests[2:] + tests[:1]:
+                    verify_tests(test)
+
+            assert len(_verified_tests) <= 2
+
+        # The last test was remembered, but the first one had been forgotten
+        assert pverify.call_count == 4
+
+    def test_validation_locked(self):
+        """Partial schemas can't be registered by another thread while
+        validating"""
+        schema = {
+            "schema;number": {"type": "int"},
+            "type": "map",
+            "mapping": {"a": {"include": "number"}},
+        }
+        validator = CompiledValidator(schema)
+
+        acquired = []
+
+        def try_lock():
+            got = _partial_schemas_lock.acquire(blocking=False)
+            if got:
+                _partial_schemas_lock.release()
+            acquired.append(got)
+
+        validate = CompiledValidator._validate
+
+        def validate_in_thread(self, *args, **kwargs):
+            thread = threading.Thread(target=try_lock)
+            thread.start()
+            thread.join()
+            return validate(self, *args, **kwargs)
+
+        with patch.object(CompiledValidator, "_validate", validate_in_thread):
+            validator.verify({"a": 1})
+
+        assert acquired and not any(acquired)
+
+    def test_reusable(self):
+        schema = {"type": "map", "mapping": {"a": {"type": "int"}}}
+
+        validator = CompiledValidator(schema)
+        validator.verify({"a": 1})
+
+        with pytest.raises(BadSchemaError):
+            validator.verify({"a": "b"})
+
+        validator.verify({"a": 2})
+
+    def test_generic(self):
+        schema = {
+            "schema;number": {"type": "int"},
+            "type": "map",
+            "mapping": {"a": {"include": "number"}},
+        }
+
+        verify_generic({"a": 1}, schema)
+
+        with pytest.raises(BadSchemaError):
+            verify_generic({"a": "b"}, schema)
+
+    def test_generic_cached(self):
+        schema = {"type": "map", "mapping": {"a": {"type": "int"}}}
+
+        with patch(
+            "tavern.schemas.files.CompiledValidator", wraps=CompiledValidator
+        ) as pvalidator:
+            verify_generic({"a": 1}, schema)
+            verify_generic({"a": 2}, schema)
+
+            assert pvalidator.call_count == 1
+
+            # Same contents, but a different object
+            verify_generic({"a": 3}, copy.deepcopy(schema))
+
+            assert pvalidator.call_count == 2
+
+    def test_partial_schemas_registered_once(self):
+        schema = {
+            "schema;number": {"type": "int"},
+            "type": "map",
+            "mapping": {"a": {"include": "number"}},
+        }
+
+        validator = CompiledValidator(schema)
+        assert "number" in pykwalify.partial_schemas
+
+        class RecordingDict(dict):
+            updates = 0
+
+            def update(self, *args, **kwargs):
+                self.updates += 1
+                super().update(*args, **kwargs)
+
+        registered = RecordingDict(pykwalify.partial_schemas)
+
+        with patch.object(pykwalify, "partial_schemas", registered):
+            validator.verify({"a": 1})
+
+            with pytest.raises(BadSchemaError):
+                validator.verify({"a": "b"})
+
+        assert registered.updates == 0
+
+    def test_partial_schemas_replaced(self):
+        first = CompiledValidator(
+            {
+                "schema;value": {"type": "int"},
+                "type": "map",
+                "mapping": {"a": {"include": "value"}},
+            }
+        )
+        second = CompiledValidator(
+            {
+                "schema;value": {"type": "str"},
+                "type": "map",
+                "mapping": {"a": {"include": "value"}},
+            }
+        )
+
+        # 'value' was registered again by the second schema
+        first.verify({"a": 1})
+        second.verify({"a": "b"})
+
+        with pytest.raises(BadSchemaError):
+            first.verify({"a": "b"})
+
+
+class TestMQTTResponse:
+    @pytest.fixture(name="mqtt_test_dict")
+    def fix_mqtt_test_dict(self, test_dict):
+        stage = test_dict["stages"][0]
+        del stage["response"]
+        return test_dict
+
+    @pytest.mark.parametrize(
+        "correct_value",
+        (
+            {"topic": "/a/b", "payload": "hello"},
+            [{"topic": "/a/b", "payload": "hello"}],
+            [
+                {"topic": "/a/b", "payload": "hello"},
+                {"topic": "/c/d", "json": {"a": 1}, "unordered": True},
+            ],
+        ),
+    )
+    def test_one_or_many(self, mqtt_test_dict, correct_value):
+        mqtt_test_dict["stages"][0]["mqtt_response"] = correct_value
+        verify_tests(mqtt_test_dict, with_plugins=False)
+
+    @pytest.mark.parametrize(
+        "incorrect_value",
+        ([], "/a/b", [{"payload": "hello"}], [{"topic": "/a/b", "abc": 1}]),
+    )
+    def test_invalid(self, mqtt_test_dict, incorrect_value):
+        mqtt_test_dict["stages"][0]["mqtt_response"] = incorrect_value
+        with pytest.raises(BadSchemaError):
+            verify_tests(mqtt_test_dict, with_plugins=False)
+
+    def test_message_validator_built_once(self, mqtt_test_dict):
+        _mqtt_response_message_validator.cache_clear()
+
+        with patch(
+            "tavern.schemas.files.CompiledValidator", wraps=CompiledValidator
+        ) as pvalidator:
+            for i in range(3):
+                mqtt_test_dict["stages"][0]["mqtt_response"] = [
+                    {"topic": "/a/{}".format(i), "payload": "hello"},
+                    {"topic": "/b/{}".format(i), "payload": "hello"},
+                ]
+                verify_tests(mqtt_test_dict, with_plugins=False)
+
+        message_validators = [
+            c
+            for c in pvalidator.call_args_list
+            if c[0][0] == {"include": "mqtt_response_message"}
+        ]
+        assert len(message_validators) == 1
@@ -0,0 +1,110 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from tavern.testutils.pytesthook.timings import TimingsReport
+from tavern.util.timing import Timings, TestTimings, get_stage_timings
+
+
+@pytest.fixture(name="fake_clock")
+def fix_fake_clock():
+    """perf_counter which goes up by 1 every time it is called"""
+    counter = iter(range(1000))
+
+    with patch(
+        "tavern.util.timing.time.perf_counter", side_effect=lambda: next(counter)
+    ):
+        yield
+
+
+class TestTimingPhases:
+    def test_phase(self, fake_clock):
+        timings = Timings()
+
+        with timings.phase("a"):
+            pass
+
+        with timings.phase("a"):
+            pass
+
+        assert timings.phases == {"a": 2}
+
+    def test_nested_not_counted_twice(self, fake_clock):
+        timings = Timings()
+
+        # outer: 0 -> 3, inner: 1 -> 2
+        with timings.phase("outer"):
+            with timings.phase("inner"):
+                pass
+            timings.add("added", 1)
+
+        assert timings.phases == {"outer": 1, "inner": 1, "added": 1}
+        assert timings.total == 3
+
+    def test_test_total(self):
+        timings = TestTimings()
+        timings.add("verify_schema", 1)
+        timings.start_stage("first").add("send", 2)
+        timings.start_stage("second").add("send", 3)
+
+        assert timings.total == 6
+        assert [s["name"] for s in timings.as_dict()["stages"]] == ["first", "second"]
+
+    def test_transfer(self):
+        timings = TestTimings()
+        stage_timings = timings.start_stage("stage")
+        stage_timings.add_transfer("upload", 1000, 2)
+        stage_timings.add_transfer("upload", 1000, 2)
+
+        assert stage_timings.phases == {"upload": 4}
+        assert stage_timings.throughput("upload") == 500
+        assert stage_timings.throughput("download") is None
+        assert timings.as_dict()["stages"][0]["transferred"] == {
+            "upload": {"bytes": 2000, "bytes_per_second": 500}
+        }
+
+    def test_current_stage(self):
+        timings = TestTimings()
+        config = {"tavern_internal": {"timings": timings}}
+
+        stage_timings = timings.start_stage("stage")
+
+        assert get_stage_timings(config) is stage_timings
+
+    def test_no_stage(self):
+        # eg, creating a request outside of a test
+        assert isinstance(get_stage_timings({}), Timings)
+
+
+class TestTimingsReport:
+    @staticmethod
+    def _report(nodeid, when="call"):
+        timings = TestTimings()
+        timings.add("verify_schema", 1)
+        timings.start_stage("stage").add("send", 2)
+
+        return SimpleNamespace(
+            nodeid=nodeid,
+            when=when,
+            outcome="passed",
+            duration=3,
+            user_properties=[("tavern_timings", timings.as_dict())],
+        )
+
+    def test_summary(self, tmpdir):
+        filename = str(tmpdir.join("timings.json"))
+        report = TimingsReport(filename)
+
+        report.pytest_runtest_logreport(self._report("a"))
+        report.pytest_runtest_logreport(self._report("a", when="setup"))
+        report.pytest_runtest_logreport(self._report("b"))
+
+        report.pytest_sessionfinish(SimpleNamespace(config=SimpleNamespace()))
+
+        with open(filename, "r", encoding="utf-8") as timings_file:
+            summary = json.load(timings_file)
+
+        assert [t["nodeid"] for t in summary["tests"]] == ["a", "b"]
+        assert summary["totals"] == {"verify_schema": 2, "send": 4}
@@ -13,13 +13,17 @@ from tavern.schemas.extensions import validate_extensions
 from tavern.schemas.files import wrapfile
 from tavern.util import exceptions
 from tavern.util.dict_util import (
+    _split_field_name,
     check_keys_match_recursive,
     deep_dict_merge,
     format_keys,
     recurse_access_key,
+    values_match,
 )
+from tavern.util.jmespath_util import compile_query, precompile_queries
 from tavern.util.loader import (
     ANYTHING,
+    DefaultIncludeLoader,
     DictSentinel,
     FloatSentinel,
     IncludeLoader,
@@ -29,6 +33,8 @@ from tavern.util.loader import (
     construct_include,
     load_single_document_yaml,
 )
+from tavern.util.log_util import Truncated, lazy, truncate
+from tavern.util.scope import copy_stage, new_test_config
 
 
 class TestValidateFunctions:
@@ -230,6 +236,39 @@ class TestMatchRecursive:
         with pytest.raises(exceptions.KeyMismatchError):
             check_keys_match_recursive(token, response, [])
 
+    def test_error_path(self):
+        """Error should show where in the response the mismatch was"""
+        a = {"a": [{"b": "val"}]}
+        b = {"a": [{"b": "wrong"}]}
+
+        with pytest.raises(exceptions.KeyMismatchError) as e:
+            check_keys_match_recursive(a, b, ["top"])
+
+        assert 'expected["top"]["a"]["0"]["b"] = \'val\'' in str(e.value)
+        assert 'actual["top"]["a"]["0"]["b"] = \'wrong\'' in str(e.value)
+
+    @pytest.mark.parametrize(
+        "expected, actual, strict, matches",
+        [
+            ({"a": [1, 2]}, {"a": [1, 2]}, True, True),
+            ({"a": [1, 2]}, {"a": [1, 3]}, True, False),
+            ({"a": 1}, {"a": 1, "b": 2}, True, False),
+            ({"a": 1}, {"a": 1, "b": 2}, False, True),
+            ([2], [1, 2, 3], False, True),
+            ({"a": ANYTHING}, {"a": {"b": 1}}, True, True),
+            (IntSentinel(), "1", True, False),
+        ],
+    )
+    def test_values_match(self, expected, actual, strict, matches):
+        """values_match should agree with check_keys_match_recursive"""
+        assert values_match(expected, actual, strict) == matches
+
+        if matches:
+            check_keys_match_recursive(expected, actual, [], strict)
+        else:
+            with pytest.raises(exceptions.KeyMismatchError):
+                check_keys_match_recursive(expected, actual, [], strict)
+
 
 class TestNonStrictListMatching:
     def test_match_list_items(self):
@@ -286,6 +325,42 @@ class TestNonStrictListMatching:
         with pytest.raises(exceptions.KeyMismatchError):
             check_keys_match_recursive(a, b, [], strict=False)
 
+    def test_missing_message(self):
+        """Everything after the first item that couldn't be found is missing"""
+        a = ["a", "d", "b"]
+        b = ["a", "b", "c"]
+
+        with pytest.raises(exceptions.KeyMismatchError) as exc:
+            check_keys_match_recursive(a, b, [], strict=False)
+
+        assert str(exc.value) == "List item(s) not present in response: ['d', 'b']"
+
+    @pytest.mark.parametrize(
+        "a, matches",
+        (
+            ([{"id": 3}, {"id": 1}], False),
+            ([{"id": 1}, {"id": 3}], True),
+            ([{"id": 1, "missing": 1}], False),
+            ([{"id": IntSentinel()}, {"id": ANYTHING}, {"id": 3}], True),
+            ([IntSentinel()], False),
+            ([ANYTHING] * 5, False),
+            ([1, {"id": 2}], False),
+            ([DictSentinel(), [1, 2]], True),
+        ),
+    )
+    def test_match_mixed(self, a, matches):
+        b = [{"id": 1, "other": "a"}, {"id": 2}, {"id": 3}, [1, 2, 3]]
+
+        if matches:
+            check_keys_match_recursive(a, b, [], strict=False)
+        else:
+            with pytest.raises(exceptions.KeyMismatchError):
+                check_keys_match_recursive(a, b, [], strict=False)
+
+    def test_match_equal_values_different_types(self):
+        """Same as when matching single values, 1 == 1.0 == True"""
+        check_keys_match_recursive([1.0, True], [1, 2, 1], [], strict=False)
+
 
 @pytest.fixture(name="test_yaml")
 def fix_test_yaml():
@@ -316,13 +391,20 @@ def fix_test_yaml():
     return text
 
 
+# Will be the same if pyyaml was built without libyaml
+all_loaders = pytest.mark.parametrize(
+    "loader", sorted({IncludeLoader, DefaultIncludeLoader}, key=lambda l: l.__name__)
+)
+
+
+@all_loaders
 class TestCustomTokens:
     def assert_type_value(self, test_value, expected_type, expected_value):
         assert isinstance(test_value, expected_type)
         assert test_value == expected_value
 
-    def test_conversion(self, test_yaml):
-        stages = yaml.load(test_yaml, Loader=IncludeLoader)["stages"][0]
+    def test_conversion(self, test_yaml, loader):
+        stages = yaml.load(test_yaml, Loader=loader)["stages"][0]
 
         self.assert_type_value(stages["request"]["json"]["number"], int, 5)
         self.assert_type_value(stages["response"]["json"]["double"], float, 10.0)
@@ -335,6 +417,41 @@ class TestCustomTokens:
         )
 
 
+@all_loaders
+class TestLoaders:
+    def test_anchors_across_documents(self, loader):
+        text = dedent(
+            """
+        ---
+        a: &anchored
+          b: c
+        ---
+        d: *anchored
+        """
+        )
+
+        documents = list(yaml.load_all(text, Loader=loader))
+
+        assert documents[1]["d"] == {"b": "c"}
+
+    def test_source_marks(self, test_yaml, loader):
+        stages = yaml.load(test_yaml, Loader=loader)["stages"]
+
+        assert stages.start_mark.line == 5
+        assert stages[0]["request"].start_mark.line == 7
+
+    @pytest.mark.parametrize(
+        "text", ("a:\n", "a:\n  - b\n  -\n", "{a}", "---\n", "a: 1\n---\n")
+    )
+    def test_empty_value_error(self, text, loader):
+        with pytest.raises(exceptions.BadSchemaError):
+            list(yaml.load_all(text, Loader=loader))
+
+    @pytest.mark.parametrize("text", ("a: ''\n", "a: !anything\n", "a: null\n"))
+    def test_not_empty(self, text, loader):
+        assert "a" in yaml.load(text, Loader=loader)
+
+
 class TestFormatKeys:
     def test_format_missing_raises(self):
         to_format = {"a": "{b}"}
@@ -363,6 +480,59 @@ class TestFormatKeys:
         formatted_2 = format_keys(formatted, {})
         assert formatted_2 == final_value
 
+    @pytest.mark.parametrize(
+        "to_format, expected",
+        (
+            ("no fields", "no fields"),
+            ("{{escaped}}", "{escaped}"),
+            ("{a}/{b}", "1/two"),
+            ("{a:03d}", "001"),
+            ("{b!r}", "'two'"),
+            ("{c.d}", "3"),
+            ("{c[d]}", "3"),
+            ("{c.e[1]}", "5"),
+            ("{c.f_g}", "6"),
+            ("{c}", "{'d': 3, 'e': [4, 5], 'f g': 6}"),
+            ("{c!r}", "<Box: {'d': 3, 'e': [4, 5], 'f g': 6}>"),
+            ("{c.e}", "[4, 5]"),
+            ("{a:>{width}}", "  1"),
+        ),
+    )
+    def test_format_fields(self, to_format, expected):
+        format_variables = {
+            "a": 1,
+            "b": "two",
+            "c": {"d": 3, "e": [4, 5], "f g": 6},
+            "width": 3,
+        }
+
+        assert format_keys(to_format, format_variables) == expected
+
+    @pytest.mark.parametrize("to_format", ("{c.x}", "{c[x]}", "{c.e[2]}", "{0}", "{}"))
+    def test_format_missing_nested_raises(self, to_format):
+        with pytest.raises(exceptions.MissingFormatError):
+            format_keys(to_format, {"c": {"d": 3, "e": [4, 5]}})
+
+    @pytest.mark.parametrize(
+        "field_name, expected",
+        (
+            ("a", ("a", ())),
+            ("0", (0, ())),
+            ("a.b[0]", ("a", ((True, "b"), (False, 0)))),
+            ("a[b].c", ("a", ((False, "b"), (True, "c")))),
+            ("a.0[01]", ("a", ((True, "0"), (False, 1)))),
+            ("a[x.y][-1]", ("a", ((False, "x.y"), (False, "-1")))),
+            ("a]", ("a]", ())),
+        ),
+    )
+    def test_split_field_name(self, field_name, expected):
+        assert _split_field_name(field_name) == expected
+
+    @pytest.mark.parametrize("field_name", ("a.", "a[", "a[]", "a[0]b", "a..b"))
+    def test_split_field_name_invalid(self, field_name):
+        with pytest.raises(ValueError):
+            _split_field_name(field_name)
+
 
 class TestRecurseAccess:
     @pytest.fixture
@@ -390,6 +560,119 @@ class TestRecurseAccess:
 
         assert recurse_access_key(nested_data, new_query) is None
 
+    def test_query_compiled_once(self, nested_data):
+        compile_query.cache_clear()
+
+        for _ in range(3):
+            assert recurse_access_key(nested_data, "a[1].c") == "d"
+
+        info = compile_query.cache_info()
+        assert info.misses == 1
+        assert info.hits == 2
+
+
+class TestPrecompileQueries:
+    @staticmethod
+    def make_test(response):
+        return {"test_name": "abc", "stages": [{"name": "s", "response": response}]}
+
+    @pytest.mark.parametrize(
+        "response",
+        (
+            {"save": {"json": {"a": "a[0].b"}}},
+            {"save": {"json": {"a": "{b}.c"}}},
+            {"save": {"$ext": {"function": "abc:def"}}},
+            {"stream": {"save": {"a": {"item": 0, "query": "a.b"}}}},
+            {
+                "verify_response_with": {
+                    "function": "tavern.testutils.helpers:validate_content",
+                    "extra_kwargs": {
+                        "comparisons": [
+                            {"jmespath": "a.b", "operator": "eq", "expected": 1}
+                        ]
+                    },
+                }
+            },
+        ),
+    )
+    def test_valid(self, response):
+        precompile_queries(self.make_test(response))
+
+    @pytest.mark.parametrize(
+        "response",
+        (
+            {"save": {"json": {"a": "a[0"}}},
+            {"stream": {"save": {"a": {"item": 0, "query": "a[0"}}}},
+            {
+                "verify_response_with": [
+                    {
+                        "function": "tavern.testutils.helpers:validate_content",
+                        "extra_kwargs": {
+                            "comparisons": [
+                                {"jmespath": "a..b", "operator": "eq", "expected": 1}
+                            ]
+                        },
+                    }
+                ]
+            },
+        ),
+    )
+    def test_invalid(self, response):
+        with pytest.raises(exceptions.BadSchemaError):
+            precompile_queries(self.make_test(response))
+
+
+class TestScope:
+    def test_global_variables_not_changed(self):
+        global_cfg = {"variables": {"a": 1, "b": {"c": 2}}, "strict": True}
+
+        test_block_config = new_test_config(global_cfg)
+        test_block_config["variables"].update({"a": 3, "d": 4})
+        test_block_config["strict"] = False
+
+        assert test_block_config["variables"] == {"a": 3, "b": {"c": 2}, "d": 4}
+        assert format_keys("{a}-{b.c}", test_block_config["variables"]) == "3-2"
+
+        assert global_cfg == {"variables": {"a": 1, "b": {"c": 2}}, "strict": True}
+
+    def test_no_global_variables(self):
+        test_block_config = new_test_config({})
+        test_block_config["variables"]["a"] = 1
+
+        assert dict(test_block_config["variables"]) == {"a": 1}
+
+    def test_copy_stage(self):
+        stage = {"name": "a", "request": {"url": "b", "meta": ["c"]}}
+
+        copied = copy_stage(stage)
+        copied["request"].pop("meta")
+        copied["name"] = "d"
+
+        assert stage == {"name": "a", "request": {"url": "b", "meta": ["c"]}}
+
+
+class TestLogTruncation:
+    def test_short_not_truncated(self):
+        assert truncate("abc", 3) == "abc"
+
+    def test_truncated(self):
+        assert truncate("abcdef", 3) == "abc...<3 more characters>"
+
+    def test_no_limit(self):
+        assert truncate("abcdef", 0) == "abcdef"
+
+    def test_truncated_value(self):
+        with patch("tavern.util.log_util._max_length", 5):
+            assert str(Truncated({"a": 1})) == "{'a':...<3 more characters>"
+
+    def test_lazy_only_called_when_logged(self):
+        func = Mock(return_value="abc")
+        message = lazy(func, 1)
+
+        assert not func.called
+        assert str(message) == "abc"
+        func.assert_called_once_with(1)
+
 
 class TestLoadCfg:
     def test_load_one(self):